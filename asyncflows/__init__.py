@@ -1,6 +1,8 @@
-from asyncflows.asyncflows import AsyncFlows
+from asyncflows.asyncflows import AsyncFlows, BatchResult
 from asyncflows.models.config.action import Action, StreamingAction
 from asyncflows.models.io import BaseModel, Field, PrivateAttr
+from asyncflows.utils.metrics_utils import metrics
+from asyncflows.utils.trace_utils import Tracer, tracing
 from asyncflows.models.io import (
     RedisUrlInputs,
     DefaultModelInputs,
@@ -11,18 +13,27 @@ from asyncflows.models.io import (
 
 __all__ = [
     "AsyncFlows",
+    "BatchResult",
     "Action",
     "StreamingAction",
     "BaseModel",
     "Field",
     "PrivateAttr",
     "ShelveCacheRepo",
+    "SqliteCacheRepo",
     "RedisCacheRepo",
     "RedisUrlInputs",
     "DefaultModelInputs",
     "BlobRepoInputs",
     "FinalInvocationInputs",
     "CacheControlOutputs",
+    "Tracer",
+    "tracing",
+    "metrics",
 ]
 
-from asyncflows.repos.cache_repo import ShelveCacheRepo, RedisCacheRepo
+from asyncflows.repos.cache_repo import (
+    ShelveCacheRepo,
+    SqliteCacheRepo,
+    RedisCacheRepo,
+)
@@ -25,12 +25,21 @@ class Outputs(CacheControlOutputs):
     pages: list[Page] | None = None
 
 
+def _extract_page_texts(filepath: str) -> list[str]:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(filepath)
+    if len(pdf) == 0:
+        raise Exception("PDF has no pages")
+    return [page.get_textpage().get_text_range() for page in pdf]
+
+
 class ExtractPdfText(Action[Inputs, Outputs]):
     name = "extract_pdf_text"
+    # pdfium is CPU-bound and not thread-safe
+    executor = "process"
 
     async def run(self, inputs: Inputs) -> Outputs:
-        import pypdfium2 as pdfium
-
         if isinstance(inputs.file, str):
             filepath = inputs.file
         else:
@@ -43,20 +52,15 @@ class ExtractPdfText(Action[Inputs, Outputs]):
                     _cache=False,
                 )
 
-        # TODO make this async, tho it's relatively fast
-        pdf = pdfium.PdfDocument(filepath)
-        if len(pdf) == 0:
-            raise Exception("PDF has no pages")
+        page_texts = await self.run_blocking(_extract_page_texts, filepath)
 
         title = filepath.rsplit("/", 1)[-1].rsplit(".", 1)[0]
 
         start_of_text = ""
-        page_texts = []
-        for page in pdf:
-            page_text = page.get_textpage().get_text_range()
-            page_texts.append(page_text)
-            if len(start_of_text) < inputs.min_start_chars:
-                start_of_text += page_text
+        for page_text in page_texts:
+            if len(start_of_text) >= inputs.min_start_chars:
+                break
+            start_of_text += page_text
 
         full_text = "\n\n".join(page_texts)
 
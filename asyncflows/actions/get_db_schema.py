@@ -12,26 +12,36 @@ class Outputs(BaseModel):
     )
 
 
-class GetDBSchema(Action[Inputs, Outputs]):
-    name = "get_db_schema"
+def _get_create_statements(database_url: str) -> list[str]:
+    from sqlalchemy import create_engine, MetaData, URL
+    from sqlalchemy.sql.ddl import CreateTable
 
-    async def run(self, inputs: Inputs) -> Outputs:
-        from sqlalchemy import create_engine, MetaData, URL
-        from sqlalchemy.sql.ddl import CreateTable
+    sync_database_url: URL = get_sync_db_url(database_url)
+    engine = create_engine(sync_database_url)
+    if engine is None:
+        raise ValueError("Could not connect to the database")
+
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+
+    create_statements = []
 
-        database_url: URL = get_sync_db_url(inputs.database_url)
-        engine = create_engine(database_url)
-        if engine is None:
-            raise ValueError("Could not connect to the database")
+    for table_name in metadata.tables:
+        table = metadata.tables[table_name]
+        create_statements.append(str(CreateTable(table).compile(engine)))
 
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
+    return create_statements
 
-        create_statements = []
 
-        for table_name in metadata.tables:
-            table = metadata.tables[table_name]
-            create_statements.append(str(CreateTable(table).compile(engine)))
+class GetDBSchema(Action[Inputs, Outputs]):
+    name = "get_db_schema"
+    # reflecting the schema waits on the database with a synchronous driver
+    executor = "thread"
+
+    async def run(self, inputs: Inputs) -> Outputs:
+        create_statements = await self.run_blocking(
+            _get_create_statements, inputs.database_url
+        )
 
         if not create_statements:
             self.log.warning("No tables found in the database")
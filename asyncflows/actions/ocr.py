@@ -15,6 +15,8 @@ class Outputs(BaseModel):
 
 class OCR(Action[Inputs, Outputs]):
     name = "ocr"
+    # ocrmypdf is CPU-bound, and its API isn't meant to run in several threads at once
+    executor = "process"
 
     async def run(self, inputs: Inputs) -> Outputs:
         import ocrmypdf
@@ -30,8 +32,7 @@ class OCR(Action[Inputs, Outputs]):
 
         ocr_filepath = os.path.join(self.temp_dir, "ocr.pdf")
 
-        # TODO find async alternative for this
-        ocrmypdf.ocr(filepath, ocr_filepath)
+        await self.run_blocking(ocrmypdf.ocr, filepath, ocr_filepath)
 
         return Outputs(
             pdf_ocr=ocr_filepath,
@@ -30,9 +30,21 @@ import litellm
 from asyncflows.models.json_schema import JsonSchemaObject
 from asyncflows.utils.async_utils import Timer, measure_async_iterator
 from asyncflows.utils.json_schema_utils import jsonschema_to_pydantic
+from asyncflows.utils.metrics_utils import metrics
 from asyncflows.utils.secret_utils import get_secret
 from asyncflows.utils.singleton_utils import SingletonContext
 
+llm_time_to_first_token_seconds = metrics.histogram(
+    "asyncflows_llm_time_to_first_token_seconds",
+    "Time from invoking an LLM to its first completion",
+    ("model",),
+)
+llm_invocation_seconds = metrics.histogram(
+    "asyncflows_llm_invocation_seconds",
+    "Wall time of LLM invocations, until their last completion",
+    ("model",),
+)
+
 # for some reason if this is imported later it hangs consistently
 try:
     import vertexai  # noqa
@@ -516,9 +528,13 @@ class Prompt(StreamingAction[Inputs, Outputs]):
                     "First completion received",
                     seconds=timer.wall_time,
                 )
+                llm_time_to_first_token_seconds.observe(
+                    timer.wall_time, model=model_config.model
+                )
                 first_completion_received = True
             yield completion
         self.log.info("Invoked LLM", blocking_time=timer.blocking_time)
+        llm_invocation_seconds.observe(timer.wall_time, model=model_config.model)
 
     def estimate_cost(
         self,
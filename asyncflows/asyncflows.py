@@ -1,23 +1,54 @@
+import asyncio
+import copy
+import hashlib
+import itertools
+import json
+from dataclasses import dataclass
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from typing import Any
+from typing import Any, AsyncIterable, AsyncIterator, Iterable
 
-from asyncflows.models.config.flow import ActionConfig
+from asyncflows.models.config.flow import ActionConfig, Loop
+from asyncflows.models.primitives import ContextVarPath
 from asyncflows.services.action_service import ActionService
 
 from asyncflows.log_config import get_logger
 from asyncflows.models.config.value_declarations import VarDeclaration
 from asyncflows.repos.blob_repo import InMemoryBlobRepo, BlobRepo
-from asyncflows.repos.cache_repo import ShelveCacheRepo, CacheRepo
+from asyncflows.repos.cache_repo import SqliteCacheRepo, CacheRepo
 from asyncflows.utils.loader_utils import load_config_file, load_config_text
+from asyncflows.utils.async_utils import iterate_any, iterator_to_coro
+from asyncflows.utils.executor_utils import release_executors, retain_executors
+from asyncflows.utils.plan_utils import compile_plan, get_loop_references
+from asyncflows.utils.process_utils import stream_many_in_processes
+from asyncflows.utils.sentinel_utils import is_sentinel
 from asyncflows.utils.static_utils import check_config_consistency
+from asyncflows.utils.trace_utils import trace_span
+
+TargetOutput = None | ContextVarPath | list[ContextVarPath] | dict[str, ContextVarPath]
+
+
+@dataclass
+class BatchResult:
+    """
+    The outputs of a run of `AsyncFlows.run_many` or `AsyncFlows.stream_many`.
+    """
+
+    #: The position of the run's variables in the given variable sets
+    index: int
+    variables: dict[str, Any]
+    outputs: Any = None
+    #: The exception that failed the run, if any
+    error: Exception | None = None
+    #: Whether the outputs are final
+    finished: bool = True
 
 
 class AsyncFlows:
     def __init__(
         self,
         config: ActionConfig,
-        cache_repo: CacheRepo | type[CacheRepo] = ShelveCacheRepo,
+        cache_repo: CacheRepo | type[CacheRepo] = SqliteCacheRepo,
         blob_repo: BlobRepo | type[BlobRepo] = InMemoryBlobRepo,
         temp_dir: None | str | TemporaryDirectory = None,
         _vars: None | dict[str, Any] = None,
@@ -33,6 +64,7 @@ class AsyncFlows:
         else:
             self.temp_dir = TemporaryDirectory()
             temp_dir_path = self.temp_dir.name
+        self.temp_dir_path = temp_dir_path
 
         if isinstance(cache_repo, CacheRepo):
             self.cache_repo = cache_repo
@@ -49,25 +81,46 @@ class AsyncFlows:
             )
 
         self.action_config = config
+        # compile the plan once per loaded config; flows derived with `set_vars` share it
+        self.plan = compile_plan(self.action_config)
         self.action_service = ActionService(
             temp_dir=temp_dir_path,
             use_cache=True,
             cache_repo=self.cache_repo,
             blob_repo=self.blob_repo,
             config=self.action_config,
+            plan=self.plan,
         )
+        # flows derived with `set_vars` share the repos, temp dir and action service, owned by the root flows
+        self._owns_resources = True
+        # the thread and process pools the actions run blocking calls in are shared by all flows in the process
+        retain_executors()
 
     async def close(self):
+        """
+        Close the repos, stop the lag monitor and clean up the temp dir;
+        once no other flows are open, shut down the thread and process pools too.
+        Only the flows these were created with own them; closing flows derived with `set_vars` does nothing,
+        so they can be closed without affecting their siblings.
+        """
+        if not self._owns_resources:
+            return
+        if self.action_service.lag_monitor is not None:
+            if self.action_service.lag_monitor.running:
+                self.action_service.lag_monitor.stop()
         await self.cache_repo.close()
         await self.blob_repo.close()
         if isinstance(self.temp_dir, TemporaryDirectory):
             self.temp_dir.cleanup()
+        release_executors()
+        # closing again does nothing
+        self._owns_resources = False
 
     @classmethod
     def from_text(
         cls,
         text: str,
-        cache_repo: CacheRepo | type[CacheRepo] = ShelveCacheRepo,
+        cache_repo: CacheRepo | type[CacheRepo] = SqliteCacheRepo,
         blob_repo: BlobRepo | type[BlobRepo] = InMemoryBlobRepo,
     ):
         config = load_config_text(text)
@@ -81,7 +134,7 @@ class AsyncFlows:
     def from_file(
         cls,
         file: str | Path,
-        cache_repo: CacheRepo | type[CacheRepo] = ShelveCacheRepo,
+        cache_repo: CacheRepo | type[CacheRepo] = SqliteCacheRepo,
         blob_repo: BlobRepo | type[BlobRepo] = InMemoryBlobRepo,
     ) -> "AsyncFlows":
         if isinstance(file, Path):
@@ -94,94 +147,283 @@ class AsyncFlows:
         )
 
     def set_vars(self, **kwargs) -> "AsyncFlows":
-        variables = self.variables | kwargs
-        return AsyncFlows(
-            config=self.action_config,
-            cache_repo=self.cache_repo,
-            blob_repo=self.blob_repo,
-            temp_dir=self.temp_dir,
-            _vars=variables,
-        )
-
-    async def run(self, target_output: None | str = None):
-        """
-        Run the subset of the flow required to get the target output.
-        If the action has already been run, the cached output will be returned.
-
-        Parameters
-        ----------
-        target_output : None | str
-            the output to return (defaults to `default_output` in the config, or the last action's output if not set)
-        """
+        # the derived flows share the action service, with its loaded actions, compiled plan and running tasks;
+        # only the variables differ, and they namespace the tasks of each run
+        flows = copy.copy(self)
+        flows.variables = self.variables | kwargs
+        flows._owns_resources = False
+        return flows
 
+    def _get_target_declarations(
+        self, target_output: TargetOutput
+    ) -> VarDeclaration | list[VarDeclaration] | dict[str, VarDeclaration]:
         if target_output is None:
             target_output = self.action_config.get_default_output()
+        if isinstance(target_output, str):
+            return VarDeclaration(var=target_output)
+        if isinstance(target_output, list):
+            return [VarDeclaration(var=output) for output in target_output]
+        return {
+            name: VarDeclaration(var=output) for name, output in target_output.items()
+        }
 
+    def _check_targets(
+        self,
+        declarations: VarDeclaration | list[VarDeclaration] | dict[str, VarDeclaration],
+        variables: dict[str, Any],
+    ) -> None:
         if not check_config_consistency(
             self.log,
             self.action_config,
-            set(self.variables),
-            target_output,
+            set(variables),
+            [declaration.var for declaration in _list_declarations(declarations)],
         ):
             raise ValueError("Flow references unset variables")
 
-        declaration = VarDeclaration(
-            var=target_output,
-        )
+    async def _stream_targets(
+        self,
+        declarations: VarDeclaration | list[VarDeclaration] | dict[str, VarDeclaration],
+        variables: dict[str, Any],
+        partial: bool,
+    ) -> AsyncIterator[Any]:
+        declaration_list = _list_declarations(declarations)
+        dependencies = {
+            (dependency_id, partial)
+            for declaration in declaration_list
+            for dependency_id in declaration.get_dependencies()
+        }
+        # only run the parts of the loops that the targets reference
+        loops = {
+            executable_id: frozenset(executable.flow)
+            for executable_id, executable in self.action_config.flow.items()
+            if isinstance(executable, Loop)
+        }
+        loop_references = get_loop_references(declaration_list, loops)
 
-        dependencies = declaration.get_dependencies()
-        if len(dependencies) != 1:
-            raise NotImplementedError("Only one dependency is supported for now")
-        executable_id = list(dependencies)[0]
+        task_prefix = _get_task_prefix(variables)
+        # all the targets are resolved together, so the actions they share run once
+        with trace_span("flow", task_prefix.rstrip("/") or "flow"):
+            async for context in self.action_service.stream_executable_tasks(
+                self.log,
+                dependencies,
+                variables,
+                task_prefix=task_prefix,
+                loop_references=loop_references,
+            ):
+                if is_sentinel(context):
+                    return
+                if isinstance(declarations, VarDeclaration):
+                    yield await declarations.render(context)
+                elif isinstance(declarations, list):
+                    yield [
+                        await declaration.render(context)
+                        for declaration in declarations
+                    ]
+                else:
+                    yield {
+                        name: await declaration.render(context)
+                        for name, declaration in declarations.items()
+                    }
 
-        outputs = await self.action_service.run_executable(
-            self.log,
-            executable_id=executable_id,
-            variables=self.variables,
-        )
-        context = {
-            executable_id: outputs,
-        }
+    async def run(self, target_output: TargetOutput = None):
+        """
+        Run the subset of the flow required to get the target output.
+        If the action has already been run, the cached output will be returned.
 
-        return await declaration.render(context)
+        Parameters
+        ----------
+        target_output : None | str | list[str] | dict[str, str]
+            the output to return (defaults to `default_output` in the config, or the last action's output if not set);
+            given a list or dict of outputs, returns a list or dict of their values, running the actions they share once
+        """
+        declarations = self._get_target_declarations(target_output)
+        self._check_targets(declarations, self.variables)
+        return await iterator_to_coro(
+            self._stream_targets(declarations, self.variables, partial=False)
+        )
 
-    async def stream(self, target_output: None | str = None):
+    async def stream(self, target_output: TargetOutput = None):
         """
         Run the subset of the flow required to get the target output, and asynchronously iterate the output.
         If the action has already been run, the cached output will be returned.
 
         Parameters
         ----------
-        target_output : None | str
-            the output to return (defaults to `default_output` in the config, or the last action's output if not set)
+        target_output : None | str | list[str] | dict[str, str]
+            the output to return (defaults to `default_output` in the config, or the last action's output if not set);
+            given a list or dict of outputs, yields a list or dict of their values once each of them has one
         """
-        if target_output is None:
-            target_output = self.action_config.get_default_output()
-
-        if not check_config_consistency(
-            self.log,
-            self.action_config,
-            set(self.variables),
-            target_output,
+        declarations = self._get_target_declarations(target_output)
+        self._check_targets(declarations, self.variables)
+        async for outputs in self._stream_targets(
+            declarations, self.variables, partial=True
         ):
-            raise ValueError("Flow references unset variables")
+            yield outputs
 
-        declaration = VarDeclaration(
-            var=target_output,
+    async def _stream_many(
+        self,
+        variable_sets: Iterable[dict[str, Any]] | AsyncIterable[dict[str, Any]],
+        target_output: TargetOutput,
+        max_concurrency: int,
+        partial: bool,
+        processes: int | None = None,
+    ) -> AsyncIterator[BatchResult]:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if processes is not None:
+            async for result in stream_many_in_processes(
+                self,
+                variable_sets,
+                target_output,
+                max_concurrency,
+                partial,
+                processes,
+            ):
+                yield result
+            return
+
+        declarations = self._get_target_declarations(target_output)
+        # the consistency check only depends on which variables are set
+        checked_variable_names = set()
+
+        # bounding the queue stops new runs from starting while the consumer is behind
+        queue: asyncio.Queue[BatchResult | None] = asyncio.Queue(
+            maxsize=max_concurrency
         )
+        slots = asyncio.Semaphore(max_concurrency)
+        tasks = set()
 
-        dependencies = declaration.get_dependencies()
-        if len(dependencies) != 1:
-            raise NotImplementedError("Only one dependency is supported for now")
-        executable_id = list(dependencies)[0]
+        async def run_item(index: int, item_variables: dict[str, Any]):
+            variables = self.variables | item_variables
+            try:
+                variable_names = frozenset(variables)
+                if variable_names not in checked_variable_names:
+                    self._check_targets(declarations, variables)
+                    checked_variable_names.add(variable_names)
 
-        async for outputs in self.action_service.stream_executable(
-            self.log,
-            executable_id=executable_id,
-            variables=self.variables,
+                outputs = _no_outputs
+                async for outputs in self._stream_targets(
+                    declarations,
+                    variables,
+                    partial=partial,
+                ):
+                    if partial:
+                        await queue.put(
+                            BatchResult(index, variables, outputs, finished=False)
+                        )
+                if outputs is _no_outputs:
+                    raise RuntimeError("Flow did not produce an output")
+                result = BatchResult(index, variables, outputs)
+            except Exception as e:
+                self.log.exception("Batch item failed", index=index)
+                result = BatchResult(index, variables, error=e)
+            try:
+                await queue.put(result)
+            finally:
+                slots.release()
+
+        async def schedule():
+            try:
+                index = 0
+                async for item_variables in iterate_any(variable_sets):
+                    await slots.acquire()
+                    task = asyncio.create_task(run_item(index, item_variables))
+                    tasks.add(task)
+                    # finished tasks are dropped, so a long batch doesn't accumulate them
+                    task.add_done_callback(tasks.discard)
+                    index += 1
+                await asyncio.gather(*tasks)
+            finally:
+                await queue.put(None)
+
+        scheduler = asyncio.create_task(schedule())
+        try:
+            while (result := await queue.get()) is not None:
+                yield result
+            # propagate an exception raised while iterating the variable sets
+            await scheduler
+        finally:
+            scheduler.cancel()
+            for task in list(tasks):
+                task.cancel()
+            await asyncio.gather(scheduler, *tasks, return_exceptions=True)
+
+    async def run_many(
+        self,
+        variable_sets: Iterable[dict[str, Any]] | AsyncIterable[dict[str, Any]],
+        target_output: TargetOutput = None,
+        max_concurrency: int = 16,
+        processes: int | None = None,
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Run the flow once for each set of variables, concurrently, and asynchronously iterate the results
+        in the order they finish.
+        The runs share the action service: runs with the same variables share their actions' tasks,
+        and the others reuse cached outputs.
+        Given `processes`, the runs are spread across that many worker processes instead,
+        each with its own action service, sharing the cache and blob repos.
+
+        Parameters
+        ----------
+        variable_sets : Iterable[dict[str, Any]] | AsyncIterable[dict[str, Any]]
+            the variables of each run, set on top of the flow's variables;
+            they're consumed as runs finish, so they needn't be held in memory at once
+        target_output : None | str | list[str] | dict[str, str]
+            the output to return for each run, as in `run`
+        max_concurrency : int
+            how many runs may be in progress at once (per process, if `processes` is set)
+        processes : None | int
+            how many worker processes to run the flows in, so CPU-bound work uses more than one core;
+            the cache and blob repos must be safe to share between processes, and the outputs must be picklable
+        """
+        async for result in self._stream_many(
+            variable_sets, target_output, max_concurrency, False, processes
+        ):
+            yield result
+
+    async def stream_many(
+        self,
+        variable_sets: Iterable[dict[str, Any]] | AsyncIterable[dict[str, Any]],
+        target_output: TargetOutput = None,
+        max_concurrency: int = 16,
+        processes: int | None = None,
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Like `run_many`, but also yield each run's partial outputs as they stream in;
+        each run's final result has `finished` set.
+        """
+        async for result in self._stream_many(
+            variable_sets, target_output, max_concurrency, True, processes
         ):
-            context = {
-                executable_id: outputs,
-            }
+            yield result
+
+
+_no_outputs = object()
+
+
+def _list_declarations(
+    declarations: VarDeclaration | list[VarDeclaration] | dict[str, VarDeclaration],
+) -> list[VarDeclaration]:
+    if isinstance(declarations, VarDeclaration):
+        return [declarations]
+    if isinstance(declarations, list):
+        return declarations
+    return list(declarations.values())
+
+
+_unkeyed_runs = itertools.count()
+
 
-            yield await declaration.render(context)
+def _get_task_prefix(variables: dict[str, Any]) -> str:
+    """
+    Get the namespace of a run's tasks in the shared action service.
+    Runs with the same variables share their tasks, so they don't run the same actions twice at once.
+    """
+    if not variables:
+        return ""
+    try:
+        dumped = json.dumps(variables, sort_keys=True)
+    except (TypeError, ValueError):
+        # can't tell whether they're the same as another run's, so keep the run's tasks apart
+        return f"run-{next(_unkeyed_runs)}/"
+    return f"{hashlib.sha256(dumped.encode()).hexdigest()[:16]}/"
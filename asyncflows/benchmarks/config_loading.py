@@ -0,0 +1,48 @@
+import time
+
+import yaml
+
+from asyncflows.models.config.flow import build_hinted_action_config
+from asyncflows.utils.loader_utils import get_config_model, load_config_text
+
+CONFIG = """
+flow:
+  answer:
+    action: prompt
+    prompt:
+      - role: user
+      - text: What is the meaning of life?
+  extract:
+    action: extract_xml_tag
+    text:
+      link: answer.result
+    tag: answer
+"""
+
+
+def _time_loads(iterations: int, uncached: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if uncached:
+            # what `load_config_text` used to do on every load
+            build_hinted_action_config().model_validate(yaml.safe_load(CONFIG))
+        else:
+            load_config_text(CONFIG)
+    return (time.perf_counter() - start) / iterations
+
+
+def main(iterations: int = 20):
+    # load the action registry up front, so it isn't included in either measurement
+    get_config_model()
+
+    uncached = _time_loads(iterations, uncached=True)
+    cached = _time_loads(iterations, uncached=False)
+
+    print(
+        f"load_config_text: {uncached * 1e3:.1f}ms uncached, {cached * 1e3:.1f}ms cached "
+        f"({uncached / cached:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import subprocess
+import sys
+import textwrap
+
+CONFIG = """
+flow:
+  extract:
+    action: extract_xml_tag
+    text: <answer>42</answer>
+    tag: answer
+"""
+
+SETUP = "import asyncflows"
+
+STATEMENTS = {
+    "import asyncflows": "pass",
+    "import all actions": textwrap.dedent(
+        """
+        from asyncflows.utils.action_utils import get_actions_dict, recursive_import
+        recursive_import("asyncflows.actions")
+        get_actions_dict()
+        """
+    ),
+    "get one action": textwrap.dedent(
+        """
+        from asyncflows.utils.action_utils import get_action_type
+        get_action_type("extract_xml_tag")
+        """
+    ),
+    "load one-action config": textwrap.dedent(
+        f"""
+        from asyncflows.utils.loader_utils import load_config_text
+        load_config_text({CONFIG!r})
+        """
+    ),
+}
+
+
+def _time_statement(statement: str, repeat: int) -> float:
+    # each measurement runs in a fresh interpreter, so nothing is imported yet
+    script = "\n".join(
+        [
+            "import time",
+            "start = time.perf_counter()",
+            SETUP,
+            statement.strip(),
+            "print(time.perf_counter() - start)",
+        ]
+    )
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return min(times)
+
+
+def main(repeat: int = 3):
+    for name, statement in STATEMENTS.items():
+        elapsed = _time_statement(statement, repeat)
+        print(f"{name}: {elapsed * 1e3:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import structlog
+
+from asyncflows.utils.async_utils import Timer, measure_async_iterator
+
+# futures awaited per token, as when reading a streamed response off a socket
+AWAITS_PER_TOKEN = 3
+
+
+async def _stream_tokens(tokens: int):
+    loop = asyncio.get_running_loop()
+    for i in range(tokens):
+        for _ in range(AWAITS_PER_TOKEN):
+            future = loop.create_future()
+            loop.call_soon(future.set_result, None)
+            await future
+        yield i
+
+
+async def _time_stream(tokens: int, mode: str | None) -> float:
+    log = structlog.get_logger()
+    start = time.perf_counter()
+    if mode is None:
+        async for _ in _stream_tokens(tokens):
+            pass
+    else:
+        timer = Timer(sample_interval=16 if mode == "sampled" else 1)
+        async for _ in measure_async_iterator(
+            log, _stream_tokens(tokens), timer, mode=mode
+        ):
+            pass
+    return (time.perf_counter() - start) / tokens
+
+
+async def main(tokens: int = 5000):
+    # don't measure the debug logs `full` mode emits
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(20),
+    )
+
+    baseline = await _time_stream(tokens, None)
+    print(f"uninstrumented: {baseline * 1e6:.1f}us per token")
+    for mode in ("off", "sampled", "full"):
+        per_token = await _time_stream(tokens, mode)
+        print(
+            f"{mode}: {per_token * 1e6:.1f}us per token "
+            f"(+{(per_token - baseline) * 1e6:.1f}us overhead)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
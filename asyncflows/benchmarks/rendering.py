@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import simpleeval
+
+from asyncflows.models.config.value_declarations import LambdaDeclaration
+from asyncflows.utils.rendering_utils import render_template, render_var, template_cache
+
+TEMPLATE = """
+{% for doc in retrieval.result %}
+---
+{{ doc }}
+---
+{% endfor %}
+Question: {{ question }}
+"""
+
+CONTEXT = {
+    "retrieval": {"result": [f"document {i}" for i in range(5)]},
+    "question": "What is the meaning of life?",
+}
+
+
+async def _time_renders(iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await render_template(TEMPLATE, CONTEXT)
+    return (time.perf_counter() - start) / iterations
+
+
+async def _time_var_path(iterations: int) -> tuple[float, float]:
+    var_template = "{{ retrieval.result[0] }}"
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await render_template(var_template, CONTEXT)
+    jinja_time = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await render_var("retrieval.result[0]", CONTEXT)
+    accessor_time = (time.perf_counter() - start) / iterations
+
+    return jinja_time, accessor_time
+
+
+async def _time_lambda(iterations: int) -> tuple[float, float]:
+    expr = "[doc for doc in retrieval.result if doc != 'document 0']"
+    declaration = LambdaDeclaration(**{"lambda": expr})
+
+    # what `LambdaDeclaration.render` used to do on every evaluation
+    start = time.perf_counter()
+    for _ in range(iterations):
+        evaluator = simpleeval.EvalWithCompoundTypes(
+            names=CONTEXT, functions={"range": range}
+        )
+        evaluator.eval(expr)
+    simpleeval_time = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await declaration.render(CONTEXT)
+    compiled_time = (time.perf_counter() - start) / iterations
+
+    return simpleeval_time, compiled_time
+
+
+async def main(iterations: int = 2000):
+    maxsize_bak = template_cache.maxsize
+
+    template_cache.clear()
+    template_cache.maxsize = 0
+    uncached = await _time_renders(iterations)
+
+    template_cache.clear()
+    template_cache.maxsize = maxsize_bak
+    cached = await _time_renders(iterations)
+
+    print(
+        f"render_template: {uncached * 1e6:.1f}us uncached, {cached * 1e6:.1f}us cached "
+        f"({uncached / cached:.1f}x)"
+    )
+    print(f"cache hits: {template_cache.hits}, misses: {template_cache.misses}")
+
+    jinja_time, accessor_time = await _time_var_path(iterations)
+    print(
+        f"var path: {jinja_time * 1e6:.1f}us via jinja (cached), "
+        f"{accessor_time * 1e6:.1f}us via accessor ({jinja_time / accessor_time:.1f}x)"
+    )
+
+    simpleeval_time, compiled_time = await _time_lambda(iterations)
+    print(
+        f"lambda: {simpleeval_time * 1e6:.1f}us via simpleeval, "
+        f"{compiled_time * 1e6:.1f}us compiled ({simpleeval_time / compiled_time:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
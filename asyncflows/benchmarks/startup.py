@@ -0,0 +1,236 @@
+"""
+Measure how long asyncflows takes to start up, each measurement in a fresh interpreter:
+- `import asyncflows`, with the import time attributed to the top-level packages it pulls in
+- loading each example config in `asyncflows/examples`, cold and with the config model cached
+- loading the hello world example and running it for the first time, with the prompt mocked
+
+Write the results as JSON with `--output`, and compare them against an earlier run with `--baseline`.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+from typing import Any
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples")
+
+# `-X importtime` lines look like `import time:       123 |       4567 |   package.module`
+_import_time_pattern = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+_load_config_script = """
+import json, time
+start = time.perf_counter()
+from asyncflows.utils.loader_utils import load_config_file
+load_config_file({path!r})
+cold = time.perf_counter() - start
+start = time.perf_counter()
+load_config_file({path!r})
+warm = time.perf_counter() - start
+print(json.dumps({{"cold_ms": cold * 1e3, "warm_ms": warm * 1e3}}))
+"""
+
+_first_run_script = """
+import asyncio, json, tempfile, time
+from unittest.mock import patch
+start = time.perf_counter()
+from asyncflows import AsyncFlows
+from asyncflows.actions.prompt import Prompt, Outputs
+imported = time.perf_counter()
+
+async def run(self, inputs):
+    yield Outputs(result="Hello world", response="Hello world", data=None)
+
+async def main():
+    flows = AsyncFlows.from_file({path!r})
+    loaded = time.perf_counter()
+    await flows.run("hello_world.result")
+    first_run = time.perf_counter()
+    await flows.set_vars(attempt=2).run("hello_world.result")
+    second_run = time.perf_counter()
+    await flows.close()
+    return loaded, first_run, second_run
+
+with patch.object(Prompt, "run", new=run), tempfile.TemporaryDirectory() as temp_dir:
+    import os
+    os.chdir(temp_dir)
+    loaded, first_run, second_run = asyncio.run(main())
+print(json.dumps({{
+    "import_ms": (imported - start) * 1e3,
+    "load_ms": (loaded - imported) * 1e3,
+    "first_run_ms": (first_run - loaded) * 1e3,
+    "second_run_ms": (second_run - first_run) * 1e3,
+    "total_ms": (first_run - start) * 1e3,
+}}))
+"""
+
+
+def _run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+
+def _run_script(script: str) -> dict[str, float]:
+    output = _run_python("-c", script).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _min_runs(runs: list[dict[str, float]]) -> dict[str, float]:
+    # the minimum is the least noisy estimate of how long something takes
+    return {key: min(run[key] for run in runs) for key in runs[0]}
+
+
+def measure_import(repeat: int, top: int) -> dict[str, Any]:
+    runs = []
+    for _ in range(repeat):
+        stderr = _run_python("-X", "importtime", "-c", "import asyncflows").stderr
+        total_us = 0
+        package_us: dict[str, int] = {}
+        for line in stderr.splitlines():
+            match = _import_time_pattern.match(line)
+            if match is None:
+                continue
+            self_us, cumulative_us, indent, module = match.groups()
+            package = module.split(".")[0]
+            package_us[package] = package_us.get(package, 0) + int(self_us)
+            if len(indent) == 1:
+                # top-level imports sum up to the total
+                total_us += int(cumulative_us)
+        runs.append(
+            {"total_ms": total_us / 1e3}
+            | {package: us / 1e3 for package, us in package_us.items()}
+        )
+
+    times = _min_runs([{key: run.get(key, 0) for key in runs[0]} for run in runs])
+    total_ms = times.pop("total_ms")
+    packages = sorted(times.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "total_ms": total_ms,
+        # time spent in each package's own modules, excluding the packages they import
+        "packages_ms": dict(packages[:top]),
+    }
+
+
+def measure_config_loads(repeat: int) -> dict[str, dict[str, float]]:
+    results = {}
+    for filename in sorted(os.listdir(EXAMPLES_DIR)):
+        if not filename.endswith(".yaml"):
+            continue
+        script = _load_config_script.format(path=os.path.join(EXAMPLES_DIR, filename))
+        results[filename[:-5]] = _min_runs([_run_script(script) for _ in range(repeat)])
+    return results
+
+
+def measure_first_run(repeat: int) -> dict[str, float]:
+    script = _first_run_script.format(
+        path=os.path.join(EXAMPLES_DIR, "hello_world.yaml")
+    )
+    return _min_runs([_run_script(script) for _ in range(repeat)])
+
+
+def run_benchmarks(repeat: int = 3, top: int = 15) -> dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "import": measure_import(repeat, top),
+        "config_load": measure_config_loads(repeat),
+        "first_run": measure_first_run(repeat),
+    }
+
+
+def _flatten(results: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat |= _flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare_results(
+    results: dict[str, Any],
+    baseline: dict[str, Any],
+    budget: float,
+) -> list[str]:
+    """
+    Compare the timings against the baseline's,
+    returning a line for each that's slower by more than the `budget` fraction.
+    """
+    flat_results = _flatten(results)
+    flat_baseline = _flatten(baseline)
+    regressions = []
+    for key, value in flat_results.items():
+        if key.startswith("import.packages_ms."):
+            # the breakdown is informative, the total is what's budgeted
+            continue
+        baseline_value = flat_baseline.get(key)
+        if not baseline_value:
+            continue
+        if value > baseline_value * (1 + budget):
+            regressions.append(
+                f"{key}: {value:.1f}ms vs {baseline_value:.1f}ms "
+                f"(+{(value / baseline_value - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def _print_results(results: dict[str, Any]):
+    import_results = results["import"]
+    print(f"import asyncflows: {import_results['total_ms']:.0f}ms")
+    for package, ms in import_results["packages_ms"].items():
+        print(f"  {package}: {ms:.0f}ms")
+    print("config load (cold / warm):")
+    for example, times in results["config_load"].items():
+        print(f"  {example}: {times['cold_ms']:.0f}ms / {times['warm_ms']:.1f}ms")
+    first_run = results["first_run"]
+    print(
+        f"hello world: {first_run['total_ms']:.0f}ms to first result "
+        f"(import {first_run['import_ms']:.0f}ms, load {first_run['load_ms']:.0f}ms, "
+        f"run {first_run['first_run_ms']:.0f}ms, then {first_run['second_run_ms']:.1f}ms)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--top", type=int, default=15, help="Number of packages in the import breakdown"
+    )
+    parser.add_argument("--output", help="File to write the results to as JSON")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=0.2,
+        help="Fraction by which a timing may exceed the baseline's",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.top)
+    _print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.budget)
+        if regressions:
+            print("regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,16 @@
 import inspect
 import typing
 import structlog
-from typing import ClassVar, Type, Any, Optional, TypeVar, Generic, AsyncIterator
+from typing import (
+    ClassVar,
+    Type,
+    Any,
+    Optional,
+    TypeVar,
+    Generic,
+    AsyncIterator,
+    Callable,
+)
 
 from pydantic import Field
 
@@ -11,8 +20,11 @@ from asyncflows.models.config.value_declarations import (
 )
 from asyncflows.models.io import Inputs, Outputs
 from asyncflows.models.primitives import ExecutableName
+from asyncflows.utils.executor_utils import ExecutorType, run_in_executor
 from asyncflows.utils.request_utils import request_text, request_read
 
+T = TypeVar("T")
+
 
 class ActionInvocation(ExtraModel):
     action: ExecutableName
@@ -20,6 +32,11 @@ class ActionInvocation(ExtraModel):
         None,
         description="The cache key for this action's result. Should be unique among all actions.",
     )
+    coalesce_inputs: None | bool = Field(
+        None,
+        description="Whether to run this action only on the most recent partial inputs once its previous run finishes, "
+        "instead of on every partial input. Overrides the flow's `coalesce_inputs`.",
+    )
 
 
 class ActionMeta(type):
@@ -74,11 +91,24 @@ class InternalActionBase(Generic[Inputs, Outputs], metaclass=ActionMeta):
     cache: bool = True
 
     #: The version of the action, used to persist cache across project changes.
-    # Optional, defaults to `None` (never cache across project changes).
+    # Optional, defaults to `None` (persist cache only while the source of the action's module is unchanged).
     version: None | int = None
 
+    #: Where `run_blocking` runs the action's blocking calls, off the event loop:
+    # `thread` for I/O and code that releases the GIL, `process` for CPU-bound code.
+    # Optional, defaults to `thread`.
+    executor: ClassVar[ExecutorType] = "thread"
+
     ### Helpers
 
+    async def run_blocking(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Run a blocking call in the engine's pool of the action's `executor`, so other actions keep running.
+        With the `process` executor, the function, its arguments and its result must be picklable
+        (e.g., a module-level function of plain values).
+        """
+        return await run_in_executor(self.executor, func, *args, **kwargs)
+
     async def request_read(
         self, url: str, method: str = "GET", fields: None | list[dict] = None, **kwargs
     ) -> bytes:
@@ -1,4 +1,4 @@
-from typing import Union
+from typing import Literal, Union
 
 from pydantic import Field
 
@@ -7,6 +7,7 @@ from asyncflows.models.config.action import (
 )
 from asyncflows.models.config.common import StrictModel
 from asyncflows.models.config.model import ModelConfig
+from asyncflows.utils.async_utils import FailurePolicy, InstrumentationMode
 from asyncflows.utils.type_utils import transform_and_templatify_type
 from asyncflows.models.config.value_declarations import ValueDeclaration
 from asyncflows.models.primitives import (
@@ -32,6 +33,16 @@ class Loop(StrictModel):
         alias="in",
     )
     flow: "FlowConfig"
+    max_concurrency: int | None = Field(
+        None,
+        gt=0,
+        description="The maximum number of iterations to run at once; unbounded if not set.",
+    )
+    ordered: bool = Field(
+        True,
+        description="Whether the loop's outputs are in the order of the iterated items, "
+        "or in the order the iterations finish.",
+    )
 
 
 def build_model_config(
@@ -52,10 +63,36 @@ def build_model_config(
 
 ModelConfigDeclaration = build_model_config()
 
+# how an action's outputs are queued for each of its subscribers:
+# - `unbounded` queues every output
+# - `block` makes the action wait while a subscriber's queue is full;
+#   merging them with other outputs on the way to the subscriber buffers at most as many again
+# - `keep_latest` drops a subscriber's oldest queued outputs to make room for new ones
+BroadcastPolicy = Literal["unbounded", "block", "keep_latest"]
+
 
 class ActionConfig(StrictModel):
     default_model: ModelConfigDeclaration = ModelConfig()  # type: ignore
     action_timeout: float = 360
+    # run actions only on their most recent partial inputs, instead of on every partial input
+    coalesce_inputs: bool = False
+    broadcast_policy: BroadcastPolicy = "unbounded"
+    # the per-subscriber queue size for the `block` and `keep_latest` broadcast policies
+    broadcast_queue_size: int = Field(16, gt=0)
+    # what happens to an executable's other dependencies when one of them fails:
+    # - `continue` lets them finish, and the executable gets no inputs once they have
+    # - `fail_fast` cancels them right away, stopping the actions no one else is waiting on;
+    #   an action fails if it raises (unless its outputs may be None), or a loop if an iteration fails
+    failure_policy: FailurePolicy = "continue"
+    # how actions' blocking time is measured and their timeout enforced
+    instrumentation: InstrumentationMode = "full"
+    # under `sampled` instrumentation, time one in every this many of an action's steps
+    instrumentation_sample_interval: int = Field(16, gt=0)
+    # warn when the event loop lags by more than this many seconds,
+    # attributing the lag to the action that blocked it (by its measured blocking time)
+    lag_threshold: float | None = Field(None, gt=0)
+    # with `lag_threshold` set, also sample the stack of the call blocking the loop, from a watchdog thread
+    lag_stack_sampling: bool = False
     flow: "FlowConfig"
     default_output: ContextVarPath | None = None  # TODO `| ValueDeclaration`
 
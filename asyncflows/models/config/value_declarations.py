@@ -1,11 +1,9 @@
-import ast
 import os
 import types
 import typing
 from typing import Any, Union, Annotated
 
 import pydantic
-import simpleeval
 from pydantic import Field, ConfigDict
 from pydantic.fields import FieldInfo
 from typing_extensions import Self
@@ -26,7 +24,7 @@ from asyncflows.models.primitives import (
     ContextVarName,
     HintLiteral,
 )
-from asyncflows.utils.config_utils import get_names_from_ast, verify_ast
+from asyncflows.utils.lambda_utils import compile_lambda, get_lambda_dependencies
 from asyncflows.utils.type_utils import get_var_string
 
 
@@ -273,21 +271,10 @@ You can also use list comprehension and conditionals:
     )
 
     def get_dependencies(self) -> set[ContextVarName]:
-        parsed_code = ast.parse(self.lambda_, mode="eval")
-        return get_names_from_ast(parsed_code)
+        return set(get_lambda_dependencies(self.lambda_))
 
     async def render(self, context: dict[str, Any]) -> Any:
-        verify_ast(ast.parse(self.lambda_))
-
-        simpleeval.MAX_COMPREHENSION_LENGTH = 9999999999999
-
-        evaluator = simpleeval.EvalWithCompoundTypes(
-            names=context,
-            functions={
-                "range": range,
-            },
-        )
-        return evaluator.eval(self.lambda_)
+        return compile_lambda(self.lambda_)(context)
 
 
 ValueDeclaration = Union[
@@ -11,11 +11,22 @@ from pydantic import PrivateAttr
 from asyncflows.models.io import Field, BaseModel
 from asyncflows.models.blob import Blob
 from asyncflows.repos.blob_repo import BlobRepo
+from asyncflows.utils.executor_utils import run_in_executor
 from asyncflows.utils.request_utils import request_read
 
 URL = typing.NewType("URL", str)
 
 
+def _hash_file(filepath: str) -> str:
+    with open(filepath, "rb") as f:
+        return sha256(f.read()).hexdigest()
+
+
+def _write_file(filepath: str, content: bytes) -> None:
+    with open(filepath, "wb") as f:
+        f.write(content)
+
+
 class File(BaseModel):
     sources: list[Blob | URL] = Field(
         description="List of blobs or URLs to download the file from"
@@ -37,9 +48,7 @@ class File(BaseModel):
         filepath = await self.download_file(log, temp_dir, blob_repo)
         if filepath is None:
             return None
-        with open(filepath, "rb") as f:
-            content = f.read()
-            return sha256(content).hexdigest()
+        return await run_in_executor("thread", _hash_file, filepath)
 
     async def _download_file(
         self,
@@ -69,8 +78,7 @@ class File(BaseModel):
                     except Exception as e:
                         log.warning("Failed to download file", url=source, error=str(e))
                         continue
-                    with open(temp_file, "wb") as f:
-                        f.write(response)
+                    await run_in_executor("thread", _write_file, temp_file, response)
                     filepath = temp_file
                     break
                 else:
@@ -16,11 +16,19 @@ from botocore.exceptions import BotoCoreError
 
 from asyncflows.models.blob import Blob
 from asyncflows.utils.async_utils import Timer
+from asyncflows.utils.executor_utils import run_in_executor
+from asyncflows.utils.metrics_utils import metrics
 from asyncflows.utils.redis_utils import get_aioredis
 from asyncflows.utils.secret_utils import get_secret
 
 Value = bytes
 
+blob_operation_seconds = metrics.histogram(
+    "asyncflows_blob_operation_seconds",
+    "Wall time of blob repo operations",
+    ("repo", "operation"),
+)
+
 
 class BlobRepo:
     def __init__(self, temp_dir: str):
@@ -59,6 +67,9 @@ class BlobRepo:
             namespace=namespace,
         )
         timer.end()
+        blob_operation_seconds.observe(
+            timer.wall_time, repo=type(self).__name__, operation="save"
+        )
         log.info(
             "Saved blob",
             blob=blob,
@@ -97,6 +108,9 @@ class BlobRepo:
         timer.start()
         value = await self._retrieve(log=log, blob=blob, namespace=namespace)
         timer.end()
+        blob_operation_seconds.observe(
+            timer.wall_time, repo=type(self).__name__, operation="retrieve"
+        )
         log.info(
             "Retrieved blob",
             blob=blob,
@@ -144,6 +158,9 @@ class BlobRepo:
         timer.start()
         exists = await self._exists(log, blob, namespace)
         timer.end()
+        blob_operation_seconds.observe(
+            timer.wall_time, repo=type(self).__name__, operation="exists"
+        )
         log.info(
             "Checked blob existence",
             blob=blob,
@@ -175,6 +192,9 @@ class BlobRepo:
         timer.start()
         path = await self._download(log, blob, namespace)
         timer.end()
+        blob_operation_seconds.observe(
+            timer.wall_time, repo=type(self).__name__, operation="download"
+        )
         log.info(
             "Downloaded blob",
             blob=blob,
@@ -203,6 +223,9 @@ class BlobRepo:
         timer.start()
         await self._delete(log, blob, namespace)
         timer.end()
+        blob_operation_seconds.observe(
+            timer.wall_time, repo=type(self).__name__, operation="delete"
+        )
         log.info(
             "Deleted blob",
             blob=blob,
@@ -343,7 +366,22 @@ class RedisBlobRepo(BlobRepo):
         await self.redis.delete(f"blob:{namespace}:{blob.id}")
 
 
+def _write_file(path: str, value: Value) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(value)
+
+
+def _read_file(path: str) -> Optional[Value]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
 class FilesystemBlobRepo(BlobRepo):
+    # the file I/O runs in the engine's thread pool, off the event loop
+
     async def _save(
         self,
         log: structlog.stdlib.BoundLogger,
@@ -351,14 +389,10 @@ class FilesystemBlobRepo(BlobRepo):
         value: Value,
         namespace: str,
     ) -> Blob:
-        blob_dir = os.path.join(self.temp_dir, "blobs", namespace)
-        os.makedirs(blob_dir, exist_ok=True)
-
-        path = os.path.join(blob_dir, blob.id)
+        path = os.path.join(self.temp_dir, "blobs", namespace, blob.id)
         if blob.file_extension is not None:
             path += f".{blob.file_extension}"
-        with open(path, "wb") as f:
-            f.write(value)
+        await run_in_executor("thread", _write_file, path, value)
         return blob
 
     async def _extend_ttl(
@@ -373,10 +407,7 @@ class FilesystemBlobRepo(BlobRepo):
         self, log: structlog.stdlib.BoundLogger, blob: Blob, namespace: str
     ) -> Optional[Value]:
         path = os.path.join(self.temp_dir, "blobs", namespace, blob.id)
-        if not os.path.exists(path):
-            return None
-        with open(path, "rb") as f:
-            return f.read()
+        return await run_in_executor("thread", _read_file, path)
 
     async def _multi_retrieve(
         self, log: structlog.stdlib.BoundLogger, blobs: list[Blob], namespace: str
@@ -406,7 +437,7 @@ class FilesystemBlobRepo(BlobRepo):
         namespace: str,
     ) -> None:
         path = os.path.join(self.temp_dir, "blobs", namespace, blob.id)
-        os.remove(path)
+        await run_in_executor("thread", os.remove, path)
 
 
 class S3BlobRepo(BlobRepo):
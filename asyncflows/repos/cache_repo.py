@@ -1,16 +1,28 @@
 import asyncio
 import logging
 import os
+import pickle
 import shelve
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import timedelta
-from typing import Any
+from typing import Any, Callable, TypeVar
 
 import structlog
 import tenacity
 
-from asyncflows.utils.cache_utils import _get_latest_modified_timestamp
 from asyncflows.utils.redis_utils import get_aioredis
 
+try:
+    import fcntl
+except ImportError:
+    # not available on windows, where the shelf isn't locked across processes
+    fcntl = None
+
+T = TypeVar("T")
+
 
 class CacheRepo:
     def __init__(self, temp_dir: str):
@@ -20,20 +32,21 @@ class CacheRepo:
     async def close(self):
         pass
 
-    def _prepare_key(self, key: Any, version: None | int) -> str:
+    def _prepare_key(self, key: Any, version: None | int | str) -> str:
+        # an int is an action's declared `version`, a str its source fingerprint
         str_key = str(key)
         if version is None:
-            version_modifier = f"t{_get_latest_modified_timestamp()}"
-        else:
-            version_modifier = f"v{version}"
-        return f"{str_key}:{version_modifier}"
+            return str_key
+        elif isinstance(version, int):
+            return f"{str_key}:v{version}"
+        return f"{str_key}:{version}"
 
     async def store(
         self,
         log: structlog.stdlib.BoundLogger,
         key: Any,
         value: Any,
-        version: None | int,
+        version: None | int | str,
         namespace: None | str = None,
         expire: int | timedelta | None = None,
     ) -> None:
@@ -56,7 +69,7 @@ class CacheRepo:
         self,
         log: structlog.stdlib.BoundLogger,
         key: Any,
-        version: None | int,
+        version: None | int | str,
         namespace: None | str = None,
     ) -> Any | None:
         str_key = self._prepare_key(key, version)
@@ -72,6 +85,51 @@ class CacheRepo:
     ) -> Any | None:
         raise NotImplementedError()
 
+    async def store_many(
+        self,
+        log: structlog.stdlib.BoundLogger,
+        items: dict[Any, Any],
+        version: None | int | str,
+        namespace: None | str = None,
+        expire: int | timedelta | None = None,
+    ) -> None:
+        str_items = {
+            self._prepare_key(key, version): value for key, value in items.items()
+        }
+        if namespace is None:
+            namespace = self.default_namespace
+        await self._store_many(log, str_items, namespace, expire)
+
+    async def _store_many(
+        self,
+        log: structlog.stdlib.BoundLogger,
+        items: dict[str, Any],
+        namespace: str,
+        expire: int | timedelta | None,
+    ) -> None:
+        for key, value in items.items():
+            await self._store(log, key, value, namespace, expire)
+
+    async def retrieve_many(
+        self,
+        log: structlog.stdlib.BoundLogger,
+        keys: list[Any],
+        version: None | int | str,
+        namespace: None | str = None,
+    ) -> list[Any | None]:
+        str_keys = [self._prepare_key(key, version) for key in keys]
+        if namespace is None:
+            namespace = self.default_namespace
+        return await self._retrieve_many(log, str_keys, namespace)
+
+    async def _retrieve_many(
+        self,
+        log: structlog.stdlib.BoundLogger,
+        keys: list[str],
+        namespace: str,
+    ) -> list[Any | None]:
+        return [await self._retrieve(log, key, namespace) for key in keys]
+
 
 class ShelveCacheRepo(CacheRepo):
     def _get_shelf_path(self, namespace: str) -> str:
@@ -83,6 +141,19 @@ class ShelveCacheRepo(CacheRepo):
             writeback=True,
         )
 
+    @contextmanager
+    def _open_shelf(self, namespace: str):
+        # the shelf may be shared by several processes (e.g., `AsyncFlows.run_many` with `processes`),
+        # so only one of them opens it at a time
+        with open(f"{self._get_shelf_path(namespace)}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            shelf = self._load_shelf(namespace)
+            try:
+                yield shelf
+            finally:
+                shelf.close()
+
     async def _store(
         self,
         log: structlog.stdlib.BoundLogger,
@@ -91,9 +162,8 @@ class ShelveCacheRepo(CacheRepo):
         namespace: str,
         expire: int | timedelta | None,
     ) -> None:
-        shelf = self._load_shelf(namespace)
-        shelf[key] = value
-        shelf.close()
+        with self._open_shelf(namespace) as shelf:
+            shelf[key] = value
 
     async def _retrieve(
         self,
@@ -101,12 +171,156 @@ class ShelveCacheRepo(CacheRepo):
         key: str,
         namespace: str,
     ) -> Any | None:
-        shelf = self._load_shelf(namespace)
-        value = shelf.get(key)
-        shelf.close()
+        with self._open_shelf(namespace) as shelf:
+            return shelf.get(key)
+
+
+class SqliteCacheRepo(CacheRepo):
+    """
+    Cache in a SQLite database in the temp dir, over a single long-lived connection in WAL mode.
+    The queries run on a thread of the repo's own, off the event loop.
+    Several processes may share the database (e.g., `AsyncFlows.run_many` with `processes`).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.db_path = os.path.join(self.temp_dir, "cache.sqlite3")
+        # a single thread, so the connection is only ever used from it
+        self._executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="asyncflows-sqlite-cache",
+        )
+        self._connection: sqlite3.Connection | None = None
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is not None:
+            return self._connection
+        connection = sqlite3.connect(
+            self.db_path,
+            # wait on the other processes' writes
+            timeout=5,
+            isolation_level=None,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        # with WAL, durable across application crashes, just not power loss
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+            """
+        )
+        connection.execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),),
+        )
+        self._connection = connection
+        return connection
 
+    async def _run(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        def run() -> T:
+            return func(self._connect())
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, run)
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+
+        def close_connection():
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, close_connection
+        )
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def _get_expires_at(expire: int | timedelta | None) -> float | None:
+        if expire is None:
+            return None
+        if isinstance(expire, timedelta):
+            expire = expire.total_seconds()
+        return time.time() + expire
+
+    async def _store(
+        self,
+        log: structlog.stdlib.BoundLogger,
+        key: str,
+        value: Any,
+        namespace: str,
+        expire: int | timedelta | None,
+    ) -> None:
+        await self._store_many(log, {key: value}, namespace, expire)
+
+    async def _store_many(
+        self,
+        log: structlog.stdlib.BoundLogger,
+        items: dict[str, Any],
+        namespace: str,
+        expire: int | timedelta | None,
+    ) -> None:
+        expires_at = self._get_expires_at(expire)
+        rows = [
+            (namespace, key, pickle.dumps(value), expires_at)
+            for key, value in items.items()
+        ]
+
+        def store(connection: sqlite3.Connection) -> None:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+
+        await self._run(store)
+
+    async def _retrieve(
+        self,
+        log: structlog.stdlib.BoundLogger,
+        key: str,
+        namespace: str,
+    ) -> Any | None:
+        (value,) = await self._retrieve_many(log, [key], namespace)
         return value
 
+    async def _retrieve_many(
+        self,
+        log: structlog.stdlib.BoundLogger,
+        keys: list[str],
+        namespace: str,
+    ) -> list[Any | None]:
+        def retrieve(connection: sqlite3.Connection) -> dict[str, bytes]:
+            values = {}
+            now = time.time()
+            # within SQLite's default limit on the number of query parameters
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ", ".join("?" * len(batch))
+                values.update(
+                    connection.execute(
+                        f"SELECT key, value FROM cache WHERE namespace = ? "
+                        f"AND key IN ({placeholders}) "
+                        f"AND (expires_at IS NULL OR expires_at > ?)",
+                        (namespace, *batch, now),
+                    ).fetchall()
+                )
+            return values
+
+        values = await self._run(retrieve)
+        return [pickle.loads(values[key]) if key in values else None for key in keys]
+
 
 class RedisCacheRepo(CacheRepo):
     def __init__(self, *args, **kwargs):
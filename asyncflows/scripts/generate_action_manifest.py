@@ -0,0 +1,26 @@
+import argparse
+import importlib
+import os
+
+from asyncflows.utils.action_utils import (
+    ACTION_MANIFEST_FILENAME,
+    build_action_manifest,
+    dump_action_manifest,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--package",
+        default="asyncflows.actions",
+        help="Package of actions to write the manifest of",
+    )
+
+    args = parser.parse_args()
+
+    manifest = build_action_manifest(args.package)
+
+    package = importlib.import_module(args.package)
+    package_dir = os.path.dirname(package.__file__)  # type: ignore
+    with open(os.path.join(package_dir, ACTION_MANIFEST_FILENAME), "w") as f:
+        f.write(dump_action_manifest(manifest) + "\n")
@@ -1,6 +1,10 @@
 import asyncio
+import time
 import traceback
+import weakref
 from collections import defaultdict
+from contextlib import aclosing
+from dataclasses import dataclass
 from typing import Any, AsyncIterator, Iterable
 
 from typing_extensions import assert_never
@@ -23,8 +27,9 @@ from asyncflows.models.config.action import (
     InternalActionBase,
     Action,
 )
-from asyncflows.utils.action_utils import get_actions_dict
-from asyncflows.models.config.flow import ActionConfig, Loop, FlowConfig
+from asyncflows.utils.action_utils import get_action_type
+from asyncflows.utils.cache_utils import get_action_version
+from asyncflows.models.config.flow import ActionConfig, Loop
 from asyncflows.models.config.model import ModelConfig
 from asyncflows.models.config.transform import TransformsInto
 from asyncflows.models.config.value_declarations import (
@@ -33,23 +38,132 @@ from asyncflows.models.config.value_declarations import (
 )
 from asyncflows.models.primitives import ExecutableName, ExecutableId, TaskId
 
+from asyncflows.log_config import get_logger
 from asyncflows.repos.blob_repo import BlobRepo
 
 from asyncflows.repos.cache_repo import CacheRepo
 from asyncflows.utils.async_utils import (
+    IteratorFailure,
+    LagMonitor,
     merge_iterators,
+    iterate_latest,
     iterator_to_coro,
     Timer,
     measure_coro,
     measure_async_iterator,
 )
+from asyncflows.utils.plan_utils import (
+    Dependencies,
+    FlowPlan,
+    LoopReferences,
+    compile_plan,
+    get_dependency_ids_and_stream_flag_from_input_spec,
+    get_hoisting_loop_prefix,
+)
 from asyncflows.utils.pydantic_utils import iterate_fields
 from asyncflows.utils.redis_utils import get_redis_url
 from asyncflows.utils.sentinel_utils import is_sentinel, Sentinel, is_set_of_tuples
+from asyncflows.utils.metrics_utils import metrics
+from asyncflows.utils.trace_utils import get_tracer, trace_span, trace_waits
 
 ActionSubclass = InternalActionBase[Any, Any]
 Inputs = Outputs = BaseModel
 
+action_run_seconds = metrics.histogram(
+    "asyncflows_action_run_seconds",
+    "Wall time of action runs",
+    ("action",),
+)
+action_blocking_seconds = metrics.histogram(
+    "asyncflows_action_blocking_seconds",
+    "Time action runs spent blocking the event loop",
+    ("action",),
+)
+action_errors_total = metrics.counter(
+    "asyncflows_action_errors_total",
+    "Action runs that raised an exception",
+    ("action",),
+)
+broadcast_outputs_total = metrics.counter(
+    "asyncflows_broadcast_outputs_total",
+    "Outputs broadcast by action tasks to their subscribers",
+    ("action",),
+)
+broadcast_dropped_total = metrics.counter(
+    "asyncflows_broadcast_dropped_total",
+    "Outputs dropped for slow subscribers under the `keep_latest` broadcast policy",
+    ("action",),
+)
+broadcast_blocked_seconds_total = metrics.counter(
+    "asyncflows_broadcast_blocked_seconds_total",
+    "Time action tasks spent waiting on full subscriber queues under the `block` broadcast policy",
+    ("action",),
+)
+broadcast_max_queue_depth = metrics.histogram(
+    "asyncflows_broadcast_max_queue_depth",
+    "The deepest a subscriber queue of an action task got",
+    ("action",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 1024),
+)
+cache_lookups_total = metrics.counter(
+    "asyncflows_cache_lookups_total",
+    "Lookups of action outputs in the cache, by result",
+    ("action", "result"),
+)
+
+# the live action services, for the gauges to sum over
+_action_services: "weakref.WeakSet[ActionService]" = weakref.WeakSet()
+
+
+def _count_tasks() -> float:
+    return sum(len(service.tasks) for service in list(_action_services))
+
+
+def _count_queued_outputs() -> float:
+    return sum(
+        queue.qsize()
+        for service in list(_action_services)
+        for queues in list(service.action_output_broadcast.values())
+        for queue in queues
+    )
+
+
+def _count_subscribers() -> float:
+    return sum(
+        len(queues)
+        for service in list(_action_services)
+        for queues in list(service.action_output_broadcast.values())
+    )
+
+
+metrics.gauge(
+    "asyncflows_action_tasks_in_flight",
+    "Action tasks running",
+    _count_tasks,
+)
+metrics.gauge(
+    "asyncflows_broadcast_queued_outputs",
+    "Outputs queued for the subscribers of action tasks",
+    _count_queued_outputs,
+)
+metrics.gauge(
+    "asyncflows_broadcast_subscribers",
+    "Subscribers to the outputs of action tasks",
+    _count_subscribers,
+)
+
+
+@dataclass
+class BroadcastMetrics:
+    """
+    Queue metrics of an action task's output broadcast, across all of its subscribers.
+    """
+
+    outputs: int = 0
+    max_queue_depth: int = 0
+    dropped: int = 0
+    blocked_time: float = 0
+
 
 class ActionService:
     # class Finished(Action):
@@ -62,36 +176,60 @@ class ActionService:
         cache_repo: CacheRepo,
         blob_repo: BlobRepo,
         config: ActionConfig,
+        plan: FlowPlan | None = None,
+        lag_monitor: LagMonitor | None = None,
     ):
         self.temp_dir = temp_dir
         self.use_cache = use_cache
         self.cache_repo = cache_repo
         self.blob_repo = blob_repo
         self.config = config
+        if plan is None:
+            plan = compile_plan(config)
+        self.plan = plan
 
         self.tasks: dict[str, asyncio.Task] = {}
         self.action_output_broadcast: dict[str, list[asyncio.Queue]] = defaultdict(list)
         self.new_listeners: dict[str, list[asyncio.Queue]] = defaultdict(list)
+        self.broadcast_metrics: dict[TaskId, BroadcastMetrics] = defaultdict(
+            BroadcastMetrics
+        )
 
-        # Load all actions in the `asyncflows/actions` directory
-        self.actions: dict[ExecutableName, type[ActionSubclass]] = get_actions_dict()
-        # This relies on using a separate action instance for each trace_id
-        self.action_cache: dict[ExecutableId, ActionSubclass] = {}
+        # an action instance for each action task, so runs sharing the service don't share the instances' state
+        # or their loggers' bindings; it's reused across the task's invocations, and dropped as the task finishes
+        self.action_cache: dict[TaskId, ActionSubclass] = {}
+
+        # the final outputs of the executables shared by a running loop's iterations, by the loop's prefix,
+        # so iterations starting after the shared task finished reuse them instead of running it again;
+        # kept for as long as any run of the loop is in progress
+        self.loop_shared_outputs: dict[str, dict[TaskId, Any]] = {}
+        self.loop_shared_outputs_holders: dict[str, int] = defaultdict(int)
+
+        # started as the first action runs, since it needs the event loop
+        if lag_monitor is None and config.lag_threshold is not None:
+            lag_monitor = LagMonitor(
+                get_logger(),
+                lag_threshold=config.lag_threshold,
+                sample_stacks=config.lag_stack_sampling,
+            )
+        self.lag_monitor = lag_monitor
+
+        _action_services.add(self)
 
     def get_action_type(self, name: ExecutableName) -> type[ActionSubclass]:
-        if name in self.actions:
-            return self.actions[name]
-        raise ValueError(f"Unknown action: {name}")
+        # actions are imported as they're first used
+        return get_action_type(name)
 
     def _get_action_instance(
         self,
         log: structlog.stdlib.BoundLogger,
         action_id: ExecutableId,
-        flow: FlowConfig,
+        plan: FlowPlan,
+        task_id: TaskId,
     ) -> ActionSubclass:
-        if action_id in self.action_cache:
-            return self.action_cache[action_id]
-        action_config = flow[action_id]
+        if task_id in self.action_cache:
+            return self.action_cache[task_id]
+        action_config = plan.flow[action_id]
         if not isinstance(action_config, ActionInvocation):
             log.error("Not an action", action_id=action_id)
             raise RuntimeError("Not an action")
@@ -102,7 +240,7 @@ class ActionService:
             log=log,
             temp_dir=self.temp_dir,
         )
-        self.action_cache[action_id] = action
+        self.action_cache[task_id] = action
         return action
 
     async def _run_action(
@@ -110,8 +248,9 @@ class ActionService:
         log: structlog.stdlib.BoundLogger,
         action_id: ExecutableId,
         inputs: Inputs | None,
-        flow: FlowConfig,
+        plan: FlowPlan,
         variables: dict[str, Any],
+        task_id: TaskId | None = None,
     ) -> AsyncIterator[Outputs | None]:
         # Prepare inputs
         if isinstance(inputs, RedisUrlInputs):
@@ -129,7 +268,9 @@ class ActionService:
             inputs._default_model = ModelConfig.model_validate(model_config_dict)
 
         # Get the action instance
-        action = self._get_action_instance(log, action_id, flow=flow)
+        action = self._get_action_instance(
+            log, action_id, plan=plan, task_id=task_id or action_id
+        )
         if not isinstance(inputs, action._get_inputs_type()):
             raise ValueError(
                 f"Inputs type mismatch: {type(inputs)} != {action._get_inputs_type()}"
@@ -137,13 +278,22 @@ class ActionService:
 
         # measure blocking time and wall clock time
 
-        timer = Timer()
+        mode = self.config.instrumentation
+        if mode == "sampled":
+            timer = Timer(sample_interval=self.config.instrumentation_sample_interval)
+        else:
+            timer = Timer()
+
+        if self.lag_monitor is not None:
+            self.lag_monitor.ensure_started()
+            self.lag_monitor.watch_action(task_id or action_id, action.name, timer)
 
         # Run the action
         log.info(
             "Action started",
             # inputs=inputs,
         )
+        run_start_time = time.perf_counter()
         try:
             if isinstance(action, StreamingAction):
                 async for outputs in measure_async_iterator(
@@ -151,6 +301,7 @@ class ActionService:
                     action.run(inputs),
                     timer,
                     timeout=self.config.action_timeout,
+                    mode=mode,
                 ):
                     # async for outputs in action.run(inputs):
                     log.debug(
@@ -160,7 +311,13 @@ class ActionService:
                     )
                     yield outputs
             elif isinstance(action, Action):
-                result = await measure_coro(log, action.run(inputs), timer)
+                result = await measure_coro(
+                    log,
+                    action.run(inputs),
+                    timer,
+                    timeout=self.config.action_timeout,
+                    mode=mode,
+                )
                 log.debug(
                     "Yielding outputs",
                     partial=False,
@@ -173,13 +330,29 @@ class ActionService:
             tb = traceback.format_exception(type(e), e, e.__traceback__)
             log.error("Action exception", traceback="".join(tb))
             sentry_sdk.capture_exception(e)
+            action_errors_total.inc(action=action.name)
             yield None
         finally:
+            if self.lag_monitor is not None:
+                self.lag_monitor.unwatch_action(task_id or action_id)
             log.info(
                 "Action finished",
                 wall_time=timer.wall_time,
                 blocking_time=timer.blocking_time,
             )
+            if metrics.enabled:
+                action_run_seconds.observe(timer.wall_time, action=action.name)
+                action_blocking_seconds.observe(timer.blocking_time, action=action.name)
+            tracer = get_tracer()
+            if tracer is not None and task_id is not None:
+                tracer.add_span(
+                    "run",
+                    task_id,
+                    run_start_time,
+                    time.perf_counter(),
+                    wall_time=timer.wall_time,
+                    blocking_time=timer.blocking_time,
+                )
 
     async def _contains_expired_blobs(
         self,
@@ -226,34 +399,7 @@ class ActionService:
         cls,
         input_spec: Any,
     ) -> set[tuple[ExecutableId, bool]]:
-        dependencies = set()
-        if isinstance(input_spec, dict):
-            for key, value in input_spec.items():
-                dependencies.update(
-                    cls._get_dependency_ids_and_stream_flag_from_input_spec(value)
-                )
-        elif isinstance(input_spec, list):
-            for value in input_spec:
-                dependencies.update(
-                    cls._get_dependency_ids_and_stream_flag_from_input_spec(value)
-                )
-        elif isinstance(input_spec, str):
-            template = TextDeclaration(text=input_spec)
-            dependencies.update(
-                (d, template.stream) for d in template.get_dependencies()
-            )
-        elif isinstance(input_spec, (ValueDeclaration, str)):
-            dependencies.update(
-                (d, input_spec.stream) for d in input_spec.get_dependencies()
-            )
-        if isinstance(input_spec, BaseModel):
-            for field_name in input_spec.model_fields:
-                field_value = getattr(input_spec, field_name)
-                dependencies.update(
-                    cls._get_dependency_ids_and_stream_flag_from_input_spec(field_value)
-                )
-
-        return dependencies
+        return get_dependency_ids_and_stream_flag_from_input_spec(input_spec)
 
     async def _collect_inputs_from_context(
         self,
@@ -294,14 +440,15 @@ class ActionService:
     async def stream_dependencies(
         self,
         log: structlog.stdlib.BoundLogger,
-        dependencies: set[tuple[ExecutableId, bool]],
+        dependencies: Dependencies | set[tuple[ExecutableId, bool]],
         variables: dict[str, Any],
-        flow: FlowConfig | None = None,
+        plan: FlowPlan | None = None,
         task_prefix: str = "",
+        loop_references: LoopReferences | None = None,
     ) -> AsyncIterator[dict[ExecutableId, Outputs] | type[Sentinel]]:
-        if flow is None:
-            flow = self.config.flow
-        executable_dependencies = {d for d in dependencies if d[0] in flow}
+        if plan is None:
+            plan = self.plan
+        executable_dependencies = {d for d in dependencies if d[0] in plan.flow}
         extra_dependency_ids = {
             d[0]
             for d in dependencies
@@ -319,21 +466,27 @@ class ActionService:
             log,
             executable_dependencies,
             variables,
-            flow=flow,
+            plan=plan,
             task_prefix=task_prefix,
+            loop_references=loop_references,
         ):
             yield dependency_outputs
 
     async def stream_input_dependencies(
         self,
         log: structlog.stdlib.BoundLogger,
-        action_config: ActionInvocation,
+        action_id: ExecutableId,
         variables: dict[str, Any],
-        flow: FlowConfig | None = None,
+        plan: FlowPlan | None = None,
         task_prefix: str = "",
     ) -> AsyncIterator[Inputs | None | type[Sentinel]]:
-        if flow is None:
-            flow = self.config.flow
+        if plan is None:
+            plan = self.plan
+        action_config = plan.flow[action_id]
+        if not isinstance(action_config, ActionInvocation):
+            log.error("Not an action", action_id=action_id)
+            raise RuntimeError("Not an action")
+
         # Get action type
         action_type = self.get_action_type(action_config.action)
         inputs_type = action_type._get_inputs_type()
@@ -341,16 +494,9 @@ class ActionService:
             yield None
             return
 
-        input_spec = {}
-        for name, value in iterate_fields(action_config):
-            if name in ("id", "action"):
-                continue
-            if value is not None:
-                input_spec[name] = value
-
-        dependencies = self._get_dependency_ids_and_stream_flag_from_input_spec(
-            input_spec
-        )
+        executable_plan = plan.executables[action_id]
+        input_spec = executable_plan.input_spec
+        dependencies = executable_plan.dependencies
         if not dependencies:
             rendered = await self._collect_inputs_from_context(
                 log,
@@ -373,8 +519,9 @@ class ActionService:
             log,
             dependencies,
             variables,
-            flow=flow,
+            plan=plan,
             task_prefix=task_prefix,
+            loop_references=executable_plan.loop_references,
         ):
             if is_sentinel(dependency_outputs):
                 # propagate error
@@ -398,18 +545,56 @@ class ActionService:
                 )
                 sentry_sdk.capture_exception(e)
 
+    async def _raise_on_failure(
+        self,
+        executable_id: ExecutableId,
+        outputs_iter: AsyncIterator[Any],
+        none_allowed: bool,
+    ) -> AsyncIterator[Any]:
+        # turn an executable's failure into an exception, for `merge_iterators` to fail fast on
+        failed = True
+        async with aclosing(outputs_iter):
+            async for outputs in outputs_iter:
+                # failed actions output None
+                failed = outputs is None and not none_allowed
+                if failed:
+                    break
+                yield outputs
+        if failed:
+            raise RuntimeError(f"{executable_id} failed")
+
+    async def _keep_final_outputs(
+        self,
+        outputs_iter: AsyncIterator[Any],
+        shared_outputs: dict[TaskId, Any],
+        task_id: TaskId,
+    ) -> AsyncIterator[Any]:
+        outputs = None
+        async with aclosing(outputs_iter):
+            async for outputs in outputs_iter:
+                yield outputs
+        # failed executables output None or the sentinel, and are left to run again
+        if outputs is not None and not is_sentinel(outputs):
+            shared_outputs[task_id] = outputs
+
+    async def _yield_shared_outputs(self, outputs: Any) -> AsyncIterator[Any]:
+        yield outputs
+
     async def stream_executable_tasks(
         self,
         log: structlog.stdlib.BoundLogger,
         dependencies: set[tuple[ExecutableId, bool]] | set[ExecutableId],
         variables: None | dict[str, Any] = None,
-        flow: FlowConfig | None = None,
+        plan: FlowPlan | None = None,
         task_prefix: str = "",
+        loop_references: LoopReferences | None = None,
     ) -> AsyncIterator[dict[ExecutableId, Outputs] | type[Sentinel]]:
         if variables is None:
             variables = {}
-        if flow is None:
-            flow = self.config.flow
+        if plan is None:
+            plan = self.plan
+        if loop_references is None:
+            loop_references = {}
 
         if not dependencies:
             yield {}
@@ -437,56 +622,92 @@ class ActionService:
 
         iterators = []
         for id_, stream in zip(executable_ids, stream_flags):
-            executable = flow[id_]
+            executable = plan.flow[id_]
+            # run the executable in the scope it's declared in, and share its task
+            # between the iterations of the loops whose variables it doesn't depend on
+            scope_plan = plan.get_declaring_plan(id_)
+            scope_task_prefix = plan.get_task_prefix(id_, task_prefix)
+            shared_outputs = None
+            if scope_task_prefix != task_prefix:
+                loop_task_prefix = get_hoisting_loop_prefix(
+                    task_prefix, scope_task_prefix
+                )
+                shared_outputs = self.loop_shared_outputs.get(loop_task_prefix)
+            task_id = f"{scope_task_prefix}{id_}"
+            if shared_outputs is not None and task_id in shared_outputs:
+                # the loop's earlier iterations already ran the shared executable
+                iterators.append(self._yield_shared_outputs(shared_outputs[task_id]))
+                continue
             if isinstance(executable, ActionInvocation):
                 iter_ = self.stream_action(
                     log=log,
                     action_id=id_,
                     variables=variables,
                     partial=stream,
-                    flow=flow,
-                    task_prefix=task_prefix,
+                    plan=scope_plan,
+                    task_prefix=scope_task_prefix,
                 )
+                outputs_type = self.get_action_type(
+                    executable.action
+                )._get_outputs_type(executable)
+                none_allowed = isinstance(None, outputs_type)
             elif isinstance(executable, Loop):
                 iter_ = self.stream_loop(
                     log=log,
                     loop_id=id_,
                     variables=variables,
                     partial=stream,
-                    flow=flow,
-                    task_prefix=task_prefix,
+                    plan=scope_plan,
+                    task_prefix=scope_task_prefix,
+                    body_ids=loop_references.get(id_),
                 )
+                none_allowed = False
             else:
                 assert_never(executable)
+            if shared_outputs is not None:
+                iter_ = self._keep_final_outputs(iter_, shared_outputs, task_id)
+            if self.config.failure_policy == "fail_fast":
+                iter_ = self._raise_on_failure(id_, iter_, none_allowed)
             iterators.append(iter_)
 
         merged_iterator = merge_iterators(
             log,
             executable_ids,
             iterators,
+            failure_policy=self.config.failure_policy,
+            max_buffered=self._get_merge_buffer_size(),
         )
 
         log = log.bind(action_task_ids=executable_ids)
         dependency_outputs = {}
-        async for executable_id, executable_outputs in merged_iterator:
-            # None is yielded as action_outputs if an action throws an exception
-            # if action_outputs is None:
-            #     raise RuntimeError(f"{action_id} returned None")
-
-            # if action_outputs is not None:
-            #     # TODO consider parity with `stream_action` in returning a model instead of a dict
-            #     action_outputs = action_outputs.model_dump()
-            dependency_outputs[executable_id] = executable_outputs
-
-            # TODO do we need more fine grained controls on what actions need to return?
-            if all(action_id in dependency_outputs for action_id in executable_ids):
-                log.debug("Yielding combined action task results")
-                yield dependency_outputs
-            else:
-                log.debug(
-                    "Action task results received, waiting for other actions to complete",
-                    received_action_id=executable_id,
-                )
+        try:
+            async for executable_id, executable_outputs in merged_iterator:
+                if isinstance(executable_outputs, IteratorFailure):
+                    # logged by `merge_iterators`, and reported missing below
+                    continue
+                # None is yielded as action_outputs if an action throws an exception
+                # if action_outputs is None:
+                #     raise RuntimeError(f"{action_id} returned None")
+
+                # if action_outputs is not None:
+                #     # TODO consider parity with `stream_action` in returning a model instead of a dict
+                #     action_outputs = action_outputs.model_dump()
+                dependency_outputs[executable_id] = executable_outputs
+
+                # TODO do we need more fine grained controls on what actions need to return?
+                if all(action_id in dependency_outputs for action_id in executable_ids):
+                    log.debug("Yielding combined action task results")
+                    yield dependency_outputs
+                else:
+                    log.debug(
+                        "Action task results received, waiting for other actions to complete",
+                        received_action_id=executable_id,
+                    )
+        except Exception:
+            # under the `fail_fast` policy, the other action tasks have been cancelled
+            log.error("Action task failed, cancelled the others")
+            yield Sentinel
+            return
         if not all(action_id in dependency_outputs for action_id in executable_ids):
             log.error(
                 "Not all action tasks completed",
@@ -494,7 +715,20 @@ class ActionService:
             )
             yield Sentinel
 
-    def _broadcast_outputs(
+    def _get_merge_buffer_size(self) -> int | None:
+        # under `block`, merging the outputs mustn't buffer what the subscribers' queues hold back
+        if self.config.broadcast_policy == "block":
+            return self.config.broadcast_queue_size
+        return None
+
+    def _new_broadcast_queue(self) -> asyncio.Queue:
+        if self.config.broadcast_policy == "block":
+            return asyncio.Queue(maxsize=self.config.broadcast_queue_size)
+        # `keep_latest` bounds the queue in `_broadcast_outputs` instead,
+        # so the end-of-stream sentinel never evicts the final outputs
+        return asyncio.Queue()
+
+    async def _broadcast_outputs(
         self,
         log: structlog.stdlib.BoundLogger,
         task_id: TaskId,
@@ -503,18 +737,37 @@ class ActionService:
     ):
         if queues is None:
             queues = self.action_output_broadcast[task_id]
+        metrics = self.broadcast_metrics[task_id]
+        if not is_sentinel(outputs):
+            metrics.outputs += 1
+            tracer = get_tracer()
+            if tracer is not None:
+                tracer.add_instant("outputs", task_id, count=metrics.outputs)
 
         # Broadcast outputs
+        policy = self.config.broadcast_policy
         new_listeners_queues = self.new_listeners[task_id]
         for queue in queues[:]:
-            # TODO should we only ever leave one output in queue? or should we just let the subscriber handle partials?
-            #  pro: badly written actions will work better/faster
-            #  con: it makes it less deterministic and makes tests slightly harder to write
-            # if outputs is not sentinel and not queue.empty():
-            #     # the subscriber only cares about the most recent outputs
-            #     log.debug("Clearing queue")
-            #     queue.get_nowait()
-            queue.put_nowait(outputs)
+            if policy == "unbounded":
+                queue.put_nowait(outputs)
+            elif policy == "block":
+                if queue.full():
+                    start = time.perf_counter()
+                    await queue.put(outputs)
+                    metrics.blocked_time += time.perf_counter() - start
+                else:
+                    queue.put_nowait(outputs)
+            elif policy == "keep_latest":
+                # the subscriber only cares about the most recent outputs
+                if not is_sentinel(outputs):
+                    while queue.qsize() >= self.config.broadcast_queue_size:
+                        queue.get_nowait()
+                        metrics.dropped += 1
+                queue.put_nowait(outputs)
+            else:
+                assert_never(policy)
+            if not is_sentinel(outputs):
+                metrics.max_queue_depth = max(metrics.max_queue_depth, queue.qsize())
             if queue in new_listeners_queues:
                 new_listeners_queues.remove(queue)
 
@@ -523,9 +776,9 @@ class ActionService:
         log: structlog.stdlib.BoundLogger,
         action_id: ExecutableId,
         cache_key: str | None,
-        flow: FlowConfig,
+        plan: FlowPlan,
     ) -> None | Outputs:
-        action_invocation = flow[action_id]
+        action_invocation = plan.flow[action_id]
         if not isinstance(action_invocation, ActionInvocation):
             log.error("Not an action", action_id=action_id)
             return None
@@ -536,13 +789,17 @@ class ActionService:
             log.debug("Checking cache")
             try:
                 outputs_json = await self.cache_repo.retrieve(
-                    log, cache_key, namespace=action_name, version=action_type.version
+                    log,
+                    cache_key,
+                    namespace=action_name,
+                    version=get_action_version(action_type),
                 )
             except Exception as e:
                 log.warning(
                     "Cache retrieve error",
                     exc_info=e,
                 )
+                cache_lookups_total.inc(action=action_name, result="error")
                 outputs_json = None
             if outputs_json is not None:
                 outputs_type: BaseModel = action_type._get_outputs_type(
@@ -552,16 +809,20 @@ class ActionService:
                     outputs = outputs_type.model_validate_json(outputs_json)
                     if not await self._contains_expired_blobs(log, outputs):
                         log.info("Cache hit")
+                        cache_lookups_total.inc(action=action_name, result="hit")
                         return outputs
                     else:
                         log.info("Cache hit but blobs expired")
+                        cache_lookups_total.inc(action=action_name, result="expired")
                 except ValidationError as e:
                     log.warning(
                         "Cache hit but outputs invalid",
                         exc_info=e,
                     )
+                    cache_lookups_total.inc(action=action_name, result="invalid")
             else:
                 log.info("Cache miss")
+                cache_lookups_total.inc(action=action_name, result="miss")
         else:
             log.debug(
                 "Cache disabled",
@@ -575,15 +836,14 @@ class ActionService:
         self,
         log: structlog.stdlib.BoundLogger,
         action_config: ActionInvocation,
+        action_id: ExecutableId,
         variables: dict[str, Any],
-        flow: FlowConfig,
+        plan: FlowPlan,
         task_prefix: str,
     ) -> str | type[Sentinel] | None:
         if action_config.cache_key is None:
             return None
-        dependencies = self._get_dependency_ids_and_stream_flag_from_input_spec(
-            action_config.cache_key
-        )
+        dependencies = plan.executables[action_id].cache_key_dependencies
         if not dependencies:
             return str(action_config.cache_key)
 
@@ -592,8 +852,9 @@ class ActionService:
             log,
             dependencies,
             variables,
-            flow,
+            plan,
             task_prefix,
+            loop_references=plan.executables[action_id].loop_references,
         ):
             if is_sentinel(dependency_outputs):
                 # propagate error
@@ -616,12 +877,12 @@ class ActionService:
         action_id: ExecutableId,
         task_id: TaskId,
         variables: dict[str, Any],
-        flow: FlowConfig,
+        plan: FlowPlan,
         task_prefix: str,
     ) -> None:
         log.debug("Running action task")
 
-        action_config = flow[action_id]
+        action_config = plan.flow[action_id]
         if not isinstance(action_config, ActionInvocation):
             log.error("Not an action", task_id=task_id)
             return
@@ -629,18 +890,20 @@ class ActionService:
         action_type = self.get_action_type(action_name)
 
         # Check cache by `cache_key` if provided
-        cache_key = await self._resolve_cache_key(
-            log, action_config, variables, flow, task_prefix
-        )
+        with trace_span("cache key", task_id):
+            cache_key = await self._resolve_cache_key(
+                log, action_config, action_id, variables, plan, task_prefix
+            )
         if is_sentinel(cache_key):
             log.error("Failed to create cache key")
             return
 
         if cache_key is not None:
             hardcoded_cache_key = cache_key
-            outputs = await self._check_cache(log, action_id, cache_key, flow=flow)
+            with trace_span("cache lookup", task_id):
+                outputs = await self._check_cache(log, action_id, cache_key, plan=plan)
             if outputs is not None:
-                self._broadcast_outputs(log, task_id, outputs)
+                await self._broadcast_outputs(log, task_id, outputs)
                 return
         else:
             hardcoded_cache_key = cache_key
@@ -650,19 +913,22 @@ class ActionService:
         cache_hit = False
 
         # Run dependencies
-        # FIXME instead of running the action on each partial dependency result, every time the action execution
-        #  finishes on partial results, run it on the most recent set of partial inputs
-        # FIXME if an action's output is requested from within an inner scope (i.e., a loop),
-        #  it is treated as a separate action from the outer scope, due to task_prefix.
-        #  This should be consolidated, but then there needs to be a way of telling apart actions with the same name
-        #  in different levels of scope
-        async for inputs in self.stream_input_dependencies(
+        inputs_iter = self.stream_input_dependencies(
             log,
-            action_config,
+            action_id,
             variables,
-            flow,
+            plan,
             task_prefix=task_prefix,
-        ):
+        )
+        coalesce_inputs = action_config.coalesce_inputs
+        if coalesce_inputs is None:
+            coalesce_inputs = self.config.coalesce_inputs
+        if coalesce_inputs:
+            # every time the action finishes, run it on the most recent set of partial inputs,
+            # skipping any that arrived in the meantime
+            inputs_iter = iterate_latest(inputs_iter)
+        inputs_iter = trace_waits("dependency wait", task_id, inputs_iter)
+        async for inputs in inputs_iter:
             if is_sentinel(inputs):
                 # propagate error
                 return None
@@ -673,10 +939,11 @@ class ActionService:
                 cache_key = hardcoded_cache_key
             else:
                 cache_key = inputs.model_dump_json() if inputs is not None else None
-            outputs = await self._check_cache(log, action_id, cache_key, flow=flow)
+            with trace_span("cache lookup", task_id):
+                outputs = await self._check_cache(log, action_id, cache_key, plan=plan)
             if outputs is not None:
                 cache_hit = True
-                self._broadcast_outputs(log, task_id, outputs)
+                await self._broadcast_outputs(log, task_id, outputs)
                 continue
 
             # TODO rework this to handle partial outputs, not just full output objects
@@ -684,15 +951,16 @@ class ActionService:
                 log=log,
                 action_id=action_id,
                 inputs=inputs,
-                flow=flow,
+                plan=plan,
                 variables=variables,
+                task_id=task_id,
             ):
                 # TODO are there any race conditions here, between result caching and in-progress action awaiting?
                 #  also consider paradigm of multiple workers, indexing tasks in a database and pulling from cache instead
 
                 # Send result to queue
                 # log.debug("Broadcasting outputs")
-                self._broadcast_outputs(log, task_id, outputs)
+                await self._broadcast_outputs(log, task_id, outputs)
 
             # log.debug("Outputs done")
 
@@ -704,12 +972,13 @@ class ActionService:
             inputs._finished = True
             async for outputs in self._run_action(
                 log=log,
-                action_id=task_id,
+                action_id=action_id,
                 inputs=inputs,
-                flow=flow,
+                plan=plan,
                 variables=variables,
+                task_id=task_id,
             ):
-                self._broadcast_outputs(log, task_id, outputs)
+                await self._broadcast_outputs(log, task_id, outputs)
 
         # Cache result
         # TODO should we cache intermediate results too, or only on the final set of inputs/outputs?
@@ -728,7 +997,7 @@ class ActionService:
                     log,
                     cache_key,
                     outputs_json,
-                    version=action_type.version,
+                    version=get_action_version(action_type),
                     namespace=action_name,
                     # TODO add expire
                     # expire=self.config.action_cache_expire,
@@ -741,7 +1010,40 @@ class ActionService:
 
         if queues := self.new_listeners[task_id]:
             log.debug("Final output broadcast for new listeners")
-            self._broadcast_outputs(log, task_id, outputs, queues=queues)
+            await self._broadcast_outputs(log, task_id, outputs, queues=queues)
+
+    def _flush_broadcast_metrics(
+        self,
+        log: structlog.stdlib.BoundLogger,
+        task_id: TaskId,
+        action_id: ExecutableId,
+        plan: FlowPlan,
+    ) -> None:
+        # record the finished task's broadcast metrics in the registry, and forget them
+        broadcast_metrics = self.broadcast_metrics.pop(task_id, BroadcastMetrics())
+        log.debug(
+            "Broadcast finished",
+            broadcast_policy=self.config.broadcast_policy,
+            outputs=broadcast_metrics.outputs,
+            max_queue_depth=broadcast_metrics.max_queue_depth,
+            dropped=broadcast_metrics.dropped,
+            blocked_time=broadcast_metrics.blocked_time,
+        )
+        if not metrics.enabled:
+            return
+        action_invocation = plan.flow[action_id]
+        if isinstance(action_invocation, ActionInvocation):
+            action_name = action_invocation.action
+        else:
+            action_name = action_id
+        broadcast_outputs_total.inc(broadcast_metrics.outputs, action=action_name)
+        broadcast_dropped_total.inc(broadcast_metrics.dropped, action=action_name)
+        broadcast_blocked_seconds_total.inc(
+            broadcast_metrics.blocked_time, action=action_name
+        )
+        broadcast_max_queue_depth.observe(
+            broadcast_metrics.max_queue_depth, action=action_name
+        )
 
     async def _run_and_broadcast_action_task(
         self,
@@ -749,29 +1051,41 @@ class ActionService:
         action_id: ExecutableId,
         task_id: TaskId,
         variables: dict[str, Any],
-        flow: FlowConfig,
+        plan: FlowPlan,
         task_prefix: str,
+        scheduled_time: float | None = None,
     ):
-        try:
-            await self._run_and_broadcast_action(
-                log=log,
-                action_id=action_id,
-                task_id=task_id,
-                variables=variables,
-                flow=flow,
-                task_prefix=task_prefix,
-            )
-        except Exception as e:
-            tb = traceback.format_exception(type(e), e, e.__traceback__)
-            log.error("Action service exception", traceback="".join(tb))
-            sentry_sdk.capture_exception(e)
-        finally:
-            log.debug("Broadcasting end of stream")
-            # Signal end of queue
-            self._broadcast_outputs(log, task_id, Sentinel)
-
-            # Signal that the task is done
-            del self.tasks[task_id]
+        tracer = get_tracer()
+        if tracer is not None and scheduled_time is not None:
+            tracer.add_span("queue wait", task_id, scheduled_time, time.perf_counter())
+        with trace_span("task", task_id):
+            try:
+                await self._run_and_broadcast_action(
+                    log=log,
+                    action_id=action_id,
+                    task_id=task_id,
+                    variables=variables,
+                    plan=plan,
+                    task_prefix=task_prefix,
+                )
+            except Exception as e:
+                tb = traceback.format_exception(type(e), e, e.__traceback__)
+                log.error("Action service exception", traceback="".join(tb))
+                sentry_sdk.capture_exception(e)
+            finally:
+                log.debug("Broadcasting end of stream")
+                # Signal end of queue
+                await self._broadcast_outputs(log, task_id, Sentinel)
+                self._flush_broadcast_metrics(log, task_id, action_id, plan)
+
+                # Signal that the task is done
+                del self.tasks[task_id]
+                self.action_cache.pop(task_id, None)
+                # every listener has been sent the end of stream,
+                # so forget the task's broadcast once they've drained it
+                self.new_listeners.pop(task_id, None)
+                if not self.action_output_broadcast.get(task_id):
+                    self.action_output_broadcast.pop(task_id, None)
 
     async def stream_loop(
         self,
@@ -779,20 +1093,23 @@ class ActionService:
         loop_id: ExecutableId,
         variables: dict[str, Any] | None = None,
         partial: bool = False,
-        flow: FlowConfig | None = None,
+        plan: FlowPlan | None = None,
         task_prefix: str = "",
+        body_ids: frozenset[ExecutableId] | None = None,
     ) -> AsyncIterator[list[Outputs]]:
-        if flow is None:
-            flow = self.config.flow
+        """
+        Run the loop's body for each item, and yield the list of each iteration's outputs.
+        If `body_ids` is given, only those executables of the body (and what they depend on) are run;
+        otherwise, all of them are.
+
+        If `partial`, a list is yielded every time an iteration's outputs update.
+        An ordered loop's list grows as the iterations at its end produce outputs, so indices stay stable;
+        an unordered loop's list holds finished iterations first, followed by those still in progress.
+        """
+        if plan is None:
+            plan = self.plan
         if variables is None:
             variables = {}
-        if partial:
-            # TODO support streaming
-            log.warning(
-                "Streaming outputs from a loop is not yet supported",
-                loop_id=loop_id,
-            )
-            partial = False
 
         if "action_id" in log._context:
             downstream_action_id = log._context["action_id"]
@@ -803,22 +1120,21 @@ class ActionService:
             log = log.unbind("action_name")
         log = log.bind(action_id=loop_id)
 
-        loop = flow[loop_id]
+        loop = plan.flow[loop_id]
         if not isinstance(loop, Loop):
             log.error("Not a loop", loop_id=loop_id)
             raise RuntimeError("Not a loop")
 
         # Get the dependencies of the variable we're iterating
-        looped_dependency = self._get_dependency_ids_and_stream_flag_from_input_spec(
-            loop.in_
-        )
+        loop_executable_plan = plan.executables[loop_id]
         dependency_outputs = Sentinel
         async for dependency_outputs in self.stream_dependencies(
             log,
-            looped_dependency,
+            loop_executable_plan.dependencies,
             variables,
-            flow=flow,
+            plan=plan,
             task_prefix=task_prefix,
+            loop_references=loop_executable_plan.loop_references,
         ):
             pass
         if is_sentinel(dependency_outputs):
@@ -838,49 +1154,136 @@ class ActionService:
             return
 
         # Run the loop
+        loop_plan = plan.get_loop_plan(loop_id)
+        if body_ids is None:
+            body_ids = frozenset(loop_plan.order)
+
+        async def iterate_iteration_outputs(
+            aiter: AsyncIterator[dict[ExecutableId, Outputs] | type[Sentinel]],
+        ) -> AsyncIterator[tuple[dict[ExecutableId, Outputs], bool] | type[Sentinel]]:
+            # yield `(outputs, finished)`, the partial outputs only if streaming
+            outputs = None
+            async for outputs in aiter:
+                if is_sentinel(outputs):
+                    yield Sentinel
+                    return
+                if partial:
+                    # the dict is updated in place as more outputs come in
+                    yield dict(outputs), False
+            if outputs is not None:
+                yield dict(outputs), True
+
         iterators = []
         for i, item in enumerate(looped_variable):
             loop_variables = {loop.for_: item} | variables
             new_task_prefix = f"{task_prefix}{loop_id}[{i}]."
-            # TODO don't run all the actions in the loop, only those that are actually used
             iterators.append(
-                self.stream_executable_tasks(
-                    log,
-                    set(loop.flow),
-                    loop_variables,
-                    flow=flow | loop.flow,
-                    task_prefix=new_task_prefix,
+                iterate_iteration_outputs(
+                    self.stream_executable_tasks(
+                        log,
+                        set(body_ids),
+                        loop_variables,
+                        plan=loop_plan,
+                        task_prefix=new_task_prefix,
+                    )
                 )
             )
 
-        # Merge the iterators and wait for results
-        merged_iterator = merge_iterators(
-            log,
-            range(len(iterators)),
-            iterators,
-        )
-        indexed_results = {}
-        async for id_, outputs in merged_iterator:
-            if is_sentinel(outputs):
+        def combine_results() -> list[dict[ExecutableId, Outputs]]:
+            if loop.ordered:
+                combined_results = []
+                for i in range(len(iterators)):
+                    if i not in indexed_results:
+                        break
+                    combined_results.append(indexed_results[i])
+                return combined_results
+            return [indexed_results[i] for i in finished_ids] + [
+                outputs
+                for i, outputs in indexed_results.items()
+                if i not in finished_ids
+            ]
+
+        # the iterations share the outputs of the executables that don't depend on the loop's variable,
+        # even when `max_concurrency` starts them after the shared tasks finished
+        loop_task_prefix = f"{task_prefix}{loop_id}"
+        self.loop_shared_outputs.setdefault(loop_task_prefix, {})
+        self.loop_shared_outputs_holders[loop_task_prefix] += 1
+        try:
+            # Merge the iterators and wait for results
+            merged_iterator = merge_iterators(
+                log,
+                range(len(iterators)),
+                iterators,
+                max_concurrency=loop.max_concurrency,
+                failure_policy=self.config.failure_policy,
+                max_buffered=self._get_merge_buffer_size(),
+            )
+            # keeps the order in which iterations first yielded outputs
+            indexed_results = {}
+            # keeps the order in which iterations finished
+            finished_ids = {}
+            # the iterations yet to finish, in the order they first yielded outputs
+            unfinished_ids = {}
+            # for ordered loops, how many iterations from the first have yielded outputs
+            ordered_count = 0
+            # whether the combined results changed since they were last yielded,
+            # tracked per iteration rather than by comparing all of them again
+            dirty = False
+            yielded = False
+            async for id_, iteration_outputs in merged_iterator:
+                if isinstance(iteration_outputs, IteratorFailure):
+                    # logged by `merge_iterators`, and reported missing below
+                    continue
+                if is_sentinel(iteration_outputs):
+                    log.error(
+                        "Loop stream ended with sentinel",
+                    )
+                    return
+                outputs, finished = iteration_outputs
+                changed = indexed_results.get(id_, Sentinel) != outputs
+                if id_ not in indexed_results:
+                    unfinished_ids[id_] = None
+                indexed_results[id_] = outputs
+                if finished and id_ not in finished_ids:
+                    # finishing moves the iteration behind those finished before it,
+                    # which changes the order unless it was first in line anyway
+                    if not loop.ordered and next(iter(unfinished_ids)) != id_:
+                        changed = True
+                    del unfinished_ids[id_]
+                    finished_ids[id_] = None
+                if loop.ordered:
+                    # an ordered loop shows only the iterations from the first up to a missing one
+                    previous_ordered_count = ordered_count
+                    while ordered_count in indexed_results:
+                        ordered_count += 1
+                    dirty = dirty or ordered_count > previous_ordered_count
+                    dirty = dirty or (changed and id_ < previous_ordered_count)
+                else:
+                    dirty = dirty or changed
+                if (
+                    partial
+                    and dirty
+                    and (ordered_count if loop.ordered else indexed_results)
+                ):
+                    dirty = False
+                    yielded = True
+                    yield combine_results()
+
+            if len(finished_ids) < len(iterators):
                 log.error(
-                    "Loop stream ended with sentinel",
+                    "Not all loop tasks completed",
+                    missing_task_ids=set(range(len(iterators))) - set(finished_ids),
                 )
                 return
-            indexed_results[id_] = outputs
 
-        if not all(id_ in indexed_results for id_ in range(len(iterators))):
-            log.error(
-                "Not all loop tasks completed",
-                missing_task_ids=set(range(len(iterators)))
-                - set(indexed_results.keys()),
-            )
-            return
-
-        # Combine the results
-        combined_results = []
-        for i in range(len(iterators)):
-            combined_results.append(indexed_results[i])
-        yield combined_results
+            # Combine the results
+            if not partial or dirty or not yielded:
+                yield combine_results()
+        finally:
+            self.loop_shared_outputs_holders[loop_task_prefix] -= 1
+            if not self.loop_shared_outputs_holders[loop_task_prefix]:
+                del self.loop_shared_outputs_holders[loop_task_prefix]
+                del self.loop_shared_outputs[loop_task_prefix]
 
     async def stream_action(
         self,
@@ -888,13 +1291,13 @@ class ActionService:
         action_id: ExecutableId,
         variables: None | dict[str, Any] = None,
         partial: bool = True,
-        flow: FlowConfig | None = None,
+        plan: FlowPlan | None = None,
         task_prefix: str = "",
     ) -> AsyncIterator[Outputs]:
         """
         Execute the action and stream the outputs of the action as async iterator.
         If the action is already running, subscribe to that execution's output stream.
-        If the action has run before, reuse the same action instance.
+        The action task reuses its action instance across the action's invocations.
         Downstream, the action's final outputs are cached for each set of inputs.
 
         This assumes that:
@@ -906,14 +1309,14 @@ class ActionService:
         """
         if variables is None:
             variables = {}
-        if flow is None:
-            flow = self.config.flow
+        if plan is None:
+            plan = self.plan
 
         action_task = None
         queue = None
 
         # Configure logger
-        action = flow[action_id]
+        action = plan.flow[action_id]
         if not isinstance(action, ActionInvocation):
             log.error(
                 "Not an action",
@@ -934,7 +1337,7 @@ class ActionService:
         # TODO rewrite this try/finally into a `with` scope that cleans up
         try:
             # Join broadcast
-            queue = asyncio.Queue()
+            queue = self._new_broadcast_queue()
             self.action_output_broadcast[task_id].append(queue)
             self.new_listeners[task_id].append(queue)
 
@@ -949,9 +1352,12 @@ class ActionService:
                         action_id=action_id,
                         task_id=task_id,
                         variables=variables,
-                        flow=flow,
+                        plan=plan,
                         task_prefix=task_prefix,
-                    )
+                        scheduled_time=time.perf_counter(),
+                    ),
+                    # names the task in the lag monitor's stack samples
+                    name=task_id,
                 )
 
                 self.tasks[task_id] = action_task
@@ -962,6 +1368,7 @@ class ActionService:
 
             # Yield outputs from queue
             outputs = Sentinel
+            ended = False
             while True:
                 try:
                     new_outputs = await asyncio.wait_for(
@@ -987,6 +1394,7 @@ class ActionService:
                 if partial:
                     # log.debug("Yielding action task outputs", stream=stream)
                     yield outputs
+            ended = True
             if not partial:
                 # log.debug("Yielding action task outputs", stream=stream)
                 if not is_sentinel(outputs):
@@ -995,8 +1403,24 @@ class ActionService:
         finally:
             # Clean up
             if queue is not None:
-                self.action_output_broadcast[task_id].remove(queue)
+                queues = self.action_output_broadcast.get(task_id, [])
+                if queue in queues:
+                    queues.remove(queue)
+                if not queues and task_id not in self.tasks:
+                    # the last listener of a finished task
+                    self.action_output_broadcast.pop(task_id, None)
+                # unblock the action task if it's waiting on this queue
+                while not queue.empty():
+                    queue.get_nowait()
             if action_task is not None:
+                if (
+                    self.config.failure_policy == "fail_fast"
+                    and not ended
+                    and not self.action_output_broadcast.get(task_id)
+                ):
+                    # no one is waiting on the action anymore, e.g., since a sibling dependency failed
+                    log.info("Cancelling action task")
+                    action_task.cancel()
                 try:
                     # give task 3 seconds to finish
                     await asyncio.wait_for(action_task, timeout=3)
@@ -1007,6 +1431,9 @@ class ActionService:
                         await action_task
                     except asyncio.CancelledError:
                         pass
+                except asyncio.CancelledError:
+                    if not action_task.cancelled():
+                        raise
 
     async def stream_executable(
         self,
@@ -1014,12 +1441,12 @@ class ActionService:
         executable_id: ExecutableId,
         variables: None | dict[str, Any] = None,
         partial: bool = True,
-        flow: FlowConfig | None = None,
+        plan: FlowPlan | None = None,
     ) -> AsyncIterator[list[Outputs] | Outputs]:
-        if flow is None:
-            flow = self.config.flow
+        if plan is None:
+            plan = self.plan
 
-        executable = flow[executable_id]
+        executable = plan.flow[executable_id]
 
         if isinstance(executable, ActionInvocation):
             async for outputs in self.stream_action(
@@ -1027,20 +1454,21 @@ class ActionService:
                 action_id=executable_id,
                 variables=variables,
                 partial=partial,
-                flow=flow,
+                plan=plan,
             ):
                 yield outputs
         elif isinstance(executable, Loop):
             result = Sentinel
             async for result in self.stream_loop(
-                log=log, loop_id=executable_id, variables=variables, partial=partial
+                log=log,
+                loop_id=executable_id,
+                variables=variables,
+                partial=partial,
+                plan=plan,
             ):
-                pass
+                yield result
             if is_sentinel(result):
                 log.error("Loop did not yield an output")
-            else:
-                yield result
-            return
         else:
             assert_never(executable)
 
@@ -12,6 +12,7 @@ import yaml
 from sqlalchemy import Column, Integer, String, create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from asyncflows.utils.action_utils import get_actions_dict
 from asyncflows.actions.prompt import Outputs as PromptOutputs, Prompt
@@ -36,6 +37,7 @@ from aioresponses import aioresponses
 
 from asyncflows.services.action_service import ActionService
 from asyncflows.utils.async_utils import LagMonitor
+from asyncflows.utils.metrics_utils import metrics
 
 _log_history = []
 
@@ -58,6 +60,8 @@ def configure_logs():
 
 @pytest.fixture(scope="function")
 def log_history():
+    # tests not using this fixture still log into the history
+    _log_history.clear()
     yield _log_history
     _log_history.clear()
 
@@ -206,7 +210,14 @@ class User(Base):
 
 @pytest.fixture
 def dummy_sqlite_engine():
-    engine = create_engine("sqlite:///:memory:", echo=True, future=True)
+    # a single connection, so the actions running their queries in threads see the same database
+    engine = create_engine(
+        "sqlite:///:memory:",
+        echo=True,
+        future=True,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
     Base.metadata.create_all(engine)
     Session = sessionmaker(bind=engine)
     session = Session()
@@ -322,6 +333,15 @@ async def lag_monitor(log):
     monitor.stop()
 
 
+@pytest.fixture
+def enabled_metrics():
+    metrics.clear()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.clear()
+
+
 @pytest.fixture(autouse=True)
 def gracefully_cancel_tasks(event_loop):
     yield
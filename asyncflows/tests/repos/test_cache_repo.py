@@ -138,13 +138,19 @@
 #         )
 #         tenacious_get = self._wrap_tenacity(log, timeout_get)
 #         return await tenacious_get()
+import asyncio
 import os
+from datetime import timedelta
 from unittest.mock import MagicMock, ANY, patch
 
 import pytest
 import tenacity
 
-from asyncflows.repos.cache_repo import RedisCacheRepo
+from asyncflows.repos.cache_repo import (
+    RedisCacheRepo,
+    ShelveCacheRepo,
+    SqliteCacheRepo,
+)
 
 
 async def test_save_retrieve(log, cache_repo):
@@ -222,3 +228,78 @@ async def test_timeout(
             "log_level": "warning",
             "func": blocking_func,
         }
+
+
+@pytest.fixture(params=[ShelveCacheRepo, SqliteCacheRepo])
+async def persistent_cache_repo(request, temp_dir):
+    repo = request.param(temp_dir=temp_dir)
+    yield repo
+    await repo.close()
+
+
+@pytest.fixture
+async def sqlite_cache_repo(temp_dir):
+    repo = SqliteCacheRepo(temp_dir=temp_dir)
+    yield repo
+    await repo.close()
+
+
+async def test_namespaces(log, persistent_cache_repo):
+    await persistent_cache_repo.store(log, "key", "a", None, namespace="a")
+    await persistent_cache_repo.store(log, "key", "b", None, namespace="b")
+
+    assert await persistent_cache_repo.retrieve(log, "key", None, namespace="a") == "a"
+    assert await persistent_cache_repo.retrieve(log, "key", None, namespace="b") == "b"
+    assert await persistent_cache_repo.retrieve(log, "key", None) is None
+
+
+async def test_store_retrieve_many(log, persistent_cache_repo):
+    # the shelve repo opens the shelf for each item
+    count = 1000 if isinstance(persistent_cache_repo, SqliteCacheRepo) else 20
+    items = {f"key-{i}": {"value": i} for i in range(count)}
+    await persistent_cache_repo.store_many(log, items, version=1)
+
+    keys = [*items, "missing"]
+    values = await persistent_cache_repo.retrieve_many(log, keys, version=1)
+    assert values == [*items.values(), None]
+    assert await persistent_cache_repo.retrieve_many(log, ["key-0"], version=2) == [
+        None
+    ]
+
+
+async def test_sqlite_persists(log, temp_dir, sqlite_cache_repo):
+    await sqlite_cache_repo.store(log, "key", "value", "habc")
+
+    other_repo = SqliteCacheRepo(temp_dir=temp_dir)
+    try:
+        assert await other_repo.retrieve(log, "key", "habc") == "value"
+    finally:
+        await other_repo.close()
+
+
+async def test_sqlite_expire(log, sqlite_cache_repo):
+    await sqlite_cache_repo.store(log, "expired", "value", None, expire=-1)
+    await sqlite_cache_repo.store(
+        log, "fresh", "value", None, expire=timedelta(minutes=1)
+    )
+
+    assert await sqlite_cache_repo.retrieve(log, "expired", None) is None
+    assert await sqlite_cache_repo.retrieve(log, "fresh", None) == "value"
+
+
+async def test_sqlite_concurrent_stores(log, sqlite_cache_repo):
+    await asyncio.gather(
+        *(sqlite_cache_repo.store(log, f"key-{i}", i, None) for i in range(100))
+    )
+
+    values = await sqlite_cache_repo.retrieve_many(
+        log, [f"key-{i}" for i in range(100)], None
+    )
+    assert values == list(range(100))
+
+
+async def test_sqlite_close_twice(log, sqlite_cache_repo):
+    await sqlite_cache_repo.store(log, "key", "value", None)
+
+    # the fixture closes the repo again
+    await sqlite_cache_repo.close()
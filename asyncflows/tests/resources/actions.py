@@ -1,4 +1,5 @@
 import asyncio
+import time
 from typing import AsyncIterator
 
 from asyncflows.models.config.action import (
@@ -111,6 +112,13 @@ class ErrorAction(Action[None, None]):
         raise RuntimeError("This action always fails")
 
 
+class ErrorAdd(Action[AddInputs, AddOutputs]):
+    name = "test_error_add"
+
+    async def run(self, inputs: AddInputs) -> AddOutputs:
+        raise RuntimeError("This action always fails")
+
+
 # Create blob
 
 
@@ -253,3 +261,41 @@ class FinishAction(Action[FinishInputs, FinishOutputs]):
     async def run(self, inputs: FinishInputs) -> FinishOutputs:
         self.history.append(inputs._finished)
         return FinishOutputs(finish_history=self.history[:])
+
+
+# sleep
+
+
+class SleepInputs(BaseModel):
+    seconds: float
+
+
+class SleepOutputs(BaseModel):
+    seconds: float
+
+
+class Sleep(Action[SleepInputs, SleepOutputs]):
+    name = "test_sleep"
+    cache = False
+
+    # how many are sleeping at once, across all instances
+    running = 0
+    max_running = 0
+
+    async def run(self, inputs: SleepInputs) -> SleepOutputs:
+        Sleep.running += 1
+        Sleep.max_running = max(Sleep.max_running, Sleep.running)
+        try:
+            await asyncio.sleep(inputs.seconds)
+        finally:
+            Sleep.running -= 1
+        return SleepOutputs(seconds=inputs.seconds)
+
+
+class BlockingSleep(Action[SleepInputs, SleepOutputs]):
+    name = "test_blocking_sleep"
+    cache = False
+
+    async def run(self, inputs: SleepInputs) -> SleepOutputs:
+        time.sleep(inputs.seconds)
+        return SleepOutputs(seconds=inputs.seconds)
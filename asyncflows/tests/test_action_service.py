@@ -1,10 +1,14 @@
 # import before importing action stuff so it gets registered via metaclass
+import asyncio
 import os
+import time
 from unittest import mock
 from unittest.mock import ANY
 
+import pytest
+
 import asyncflows.tests.resources.actions  # noqa: F401
-from asyncflows.tests.resources.actions import AddOutputs
+from asyncflows.tests.resources.actions import AddOutputs, Sleep
 from asyncflows.actions.utils.prompt_context import (
     RoleElement,
     TextElement,
@@ -12,6 +16,8 @@ from asyncflows.actions.utils.prompt_context import (
 )
 
 from asyncflows.models.blob import Blob
+from asyncflows.services.action_service import ActionService
+from asyncflows.utils.async_utils import LagMonitor
 
 
 def assert_logs(
@@ -465,6 +471,282 @@ async def test_successive_action(
     assert_logs(log_history, waiting_id, waiting_name, cache_hit=True)
 
 
+@pytest.mark.parametrize(
+    "action_id, flow_coalesce_inputs, coalesced",
+    [
+        ("range_waiting_add", False, False),
+        ("coalescing_range_waiting_add", False, True),
+        ("range_waiting_add", True, True),
+    ],
+)
+async def test_coalesce_inputs(
+    log,
+    in_memory_action_service,
+    log_history,
+    action_id,
+    flow_coalesce_inputs,
+    coalesced,
+):
+    in_memory_action_service.config.coalesce_inputs = flow_coalesce_inputs
+
+    outputs = await in_memory_action_service.run_action(log=log, action_id=action_id)
+
+    # the last partial input is always run
+    assert outputs.result == 10
+    runs = [
+        log_dict
+        for log_dict in log_history
+        if log_dict["event"] == "Action started" and log_dict["action_id"] == action_id
+    ]
+    if coalesced:
+        # partial inputs that arrive while the action runs are skipped
+        assert 1 <= len(runs) <= 2
+    else:
+        assert len(runs) == 10
+
+
+@pytest.mark.parametrize(
+    "broadcast_policy",
+    ["unbounded", "block", "keep_latest"],
+)
+async def test_broadcast_policy(
+    log, in_memory_action_service, enabled_metrics, broadcast_policy
+):
+    in_memory_action_service.config.broadcast_policy = broadcast_policy
+    in_memory_action_service.config.broadcast_queue_size = 2
+
+    values = []
+    async for outputs in in_memory_action_service.stream_action(
+        log=log, action_id="range_stream"
+    ):
+        values.append(outputs.value)
+        # a slow subscriber
+        await asyncio.sleep(0.01)
+
+    # the finished task's metrics are moved to the registry
+    assert "range_stream" not in in_memory_action_service.broadcast_metrics
+    snapshot = enabled_metrics.snapshot()
+
+    def get_value(name: str) -> float:
+        (sample,) = snapshot[name]["samples"]
+        assert sample["labels"] == {"action": "test_range_stream"}
+        return sample.get("value", sample.get("sum"))
+
+    assert get_value("asyncflows_broadcast_outputs_total") == 10
+    dropped = get_value("asyncflows_broadcast_dropped_total")
+    max_queue_depth = get_value("asyncflows_broadcast_max_queue_depth")
+    assert values[-1] == 9
+    if broadcast_policy == "keep_latest":
+        assert len(values) + dropped == 10
+        assert dropped > 0
+    else:
+        assert values == list(range(10))
+    if broadcast_policy == "unbounded":
+        assert max_queue_depth > 2
+    else:
+        assert max_queue_depth <= 2
+
+
+@pytest.mark.parametrize("instrumentation", ["off", "sampled"])
+async def test_instrumentation(
+    log, in_memory_action_service, log_history, instrumentation
+):
+    in_memory_action_service.config.instrumentation = instrumentation
+
+    values = [
+        outputs.value
+        async for outputs in in_memory_action_service.stream_action(
+            log=log, action_id="range_stream"
+        )
+    ]
+
+    assert values == list(range(10))
+    (finished_log,) = [
+        log_dict for log_dict in log_history if log_dict["event"] == "Action finished"
+    ]
+    assert finished_log["wall_time"] > 0
+    if instrumentation == "off":
+        assert finished_log["blocking_time"] == 0
+
+
+@pytest.mark.parametrize("instrumentation", ["full", "sampled", "off"])
+async def test_action_timeout(
+    log, in_memory_action_service, log_history, instrumentation
+):
+    in_memory_action_service.config.instrumentation = instrumentation
+    in_memory_action_service.config.action_timeout = 0.05
+
+    start = time.perf_counter()
+    outputs = await in_memory_action_service.run_action(log=log, action_id="slow_sleep")
+
+    # the configured timeout cuts the 5 second sleep short, whatever the instrumentation
+    assert outputs is None
+    assert time.perf_counter() - start < 1
+    assert any("timed out" in log_dict["event"] for log_dict in log_history)
+
+
+@pytest.mark.parametrize("instrumentation", ["full", "off"])
+async def test_lag_monitor(
+    log, temp_dir, cache_repo, in_memory_blob_repo, testing_actions, instrumentation
+):
+    testing_actions.instrumentation = instrumentation
+    # without step timing, only the stack sample attributes the lag
+    lag_monitor = LagMonitor(
+        log,
+        interval=0.05,
+        lag_threshold=0.1,
+        sample_stacks=instrumentation == "off",
+    )
+    action_service = ActionService(
+        temp_dir=temp_dir,
+        use_cache=True,
+        cache_repo=cache_repo,
+        blob_repo=in_memory_blob_repo,
+        config=testing_actions,
+        lag_monitor=lag_monitor,
+    )
+
+    await action_service.run_action(log=log, action_id="blocking_sleep")
+    # let the monitor notice
+    await asyncio.sleep(0.1)
+    lag_monitor.stop()
+
+    (event,) = lag_monitor.events
+    assert event.lag >= 0.2
+    assert event.task_id == "blocking_sleep"
+    if instrumentation == "full":
+        assert event.action == "test_blocking_sleep"
+        assert event.blocking_time >= 0.3
+    else:
+        assert "time.sleep(inputs.seconds)" in event.stack
+
+
+async def test_fail_fast(log, in_memory_action_service, log_history):
+    in_memory_action_service.config.failure_policy = "fail_fast"
+
+    start = time.perf_counter()
+    outputs = await in_memory_action_service.run_action(
+        log=log, action_id="error_and_slow_dependent"
+    )
+
+    assert outputs is None
+    # the sleep is cancelled as soon as the error action fails
+    assert time.perf_counter() - start < 1
+    assert not in_memory_action_service.tasks
+    assert any(
+        log_dict["event"] == "Cancelling action task"
+        and log_dict["action_id"] == "slow_sleep"
+        for log_dict in log_history
+    )
+
+
+async def test_loop_runs_only_referenced_actions(
+    log, in_memory_action_service, log_history
+):
+    outputs = await in_memory_action_service.run_action(
+        log=log, action_id="unused_loop_action_consumer"
+    )
+
+    assert outputs.result == 4
+    started_action_ids = {
+        log_dict["action_id"]
+        for log_dict in log_history
+        if log_dict["event"] == "Action started"
+    }
+    assert "add" in started_action_ids
+    assert "unused" not in started_action_ids
+
+
+async def test_loop_invariant_actions_run_once(
+    log, in_memory_action_service, log_history
+):
+    outputs = await in_memory_action_service.run_loop(
+        log=log, loop_id="iterator_with_invariant_action"
+    )
+
+    assert [o["add"].result for o in outputs] == [3, 4, 5]
+    assert all(o["invariant"].seconds == 0.01 for o in outputs)
+    started_action_ids = [
+        log_dict["action_id"]
+        for log_dict in log_history
+        if log_dict["event"] == "Action started"
+    ]
+    # `test_sleep` isn't cached, so each run of it would show up;
+    # the outer action and the one not depending on `num` are shared between iterations
+    assert started_action_ids.count("outer_sleep") == 1
+    assert started_action_ids.count("invariant") == 1
+    assert started_action_ids.count("add") == 3
+
+
+async def test_loop_invariant_actions_run_once_bounded(
+    log, in_memory_action_service, log_history
+):
+    outputs = await in_memory_action_service.run_loop(
+        log=log, loop_id="bounded_iterator_with_invariant_action"
+    )
+
+    assert [o["add"].result for o in outputs] == [3, 4, 5, 6]
+    started_action_ids = [
+        log_dict["action_id"]
+        for log_dict in log_history
+        if log_dict["event"] == "Action started"
+    ]
+    # the iterations run one after the other, so the shared actions finish before the later ones start
+    assert started_action_ids.count("outer_sleep") == 1
+    assert started_action_ids.count("invariant") == 1
+    assert started_action_ids.count("add") == 4
+    assert not in_memory_action_service.loop_shared_outputs
+
+
+async def test_unordered_loop(log, in_memory_action_service):
+    outputs = await in_memory_action_service.run_loop(
+        log=log, loop_id="unordered_sleep_iterator"
+    )
+
+    # in the order the iterations finished
+    assert [o["sleep"].seconds for o in outputs] == [0.02, 0.04, 0.06]
+
+
+async def test_loop_max_concurrency(log, in_memory_action_service):
+    Sleep.max_running = 0
+
+    outputs = await in_memory_action_service.run_loop(
+        log=log, loop_id="bounded_sleep_iterator"
+    )
+
+    assert len(outputs) == 5
+    assert Sleep.max_running == 2
+
+
+async def test_stream_unordered_loop(log, in_memory_action_service):
+    snapshots = [
+        [o["sleep"].seconds for o in outputs]
+        async for outputs in in_memory_action_service.stream_loop(
+            log=log, loop_id="unordered_sleep_iterator", partial=True
+        )
+    ]
+
+    # the list grows as iterations finish
+    assert snapshots == [[0.02], [0.02, 0.04], [0.02, 0.04, 0.06]]
+
+
+async def test_stream_loop(log, in_memory_action_service):
+    snapshots = [
+        [o["stream"].value for o in outputs]
+        async for outputs in in_memory_action_service.stream_loop(
+            log=log, loop_id="streaming_iterator", partial=True
+        )
+    ]
+
+    # partial outputs of each iteration are streamed, and the list only grows at its end
+    assert len(snapshots) > 1
+    assert snapshots[-1] == [0, 1]
+    for previous, current in zip(snapshots, snapshots[1:]):
+        assert len(previous) <= len(current)
+        # a list is only yielded when it changed
+        assert previous != current
+
+
 async def test_final_invocation_action(log, in_memory_action_service, log_history):
     action_id = "finish_action"
     action_name = "test_finish"
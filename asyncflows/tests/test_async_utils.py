@@ -6,7 +6,14 @@ from unittest.mock import Mock, patch
 import pytest
 from asyncflows.models.config.action import Action
 from asyncflows.models.io import BaseModel
-from asyncflows.utils.async_utils import Timer, measure_coro, measure_async_iterator
+from asyncflows.utils.async_utils import (
+    IteratorFailure,
+    Timer,
+    iterate_latest,
+    measure_coro,
+    merge_iterators,
+    measure_async_iterator,
+)
 
 
 @pytest.fixture(scope="function")
@@ -95,6 +102,73 @@ async def test_measure_iterator(
     assert measurement.blocking_time == expected_blocking_time
 
 
+@pytest.mark.parametrize("mode", ["off", "sampled", "full"])
+async def test_measure_modes(log, mode):
+    async def coro(x):
+        for _ in range(8):
+            await asyncio.sleep(0)
+        return x * 2
+
+    async def failing_coro():
+        await asyncio.sleep(0)
+        raise ValueError("oops")
+
+    async def sample_async_iter(x):
+        for i in range(x):
+            await asyncio.sleep(0)
+            yield i
+
+    timer = Timer(sample_interval=4)
+    assert await measure_coro(log, coro(1), timer, mode=mode) == 2
+    if mode == "off":
+        assert timer.steps == 0
+    elif mode == "sampled":
+        # the first of every 4 steps is timed
+        assert timer.steps == 9
+        assert timer.sampled_steps == 3
+    assert timer.wall_time >= 0
+
+    with pytest.raises(ValueError):
+        await measure_coro(log, failing_coro(), Timer(), mode=mode)
+
+    results = [
+        i
+        async for i in measure_async_iterator(
+            log, sample_async_iter(3), Timer(), mode=mode
+        )
+    ]
+    assert results == [0, 1, 2]
+
+
+@pytest.mark.parametrize("mode", ["off", "sampled"])
+async def test_measure_deadline(log, mode):
+    async def slow_async_iter():
+        for i in range(10):
+            await asyncio.sleep(0.02)
+            yield i
+
+    with pytest.raises(asyncio.TimeoutError):
+        await measure_coro(log, asyncio.sleep(1), Timer(), timeout=0.01, mode=mode)
+
+    # the deadline is for the whole iteration, though each item arrives in time
+    results = []
+    with pytest.raises(asyncio.TimeoutError):
+        async for i in measure_async_iterator(
+            log, slow_async_iter(), Timer(), timeout=0.1, mode=mode
+        ):
+            results.append(i)
+    assert 0 < len(results) < 10
+
+    # outside cancellation isn't mistaken for the deadline
+    task = asyncio.create_task(
+        measure_coro(log, asyncio.sleep(1), Timer(), timeout=10, mode=mode)
+    )
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
 async def test_measure_action_request_with_mocked_aiohttp(
     mock_aioresponse, log, mock_time, temp_dir
 ):
@@ -237,3 +311,135 @@ async def test_measure_with_cancel_scope(log, mock_time):
     assert result == "yay"
     assert measurement.wall_time == 3
     assert measurement.blocking_time == 2
+
+
+async def test_iterate_latest():
+    async def produce():
+        for i in range(10):
+            yield i
+            await asyncio.sleep(0)
+
+    consumed = []
+    async for value in iterate_latest(produce()):
+        consumed.append(value)
+        await asyncio.sleep(0.01)
+
+    # values produced while the consumer was busy are skipped, the last one never is
+    assert consumed[-1] == 9
+    assert len(consumed) < 10
+    assert consumed == sorted(consumed)
+
+
+async def test_iterate_latest_propagates_exception():
+    async def produce():
+        yield 1
+        raise ValueError("oops")
+
+    with pytest.raises(ValueError):
+        async for _ in iterate_latest(produce()):
+            pass
+
+
+@pytest.mark.parametrize("max_concurrency", [None, 1, 3])
+async def test_merge_iterators_max_concurrency(log, max_concurrency):
+    running = 0
+    max_running = 0
+
+    async def produce(i):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        yield i
+        running -= 1
+
+    results = [
+        value
+        async for _, value in merge_iterators(
+            log,
+            list(range(6)),
+            [produce(i) for i in range(6)],
+            max_concurrency=max_concurrency,
+        )
+    ]
+
+    assert sorted(results) == list(range(6))
+    assert max_running == (max_concurrency or 6)
+
+
+async def failing_iterator():
+    await asyncio.sleep(0.01)
+    raise RuntimeError("failed")
+    yield
+
+
+async def test_merge_iterators_continue_on_failure(log):
+    async def produce():
+        await asyncio.sleep(0.02)
+        yield "value"
+
+    results = [
+        result
+        async for result in merge_iterators(
+            log, ["failing", "producing"], [failing_iterator(), produce()]
+        )
+    ]
+
+    assert len(results) == 2
+    failing_id, failure = results[0]
+    assert failing_id == "failing"
+    assert isinstance(failure, IteratorFailure)
+    assert str(failure.exception) == "failed"
+    assert results[1] == ("producing", "value")
+
+
+async def test_merge_iterators_fail_fast(log):
+    cancelled = False
+
+    async def produce():
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(5)
+            yield "value"
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    with pytest.raises(RuntimeError, match="failed"):
+        async for _ in merge_iterators(
+            log,
+            ["failing", "producing"],
+            [failing_iterator(), produce()],
+            failure_policy="fail_fast",
+        ):
+            pass
+
+    assert cancelled
+
+
+@pytest.mark.parametrize("max_buffered", [None, 2])
+async def test_merge_iterators_max_buffered(log, max_buffered):
+    produced = 0
+    max_ahead = 0
+
+    async def produce():
+        nonlocal produced
+        for i in range(20):
+            produced += 1
+            yield i
+
+    consumed = 0
+    async for _ in merge_iterators(
+        log, ["a", "b"], [produce(), produce()], max_buffered=max_buffered
+    ):
+        consumed += 1
+        max_ahead = max(max_ahead, produced - consumed)
+        # a slow consumer
+        await asyncio.sleep(0.001)
+
+    assert consumed == 40
+    if max_buffered is None:
+        assert max_ahead > 10
+    else:
+        # besides the buffered values, each iterator holds one it waits to buffer
+        assert max_ahead <= max_buffered + 2
@@ -1,6 +1,11 @@
+import asyncio
 from unittest.mock import patch
 
+import pytest
+
 from asyncflows import AsyncFlows
+from asyncflows.repos.blob_repo import FilesystemBlobRepo
+from asyncflows.tests.resources.actions import Sleep
 from asyncflows.utils.loader_utils import load_config_file
 
 from asyncflows.actions.prompt import (
@@ -37,3 +42,249 @@ async def test_default_model_var(log_history):
     # outputs = await action_service.run_action(log=log, action_id=action_id)
 
     # assert_logs(log_history, action_id, "test_add")
+
+
+async def test_run_multiple_targets(testing_actions, log_history):
+    af = AsyncFlows(config=testing_actions)
+
+    outputs = await af.run(["first_sum.result", "second_sum.result"])
+    assert outputs == [3, 7]
+
+    outputs = await af.run(
+        {
+            "outer": "outer_sleep.seconds",
+            "invariant": "iterator_with_invariant_action[0].invariant.seconds",
+        }
+    )
+    assert outputs == {"outer": 0.01, "invariant": 0.01}
+
+    started_action_ids = [
+        log_["action_id"] for log_ in log_history if log_["event"] == "Action started"
+    ]
+    # `test_sleep` isn't cached; the action both targets depend on runs once
+    assert started_action_ids.count("outer_sleep") == 1
+    # and only the referenced part of the loop runs
+    assert "add" not in started_action_ids
+
+    await af.close()
+
+
+async def test_stream_multiple_targets(testing_actions):
+    af = AsyncFlows(config=testing_actions)
+
+    outputs = [
+        outputs
+        async for outputs in af.stream(
+            {"sum": "first_sum.result", "double": "double_add.result"}
+        )
+    ]
+    # yielded once every target has an output, and on every update after that
+    assert outputs
+    assert outputs[-1] == {"sum": 3, "double": 6}
+
+    await af.close()
+
+
+@pytest.fixture
+def sleep_flow(testing_actions_type):
+    return AsyncFlows(
+        config=testing_actions_type.model_validate(
+            {
+                "flow": {
+                    "sleep": {"action": "test_sleep", "seconds": {"var": "seconds"}},
+                    "double": {
+                        "action": "test_double_add",
+                        "a": {"var": "a"},
+                        "b": 1,
+                    },
+                },
+                "default_output": "sleep.seconds",
+            }
+        )
+    )
+
+
+async def test_run_many(sleep_flow, log_history):
+    variable_sets = [{"seconds": 0.03}, {"seconds": 0.01}, {"seconds": 0.01}, {}]
+
+    results = [result async for result in sleep_flow.run_many(variable_sets)]
+
+    # in the order they finished, the failed run first
+    assert results[0].index == 3
+    assert isinstance(results[0].error, ValueError)
+    assert {result.index for result in results[1:3]} == {1, 2}
+    assert results[3].index == 0
+    assert [result.outputs for result in results[1:]] == [0.01, 0.01, 0.03]
+    assert all(result.error is None for result in results[1:])
+
+    # the runs with the same variables shared their action
+    started_action_ids = [
+        log_["action_id"] for log_ in log_history if log_["event"] == "Action started"
+    ]
+    assert started_action_ids.count("sleep") == 2
+
+    await sleep_flow.close()
+
+
+async def test_run_many_max_concurrency(sleep_flow):
+    Sleep.max_running = 0
+
+    async def variable_sets():
+        for i in range(5):
+            yield {"seconds": 0.01 + i * 0.001}
+
+    results = [
+        result
+        async for result in sleep_flow.run_many(variable_sets(), max_concurrency=2)
+    ]
+
+    assert sorted(result.index for result in results) == list(range(5))
+    assert Sleep.max_running == 2
+
+    await sleep_flow.close()
+
+
+async def test_stream_many(sleep_flow):
+    results = [
+        result
+        async for result in sleep_flow.stream_many(
+            [{"a": 1}, {"a": 2}], target_output="double.result"
+        )
+    ]
+
+    final_outputs = {
+        result.index: result.outputs for result in results if result.finished
+    }
+    assert final_outputs == {0: 4, 1: 6}
+    partial_outputs = {
+        (result.index, result.outputs) for result in results if not result.finished
+    }
+    assert (0, 2) in partial_outputs
+
+    await sleep_flow.close()
+
+
+async def test_run_many_cleans_up(sleep_flow):
+    variable_sets = [{"seconds": 0.001 * i, "a": i} for i in range(20)]
+    results = [
+        result
+        async for result in sleep_flow.stream_many(
+            variable_sets, target_output=["sleep.seconds", "double.result"]
+        )
+    ]
+    assert sum(result.finished for result in results) == 20
+
+    # the shared action service forgets each namespaced task once it's done
+    action_service = sleep_flow.action_service
+    assert not action_service.tasks
+    assert not action_service.action_output_broadcast
+    assert not action_service.new_listeners
+    assert not action_service.broadcast_metrics
+    assert not action_service.action_cache
+
+    await sleep_flow.close()
+
+
+async def test_run_many_in_processes(sleep_flow):
+    await sleep_flow.close()
+    # the workers share the blob repo through the temp dir
+    sleep_flow = AsyncFlows(
+        config=sleep_flow.action_config,
+        blob_repo=FilesystemBlobRepo,
+    )
+    variable_sets = [{"seconds": 0.01 * i} for i in range(6)] + [{}]
+
+    results = [
+        result
+        async for result in sleep_flow.run_many(
+            variable_sets, max_concurrency=2, processes=2
+        )
+    ]
+
+    assert sorted(result.index for result in results) == list(range(7))
+    results_by_index = {result.index: result for result in results}
+    assert [results_by_index[i].outputs for i in range(6)] == [
+        0.01 * i for i in range(6)
+    ]
+    assert isinstance(results_by_index[6].error, ValueError)
+
+    await sleep_flow.close()
+
+
+async def test_run_many_in_processes_variable_sets_fail(sleep_flow):
+    await sleep_flow.close()
+    sleep_flow = AsyncFlows(
+        config=sleep_flow.action_config,
+        blob_repo=FilesystemBlobRepo,
+    )
+
+    def variable_sets():
+        yield {"seconds": 0.01}
+        raise RuntimeError("no more variables")
+
+    async def run_many():
+        return [
+            result async for result in sleep_flow.run_many(variable_sets(), processes=2)
+        ]
+
+    # raised once the workers are done, rather than waiting on them forever
+    with pytest.raises(RuntimeError, match="no more variables"):
+        await asyncio.wait_for(run_many(), timeout=30)
+
+    await sleep_flow.close()
+
+
+async def test_run_many_in_processes_needs_shared_blob_repo(sleep_flow):
+    with pytest.raises(ValueError):
+        async for _ in sleep_flow.run_many([{"seconds": 0.01}], processes=2):
+            pass
+
+    await sleep_flow.close()
+
+
+async def test_set_vars_shares_action_service(sleep_flow, log_history):
+    flows = sleep_flow.set_vars(seconds=0.02)
+    assert flows.action_service is sleep_flow.action_service
+    assert flows.variables == {"seconds": 0.02}
+    assert sleep_flow.variables == {}
+
+    outputs = await asyncio.gather(
+        sleep_flow.set_vars(seconds=0.01).run(),
+        flows.run(),
+        flows.run(),
+    )
+
+    # concurrent runs with different variables keep their tasks apart,
+    # and runs with the same variables share them
+    assert outputs == [0.01, 0.02, 0.02]
+    started_action_ids = [
+        log_["action_id"] for log_ in log_history if log_["event"] == "Action started"
+    ]
+    assert started_action_ids.count("sleep") == 2
+
+    # closing the derived flows leaves the shared resources to the root
+    await flows.close()
+    assert await sleep_flow.set_vars(seconds=0.03).run() == 0.03
+    await sleep_flow.close()
+
+
+async def test_set_vars_runs_own_action_instances(sleep_flow, monkeypatch):
+    instances = []
+    run = Sleep.run
+
+    async def recording_run(self, inputs):
+        instances.append(self)
+        return await run(self, inputs)
+
+    monkeypatch.setattr(Sleep, "run", recording_run)
+    await asyncio.gather(
+        sleep_flow.set_vars(seconds=0.01).run(),
+        sleep_flow.set_vars(seconds=0.02).run(),
+    )
+
+    # the runs don't share action instances, nor the loggers bound to them
+    assert len(instances) == 2
+    assert instances[0] is not instances[1]
+    assert not sleep_flow.action_service.action_cache
+
+    await sleep_flow.close()
@@ -0,0 +1,53 @@
+import importlib
+import sys
+
+from asyncflows.models.config.action import ActionMeta
+from asyncflows.tests.resources.actions import Add, DoubleAdd
+from asyncflows.utils.cache_utils import get_action_fingerprint, get_action_version
+
+_action_source = """
+from asyncflows import Action, BaseModel
+
+
+class Outputs(BaseModel):
+    result: int
+
+
+class Fingerprinted(Action[None, Outputs]):
+    name = "test_fingerprinted"
+
+    async def run(self, inputs: None) -> Outputs:
+        return Outputs(result={result})
+"""
+
+
+def test_action_version():
+    assert get_action_version(Add) == f"h{get_action_fingerprint(Add)}"
+    # actions in the same module are told apart
+    assert get_action_fingerprint(Add) != get_action_fingerprint(DoubleAdd)
+
+
+def test_action_version_declared(monkeypatch):
+    monkeypatch.setattr(Add, "version", 2)
+    assert get_action_version(Add) == 2
+
+
+def test_action_fingerprint_follows_source(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module_path = tmp_path / "fingerprinted_action.py"
+
+    def load_action(result: int):
+        module_path.write_text(_action_source.format(result=result))
+        if "fingerprinted_action" in sys.modules:
+            module = importlib.reload(sys.modules["fingerprinted_action"])
+        else:
+            module = importlib.import_module("fingerprinted_action")
+        return module.Fingerprinted
+
+    try:
+        first = get_action_fingerprint(load_action(1))
+        assert get_action_fingerprint(load_action(1)) == first
+        assert get_action_fingerprint(load_action(2)) != first
+    finally:
+        sys.modules.pop("fingerprinted_action", None)
+        ActionMeta.actions_registry.pop("test_fingerprinted", None)
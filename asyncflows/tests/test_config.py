@@ -1,7 +1,11 @@
 import ast
+import subprocess
+import sys
 
 import jsonschema
+import pydantic
 import pytest
+import simpleeval
 from asyncflows.models.config.common import (
     StrictModel,
 )
@@ -17,6 +21,8 @@ from asyncflows.models.config.value_declarations import (
 )
 from asyncflows.models.primitives import TemplateString
 from asyncflows.utils.config_utils import get_full_paths_from_ast
+from asyncflows.utils.lambda_utils import compile_lambda
+from asyncflows.utils.loader_utils import get_config_model
 
 
 @pytest.mark.parametrize(
@@ -272,6 +278,41 @@ async def test_lambda_declaration_rendering(expr, locals_, expected_result, log)
         assert await dec.render(locals_) == expected_result
 
 
+@pytest.mark.parametrize(
+    "expr, locals_, expected_exception",
+    [
+        ("missing", {}, simpleeval.NameNotDefined),
+        ("a.__class__", {"a": 1}, simpleeval.FeatureNotAvailable),
+        ("a.format()", {"a": "{}"}, simpleeval.FeatureNotAvailable),
+        ("__builtins__", {}, simpleeval.FeatureNotAvailable),
+        ("print(a)", {"a": 1}, simpleeval.FunctionNotDefined),
+        ("a.missing", {"a": {}}, simpleeval.AttributeDoesNotExist),
+        ("a - 1", {"a": 1}, ValueError),
+        (
+            "'a' + b",
+            {"b": "b" * simpleeval.MAX_STRING_LENGTH},
+            simpleeval.IterableTooLong,
+        ),
+    ],
+)
+async def test_lambda_declaration_rendering_restricted(
+    expr, locals_, expected_exception, log
+):
+    dec = LambdaDeclaration(**{"lambda": expr})
+    with pytest.raises(expected_exception):
+        await dec.render(locals_)
+
+
+async def test_lambda_declaration_compiled_once(log):
+    compile_lambda.cache_clear()
+    dec = LambdaDeclaration(**{"lambda": "[doc for doc in docs if doc != skip] + [n]"})
+
+    assert await dec.render({"docs": [1, 2, 3], "skip": 2, "n": 4}) == [1, 3, 4]
+    assert await dec.render({"docs": [], "skip": 2, "n": 5}) == [5]
+    assert compile_lambda.cache_info().misses == 1
+    assert compile_lambda.cache_info().hits == 1
+
+
 @pytest.mark.parametrize(
     "expr, expected_paths",
     [
@@ -437,3 +478,107 @@ async def test_render_template(template, context, expected_output):
 )
 async def test_render_var(template, context, expected_output):
     assert await render_var(template, context) == expected_output
+
+
+def test_config_model_rebuilt_on_registry_change():
+    from asyncflows import Action
+    from asyncflows.models.config.action import ActionMeta
+    from asyncflows.tests.resources.actions import AddInputs, AddOutputs
+
+    config_model = get_config_model()
+    assert get_config_model() is config_model
+
+    class TemporaryAction(Action[AddInputs, AddOutputs]):
+        name = "test_temporary"
+
+    try:
+        new_config_model = get_config_model()
+        assert new_config_model is not config_model
+        new_config_model.model_validate(
+            {"flow": {"temporary": {"action": "test_temporary", "a": 1, "b": 2}}}
+        )
+    finally:
+        del ActionMeta.actions_registry[TemporaryAction.name]
+
+    assert get_config_model() is not new_config_model
+
+
+def test_action_manifest_up_to_date():
+    from asyncflows.utils.action_utils import (
+        build_action_manifest,
+        load_action_manifest,
+    )
+
+    built = build_action_manifest("asyncflows.actions")
+    loaded = load_action_manifest("asyncflows.actions")
+    # run `make manifest` if this fails
+    assert loaded == built
+
+
+def test_config_model_from_action_names():
+    from asyncflows.utils.loader_utils import _get_action_names
+
+    flow = {
+        "first": {"action": "test_add", "a": 1, "b": 2},
+        "loop": {
+            "for": "x",
+            "in": [1, 2],
+            "flow": {"second": {"action": "test_double_add", "a": 1, "b": 2}},
+        },
+    }
+    assert _get_action_names(flow) == {"test_add", "test_double_add"}
+    assert _get_action_names({"first": "malformed"}) is None
+
+    config_model = get_config_model(["test_add"])
+    assert get_config_model(["test_add", "test_add"]) is config_model
+    config_model.model_validate(
+        {"flow": {"first": {"action": "test_add", "a": 1, "b": 2}}}
+    )
+    with pytest.raises(pydantic.ValidationError):
+        config_model.model_validate(
+            {"flow": {"first": {"action": "test_double_add", "a": 1, "b": 2}}}
+        )
+
+
+def test_load_config_imports_only_used_actions():
+    script = """
+import sys
+from asyncflows.utils.loader_utils import load_config_text
+load_config_text('''
+flow:
+  extract:
+    action: extract_xml_tag
+    text: <a>b</a>
+    tag: a
+''')
+assert "asyncflows.actions.extract_xml_tag" in sys.modules
+assert "asyncflows.actions.prompt" not in sys.modules
+"""
+    subprocess.run([sys.executable, "-c", script], check=True)
+
+
+@pytest.mark.parametrize("module", ["asyncflows.nonexistent", "json"])
+def test_action_type_stale_manifest(monkeypatch, module):
+    from asyncflows.models.config.action import ActionMeta
+    from asyncflows.utils import action_utils
+    from asyncflows.utils.action_utils import ActionManifestEntry, get_action_type
+
+    registry = ActionMeta.actions_registry
+    action = registry.pop("test_add")
+
+    def get_actions_dict():
+        registry["test_add"] = action
+        return registry
+
+    try:
+        # the manifest lists the action under a module that can't be imported, or doesn't define it
+        monkeypatch.setattr(
+            action_utils,
+            "_action_manifest",
+            {"test_add": ActionManifestEntry(module=module)},
+        )
+        monkeypatch.setattr(action_utils, "get_actions_dict", get_actions_dict)
+
+        assert get_action_type("test_add") is action
+    finally:
+        registry["test_add"] = action
@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+
+import pytest
+
+from asyncflows.utils import executor_utils
+from asyncflows.utils.executor_utils import (
+    configure_executors,
+    get_executor,
+    release_executors,
+    retain_executors,
+    run_in_executor,
+    shutdown_executors,
+)
+
+_var = contextvars.ContextVar("var", default=None)
+
+
+def _get_thread_and_var():
+    return threading.get_ident(), _var.get()
+
+
+def _sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def executors():
+    yield
+    configure_executors()
+    shutdown_executors()
+
+
+async def test_run_in_thread(executors):
+    _var.set("value")
+    thread_id, value = await run_in_executor("thread", _get_thread_and_var)
+    assert thread_id != threading.get_ident()
+    # the context variables carry over to the thread
+    assert value == "value"
+
+
+async def test_run_in_process(executors):
+    assert await run_in_executor("process", os.getpid) != os.getpid()
+
+
+async def test_run_in_executor_keeps_loop_running(executors):
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.create_task(tick())
+    await run_in_executor("thread", _sleep, 0.2)
+    ticker.cancel()
+
+    assert ticks >= 5
+
+
+async def test_configure_executors(executors):
+    configure_executors(max_threads=1)
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        run_in_executor("thread", _sleep, 0.1),
+        run_in_executor("thread", _sleep, 0.1),
+    )
+    # the calls wait for the single thread
+    assert time.perf_counter() - start >= 0.2
+
+    with pytest.raises(ValueError):
+        configure_executors(max_processes=0)
+
+
+async def test_release_executors(executors, monkeypatch):
+    # regardless of the flows other tests left open
+    monkeypatch.setattr(executor_utils, "_executors_holders", 0)
+    retain_executors()
+    retain_executors()
+    executor = get_executor("thread")
+
+    release_executors()
+    # still held by the other
+    assert get_executor("thread") is executor
+
+    release_executors()
+    assert "thread" not in executor_utils._executors
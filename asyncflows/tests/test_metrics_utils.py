@@ -0,0 +1,98 @@
+import pytest
+
+from asyncflows.repos.blob_repo import InMemoryBlobRepo
+from asyncflows.services.action_service import ActionService
+from asyncflows.utils.metrics_utils import MetricsRegistry
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests", ("path",))
+    histogram = registry.histogram("latency_seconds", "Latency")
+
+    counter.inc(path="/")
+    histogram.observe(0.1)
+
+    assert counter.collect() == []
+    assert histogram.collect() == []
+
+
+def test_registry_snapshot():
+    registry = MetricsRegistry()
+    registry.enable()
+    counter = registry.counter("requests_total", "Requests", ("path",))
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    registry.gauge("in_flight", "In flight", lambda: 3)
+
+    counter.inc(path="/")
+    counter.inc(2, path="/")
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    snapshot = registry.snapshot()
+    assert snapshot["requests_total"]["samples"] == [
+        {"labels": {"path": "/"}, "value": 3}
+    ]
+    (sample,) = snapshot["latency_seconds"]["samples"]
+    assert sample["buckets"] == {0.1: 1, 1: 2, float("inf"): 3}
+    assert sample["count"] == 3
+    assert sample["sum"] == pytest.approx(5.55)
+    assert snapshot["in_flight"] == {
+        "type": "gauge",
+        "help": "In flight",
+        "samples": [{"labels": {}, "value": 3}],
+    }
+
+
+def test_registry_to_prometheus():
+    registry = MetricsRegistry()
+    registry.enable()
+    registry.counter("requests_total", "Requests", ("path",)).inc(path='/"a"')
+    registry.histogram("latency_seconds", "Latency", buckets=(1,)).observe(0.5)
+
+    assert registry.to_prometheus() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{path="/\\"a\\""} 1.0\n'
+        "# HELP latency_seconds Latency\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="1.0"} 1\n'
+        'latency_seconds_bucket{le="+Inf"} 1\n'
+        "latency_seconds_sum 0.5\n"
+        "latency_seconds_count 1\n"
+    )
+
+
+async def test_action_service_metrics(
+    log, enabled_metrics, temp_dir, cache_repo, testing_actions
+):
+    def new_action_service():
+        return ActionService(
+            temp_dir=temp_dir,
+            use_cache=True,
+            cache_repo=cache_repo,
+            blob_repo=InMemoryBlobRepo(temp_dir=temp_dir),
+            config=testing_actions,
+        )
+
+    outputs = await new_action_service().run_action(log=log, action_id="second_sum")
+    assert outputs.result == 7
+    # the second service finds both actions' outputs in the cache
+    await new_action_service().run_action(log=log, action_id="second_sum")
+
+    snapshot = enabled_metrics.snapshot()
+    (run_sample,) = snapshot["asyncflows_action_run_seconds"]["samples"]
+    assert run_sample["labels"] == {"action": "test_add"}
+    # first_sum and second_sum ran once each
+    assert run_sample["count"] == 2
+
+    lookups = {
+        sample["labels"]["result"]: sample["value"]
+        for sample in snapshot["asyncflows_cache_lookups_total"]["samples"]
+    }
+    assert lookups == {"miss": 2, "hit": 2}
+
+    # the tasks have all finished
+    assert snapshot["asyncflows_action_tasks_in_flight"]["samples"][0]["value"] == 0
+    assert "asyncflows_action_run_seconds_count" in enabled_metrics.to_prometheus()
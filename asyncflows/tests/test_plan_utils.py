@@ -0,0 +1,172 @@
+import pytest
+
+from asyncflows.models.config.value_declarations import (
+    LambdaDeclaration,
+    LinkDeclaration,
+    TextDeclaration,
+)
+from asyncflows.utils.plan_utils import (
+    compile_plan,
+    get_hoisting_loop_prefix,
+    get_loop_references,
+)
+
+
+def test_compile_dependencies(testing_actions):
+    plan = compile_plan(testing_actions)
+
+    assert plan.executables["first_sum"].dependencies == frozenset()
+    assert plan.executables["second_sum"].dependencies == {("first_sum", False)}
+    assert plan.executables["both_streaming_dependency_add"].dependencies == {
+        ("double_add", True),
+        ("double_add", False),
+    }
+    assert plan.executables["cache_key_var_adder"].cache_key_dependencies == {
+        ("first_sum", False)
+    }
+    assert plan.executables["dependent_in_iterator"].dependencies == {
+        ("first_sum", False)
+    }
+
+
+def test_compile_order(testing_actions):
+    plan = compile_plan(testing_actions)
+
+    assert set(plan.order) == set(testing_actions.flow)
+    for executable_id in plan.order:
+        position = plan.order.index(executable_id)
+        for dependency_id, _ in plan.executables[executable_id].dependencies:
+            assert plan.order.index(dependency_id) < position
+
+
+def test_compile_loop_plans(testing_actions):
+    plan = compile_plan(testing_actions)
+
+    loop_plan = plan.get_loop_plan("iterator_with_internal_dependencies")
+    assert loop_plan.order == ("add", "add2")
+    assert loop_plan.parent is plan
+    # outer executables stay visible from within the loop
+    assert "first_sum" in loop_plan.flow
+    assert loop_plan.executables["first_sum"] is plan.executables["first_sum"]
+
+    nested_plan = plan.get_loop_plan("nested_iterator").get_loop_plan("nested")
+    assert nested_plan.order == ("add",)
+    # a loop's subplan is found from any scope nested within it
+    assert nested_plan.get_loop_plan("sum_iterator") is plan.get_loop_plan(
+        "sum_iterator"
+    )
+
+
+def test_compile_levels(testing_actions):
+    plan = compile_plan(testing_actions)
+
+    assert plan.levels["first_sum"] == 0
+    assert plan.levels["nested_iterator"] == 0
+
+    loop_plan = plan.get_loop_plan("iterator_with_invariant_action")
+    assert loop_plan.depth == 1
+    assert loop_plan.levels == {"invariant": 0, "add": 1}
+
+    # the inner loop depends on the outer loop's variable through its body
+    nested_plan = plan.get_loop_plan("nested_iterator")
+    assert nested_plan.levels == {"nested": 1}
+    assert nested_plan.get_loop_plan("nested").levels == {"add": 2}
+
+
+def test_get_task_prefix(testing_actions):
+    plan = compile_plan(testing_actions)
+
+    loop_plan = plan.get_loop_plan("iterator_with_invariant_action")
+    task_prefix = "iterator_with_invariant_action[1]."
+    assert loop_plan.get_task_prefix("add", task_prefix) == task_prefix
+    assert (
+        loop_plan.get_task_prefix("invariant", task_prefix)
+        == "iterator_with_invariant_action[*]."
+    )
+    # outer executables run in their own scope
+    assert loop_plan.get_task_prefix("first_sum", task_prefix) == ""
+
+    nested_plan = plan.get_loop_plan("nested_iterator").get_loop_plan("nested")
+    task_prefix = "nested_iterator[2].nested[0]."
+    assert nested_plan.get_task_prefix("add", task_prefix) == task_prefix
+    assert nested_plan.get_task_prefix("nested", task_prefix) == "nested_iterator[2]."
+
+    # a run's namespace is kept
+    assert (
+        nested_plan.get_task_prefix("nested", f"run/{task_prefix}")
+        == "run/nested_iterator[2]."
+    )
+    assert nested_plan.get_task_prefix("first_sum", f"run/{task_prefix}") == "run/"
+
+
+@pytest.mark.parametrize(
+    "task_prefix, scope_task_prefix, expected",
+    [
+        ("loop[1].", "loop[1].", None),
+        ("loop[1].", "loop[*].", "loop"),
+        ("run/loop[1].", "run/", "run/loop"),
+        ("outer[2].inner[0].", "outer[2].inner[*].", "outer[2].inner"),
+        ("outer[2].inner[0].", "outer[*].inner[0].", "outer"),
+        ("run/", "run/", None),
+    ],
+)
+def test_get_hoisting_loop_prefix(task_prefix, scope_task_prefix, expected):
+    assert get_hoisting_loop_prefix(task_prefix, scope_task_prefix) == expected
+
+
+def test_compile_cycle(testing_actions_type):
+    config = testing_actions_type.model_validate(
+        {
+            "flow": {
+                "a": {"action": "test_add", "a": {"link": "b.result"}, "b": 1},
+                "b": {"action": "test_add", "a": {"link": "a.result"}, "b": 1},
+            }
+        }
+    )
+    with pytest.raises(ValueError, match="cycle"):
+        compile_plan(config)
+
+
+@pytest.mark.parametrize(
+    "input_spec, expected_references",
+    [
+        (LinkDeclaration(link="first_sum.result"), {}),
+        (LinkDeclaration(link="loop[0].add.result"), {"loop": {"add"}}),
+        (LinkDeclaration(link="loop.1.add2"), {"loop": {"add2"}}),
+        (LinkDeclaration(link="loop"), {"loop": None}),
+        (LinkDeclaration(link="loop[0].missing"), {"loop": None}),
+        (LambdaDeclaration(**{"lambda": "[it.add for it in loop]"}), {"loop": {"add"}}),
+        (
+            LambdaDeclaration(
+                **{
+                    "lambda": "[p for it in loop for p in it['add2'].pages if p != it.add]"
+                }
+            ),
+            {"loop": {"add", "add2"}},
+        ),
+        (LambdaDeclaration(**{"lambda": "loop[1].add.result"}), {"loop": {"add"}}),
+        (LambdaDeclaration(**{"lambda": "[it for it in loop]"}), {"loop": None}),
+        (LambdaDeclaration(**{"lambda": "[loop.x for loop in other]"}), {}),
+        (TextDeclaration(text="{{ loop[0].add }}"), {"loop": None}),
+        (
+            {
+                "a": LinkDeclaration(link="loop[0].add"),
+                "b": [LinkDeclaration(link="loop[1].add2")],
+            },
+            {"loop": {"add", "add2"}},
+        ),
+        (
+            {
+                "a": LinkDeclaration(link="loop[0].add"),
+                "b": LinkDeclaration(link="loop"),
+            },
+            {"loop": None},
+        ),
+    ],
+)
+def test_get_loop_references(input_spec, expected_references):
+    loops = {"loop": frozenset(["add", "add2"])}
+    assert get_loop_references(input_spec, loops) == {
+        loop_id: frozenset(body_ids) if body_ids is not None else None
+        for loop_id, body_ids in expected_references.items()
+    }
@@ -0,0 +1,39 @@
+import multiprocessing
+import sys
+import time
+
+import pytest
+
+from asyncflows.utils.process_utils import _check_workers
+
+
+def test_check_workers_fails_on_any_exit():
+    context = multiprocessing.get_context()
+    running = context.Process(target=time.sleep, args=(5,), daemon=True)
+    failed = context.Process(target=sys.exit, args=(1,), daemon=True)
+    running.start()
+    failed.start()
+    failed.join()
+
+    try:
+        # a worker failed while the other is still running
+        with pytest.raises(RuntimeError):
+            _check_workers([running, failed])
+    finally:
+        running.terminate()
+        running.join()
+
+
+def test_check_workers_allows_finished_workers():
+    context = multiprocessing.get_context()
+    running = context.Process(target=time.sleep, args=(5,), daemon=True)
+    finished = context.Process(target=time.sleep, args=(0,), daemon=True)
+    running.start()
+    finished.start()
+    finished.join()
+
+    try:
+        _check_workers([running, finished])
+    finally:
+        running.terminate()
+        running.join()
@@ -0,0 +1,137 @@
+import pytest
+from pydantic import BaseModel
+
+from asyncflows.models.io import DefaultOutputOutputs
+from asyncflows.utils.rendering_utils import (
+    TemplateCache,
+    _jinja_env,
+    compile_var_path,
+    extract_root_var,
+    render_template,
+    render_var,
+    template_cache,
+)
+
+
+async def test_template_cache_hits():
+    template_cache.clear()
+
+    for _ in range(3):
+        assert await render_template("{{ a }} + {{ b }}", {"a": 1, "b": 2}) == "1 + 2"
+
+    assert template_cache.misses == 1
+    assert template_cache.hits == 2
+
+
+def test_template_cache_eviction():
+    cache = TemplateCache(_jinja_env, maxsize=2)
+
+    first = cache.get("{{ a }}")
+    cache.get("{{ b }}")
+    # touch `a` so `b` is the least recently used
+    assert cache.get("{{ a }}") is first
+    cache.get("{{ c }}")
+
+    assert len(cache) == 2
+    assert cache.get("{{ a }}") is first
+    assert cache.misses == 3
+    cache.get("{{ b }}")
+    assert cache.misses == 4
+
+
+def test_template_cache_disabled():
+    cache = TemplateCache(_jinja_env, maxsize=0)
+
+    cache.get("{{ a }}")
+    cache.get("{{ a }}")
+
+    assert len(cache) == 0
+    assert cache.misses == 2
+
+
+class Nested(BaseModel):
+    values: list[int]
+
+
+class Document(BaseModel):
+    nested: Nested
+    metadata: dict[str, str]
+
+
+class DefaultOutput(DefaultOutputOutputs):
+    _default_output = "nested.values"
+
+    nested: Nested
+
+
+@pytest.mark.parametrize(
+    "var",
+    [
+        "a",
+        "a.b.c",
+        "a.l[1].z",
+        "a.l.0",
+        "a.l[-1]['z']",
+        'a["b"]["c"]',
+        "a.items",
+        "doc.nested.values[1]",
+        "doc.metadata.author",
+        "doc.missing",
+        "default",
+        "default.nested",
+        "missing",
+        "a.l[5]",
+        "range",
+        "a.l | length",
+    ],
+)
+async def test_render_var_matches_jinja(var):
+    context = {
+        "a": {"b": {"c": 1}, "items": 3, "l": [1, {"z": 2}]},
+        "doc": Document(nested=Nested(values=[1, 2]), metadata={"author": "me"}),
+        "default": DefaultOutput(nested=Nested(values=[3])),
+    }
+
+    rendered = await render_var(var, context)
+    expected = await render_template(f"{{{{ {var} }}}}", context)
+
+    if callable(expected):
+        assert type(rendered) is type(expected)
+    else:
+        assert repr(rendered) == repr(expected)
+
+
+@pytest.mark.parametrize(
+    "var, expected_steps",
+    [
+        ("a", ()),
+        ("a.b", ((True, "b"),)),
+        ("a[0].b", ((False, 0), (True, "b"))),
+        ("a.0", ((False, 0),)),
+        ("a['b c']", ((False, "b c"),)),
+        ("a | length", None),
+        ("a.b()", None),
+        ("a + b", None),
+        ("true", None),
+    ],
+)
+def test_compile_var_path(var, expected_steps):
+    accessor = compile_var_path(var)
+    if expected_steps is None:
+        assert accessor is None
+    else:
+        assert accessor is not None
+        assert accessor.steps == expected_steps
+
+
+@pytest.mark.parametrize(
+    "var, expected_root",
+    [
+        ("a", "a"),
+        ("a.b.c", "a"),
+        ("loop[0].add.result", "loop"),
+        ("a['b']", "a"),
+    ],
+)
+def test_extract_root_var(var, expected_root):
+    assert extract_root_var(var) == expected_root
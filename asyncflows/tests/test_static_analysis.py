@@ -18,6 +18,7 @@ from asyncflows.utils.static_utils import (
         ),
         ("default_model_var.yaml", set(), False),
         ("default_model_var.yaml", {"some_model"}, True),
+        ("unused_loop_action.yaml", set(), True),
     ],
 )
 def test_static_analysis(
@@ -29,3 +30,25 @@ def test_static_analysis(
         check_config_consistency(log, config, variables, config.get_default_output())
         is expected
     )
+
+
+@pytest.mark.parametrize(
+    "target_output, variables, expected",
+    [
+        ("consumer.result", set(), True),
+        # the whole loop runs when it's the target
+        ("iterator", set(), False),
+        ("iterator", {"debug_value"}, True),
+        # targeting an output in the loop runs only that part of the body
+        ("iterator[0].add.result", set(), True),
+        ("iterator[0].debug.result", set(), False),
+    ],
+)
+def test_static_analysis_unused_loop_action(
+    log, testing_actions_type, target_output, variables, expected
+) -> None:
+    full_actions_path = os.path.join(
+        "asyncflows", "tests", "resources", "unused_loop_action.yaml"
+    )
+    config = load_config_file(full_actions_path, config_model=testing_actions_type)
+    assert check_config_consistency(log, config, variables, target_output) is expected
@@ -0,0 +1,79 @@
+import json
+
+from asyncflows import AsyncFlows
+from asyncflows.utils.trace_utils import get_tracer, tracing
+
+
+def _get_spans(tracer) -> dict[str, set[str]]:
+    # span names by task ID
+    task_ids = {
+        event["tid"]: event["args"]["name"]
+        for event in tracer.events
+        if event["name"] == "thread_name"
+    }
+    spans = {}
+    for event in tracer.events:
+        if event["ph"] in ("X", "i"):
+            spans.setdefault(task_ids[event["tid"]], set()).add(event["name"])
+    return spans
+
+
+async def test_trace_action(log, in_memory_action_service):
+    with tracing() as tracer:
+        outputs = await in_memory_action_service.run_action(
+            log=log, action_id="second_sum"
+        )
+    assert outputs.result == 7
+    assert get_tracer() is None
+
+    spans = _get_spans(tracer)
+    assert spans["second_sum"] >= {
+        "queue wait",
+        "task",
+        "dependency wait",
+        "cache lookup",
+        "run",
+        "outputs",
+    }
+    assert "run" in spans["first_sum"]
+
+    (run_span,) = [
+        event
+        for event in tracer.events
+        if event["name"] == "run" and event["tid"] == tracer.thread_ids["second_sum"]
+    ]
+    assert run_span["dur"] > 0
+    assert {"wall_time", "blocking_time"} <= set(run_span["args"])
+
+
+async def test_trace_loop(log, in_memory_action_service):
+    with tracing() as tracer:
+        await in_memory_action_service.run_loop(
+            log=log, loop_id="iterator_with_invariant_action"
+        )
+
+    spans = _get_spans(tracer)
+    for i in range(3):
+        assert "run" in spans[f"iterator_with_invariant_action[{i}].add"]
+    # the invariant action is hoisted out of the iterations
+    assert "run" in spans["iterator_with_invariant_action[*].invariant"]
+
+
+async def test_trace_export(testing_actions, temp_dir, tmp_path):
+    flows = AsyncFlows(config=testing_actions, temp_dir=temp_dir).set_vars(x=1)
+    path = tmp_path / "trace.json"
+
+    with tracing(path):
+        assert await flows.run("second_sum.result") == 7
+
+    with open(path) as f:
+        trace = json.load(f)
+    names = {
+        event["args"]["name"]
+        for event in trace["traceEvents"]
+        if event["name"] == "thread_name"
+    }
+    # the run's namespace prefixes its tasks
+    namespace = next(name for name in names if "/" not in name)
+    assert f"{namespace}/second_sum" in names
+    assert all(event["ph"] == "M" or event["ts"] >= 0 for event in trace["traceEvents"])
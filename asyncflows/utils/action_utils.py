@@ -1,4 +1,7 @@
+import importlib
+import importlib.resources
 import inspect
+import json
 import typing
 from typing import Any, Annotated, Literal, Union, Type
 
@@ -354,10 +357,9 @@ def build_actions(
     if action_names is None:
         action_names = list(get_actions_dict().keys())
 
-    actions_dict = get_actions_dict()
     action_models = []
     for action_name in action_names:
-        action = actions_dict[action_name]
+        action = get_action_type(action_name)
 
         title = build_action_title(action, markdown=False)
 
@@ -472,3 +474,122 @@ def get_actions_dict(
 
     # return all subclasses of Action as registered in the metaclass
     return ActionMeta.actions_registry
+
+
+#: The file in an action package listing its actions, so they can be found without importing them all
+ACTION_MANIFEST_FILENAME = "action_manifest.json"
+
+# the actions shipped with asyncflows are available even if its entrypoint isn't installed
+_builtin_actions_package = "asyncflows.actions"
+
+
+class ActionManifestEntry(pydantic.BaseModel):
+    """
+    What's known about an action without importing it.
+    """
+
+    #: The module to import to register the action
+    module: str
+    readable_name: str | None = None
+    description: str | None = None
+    inputs_schema: dict[str, Any] | None = None
+    outputs_schema: dict[str, Any] | None = None
+
+
+ActionManifest = dict[ExecutableName, ActionManifestEntry]
+
+_action_manifest_adapter = pydantic.TypeAdapter(ActionManifest)
+_action_manifest: ActionManifest | None = None
+
+
+def _get_json_schema(get_type: typing.Callable[[], type]) -> dict[str, Any] | None:
+    try:
+        return pydantic.TypeAdapter(get_type()).json_schema()
+    except Exception:
+        # not all types can be represented in JSON schema
+        return None
+
+
+def build_action_manifest(package_name: str) -> ActionManifest:
+    """
+    Import the actions of the package, and list them with their modules and schemas.
+    """
+    recursive_import(package_name)
+    manifest = {}
+    for action_name, action in sorted(ActionMeta.actions_registry.items()):
+        if not action.__module__.startswith(f"{package_name}."):
+            continue
+        manifest[action_name] = ActionManifestEntry(
+            module=action.__module__,
+            readable_name=action.readable_name,
+            description=action.description,
+            inputs_schema=_get_json_schema(action._get_inputs_type),
+            outputs_schema=_get_json_schema(lambda: action._get_outputs_type(None)),
+        )
+    return manifest
+
+
+def dump_action_manifest(manifest: ActionManifest) -> str:
+    return json.dumps(
+        _action_manifest_adapter.dump_python(manifest, mode="json"),
+        indent=2,
+    )
+
+
+def load_action_manifest(package_name: str) -> ActionManifest:
+    """
+    Load the package's manifest, importing only the package itself; empty if it has none.
+    """
+    try:
+        manifest_file = importlib.resources.files(package_name).joinpath(
+            ACTION_MANIFEST_FILENAME
+        )
+        manifest_text = manifest_file.read_text()
+    except (ImportError, OSError):
+        return {}
+    return _action_manifest_adapter.validate_json(manifest_text)
+
+
+def get_action_manifest() -> ActionManifest:
+    """
+    Get the manifests of the built-in actions and of those of installed packages' entrypoints.
+    """
+    global _action_manifest
+    if _action_manifest is None:
+        import importlib_metadata
+
+        package_names = [_builtin_actions_package]
+        entrypoints = importlib_metadata.entry_points(group="asyncflows")
+        for entrypoint in entrypoints.select(name="actions"):
+            if entrypoint.value not in package_names:
+                package_names.append(entrypoint.value)
+
+        manifest = {}
+        for package_name in package_names:
+            manifest.update(load_action_manifest(package_name))
+        _action_manifest = manifest
+    return _action_manifest
+
+
+def get_action_type(name: ExecutableName) -> Type[InternalActionBase[Any, Any]]:
+    """
+    Get the action registered as `name`.
+    If it's not yet registered, only the module the manifest lists for it is imported;
+    actions not in any manifest, or that a stale manifest misplaces,
+    are looked for by importing all the entrypoints' actions.
+    """
+    registry = ActionMeta.actions_registry
+    if name not in registry:
+        entry = get_action_manifest().get(name)
+        if entry is not None:
+            try:
+                importlib.import_module(entry.module)
+            except ImportError as e:
+                print(f"Failed to import {entry.module}: {e}")
+            if name not in registry:
+                print(f"Module {entry.module} does not register action {name}")
+    if name not in registry:
+        get_actions_dict()
+    if name not in registry:
+        raise ValueError(f"Unknown action: {name}")
+    return registry[name]
@@ -1,88 +1,299 @@
 import asyncio
+import sys
+import threading
 import time
+import traceback
 from asyncio import CancelledError
-from typing import TypeVar, AsyncIterator, Awaitable, Sequence
+from collections import deque
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Iterable,
+    Literal,
+    Sequence,
+    TypeVar,
+)
 
 import sentry_sdk
 import structlog
 
+from asyncflows.utils.metrics_utils import metrics
+
 T = TypeVar("T")
 IdType = TypeVar("IdType")
 OutputType = TypeVar("OutputType")
 
+event_loop_lag_seconds = metrics.histogram(
+    "asyncflows_event_loop_lag_seconds",
+    "Lag spikes of the event loop, by the action they're attributed to",
+    ("action",),
+)
+
+
+@dataclass(frozen=True)
+class LagEvent:
+    """
+    A lag spike of the event loop, recorded by `LagMonitor`.
+    """
+
+    lag: float
+    #: The action task that blocked the loop the longest since the monitor last checked, if known
+    task_id: str | None = None
+    action: str | None = None
+    #: How long that action blocked the loop for, by its timer
+    blocking_time: float | None = None
+    #: The stack of the call that blocked the loop, if sampling stacks
+    stack: str | None = None
+
 
 class LagMonitor:
+    """
+    Warn when the event loop lags, attributing the lag to the action that blocked it.
+
+    Actions are attributed by the blocking time their timers measured since the monitor last checked,
+    so they must be registered with `watch_action` (`ActionService` does so with its lag monitor).
+    With `sample_stacks`, a watchdog thread also captures the stack of the loop's thread while it's blocked,
+    along with the name of the task running (`ActionService` names the action tasks by their task IDs);
+    this attributes blocking the timers miss, e.g., under `off` or `sampled` instrumentation.
+    """
+
     def __init__(
         self,
         log: structlog.stdlib.BoundLogger,
         interval: float = 0.5,
         lag_threshold: float = 0.3,
+        sample_stacks: bool = False,
+        stack_depth: int = 20,
+        max_events: int = 100,
     ):
         self.log = log
         self.interval = interval
         self.lag_threshold = lag_threshold
+        self.sample_stacks = sample_stacks
+        self.stack_depth = stack_depth
         self.task = None
+        self.events: deque[LagEvent] = deque(maxlen=max_events)
+
+        # the timers of the running actions by task ID, and their blocking time when last checked
+        self._actions: dict[str, tuple[str, "Timer"]] = {}
+        self._blocking_times: dict[str, float] = {}
+        # the blocking time of the actions that finished since the last check
+        self._finished_blocking_times: dict[str, tuple[str, float]] = {}
+
+        self._heartbeat = 0.0
+        self._stall: tuple[str | None, str] | None = None
+        self._stop_watchdog = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        if self.task is None or self.task.done():
+            return False
+        try:
+            return self.task.get_loop() is asyncio.get_running_loop()
+        except RuntimeError:
+            return False
 
     def start(self):
         loop = asyncio.get_running_loop()
-        self.task = loop.create_task(self._loop_monitor(loop))
+        # measure from now, in case the loop is blocked before the monitor first runs
+        self.task = loop.create_task(self._loop_monitor(loop, loop.time()))
+        self._heartbeat = time.monotonic()
+        if self.sample_stacks:
+            self._stop_watchdog = threading.Event()
+            threading.Thread(
+                target=self._watchdog,
+                args=(loop, threading.get_ident(), self._stop_watchdog),
+                name="asyncflows-lag-watchdog",
+                daemon=True,
+            ).start()
+
+    def ensure_started(self):
+        if not self.running:
+            self.start()
 
     def stop(self):
         if self.task is None:
             raise RuntimeError("LagMonitor not started")
         self.task.cancel()
+        self._stop_watchdog.set()
 
-    async def _loop_monitor(self, loop: asyncio.AbstractEventLoop):
-        while loop.is_running():
-            start = loop.time()
+    def watch_action(self, task_id: str, action: str, timer: "Timer"):
+        self._actions[task_id] = (action, timer)
+
+    def unwatch_action(self, task_id: str):
+        if task_id not in self._actions:
+            return
+        action, timer = self._actions.pop(task_id)
+        blocking_time = timer.blocking_time - self._blocking_times.pop(task_id, 0)
+        self._finished_blocking_times[task_id] = (action, blocking_time)
 
+    def _collect_blocking_times(self) -> dict[str, tuple[str, float]]:
+        # the blocking time of each action since the last check
+        blocking_times = self._finished_blocking_times
+        self._finished_blocking_times = {}
+        for task_id, (action, timer) in self._actions.items():
+            total = timer.blocking_time
+            blocking_times[task_id] = (
+                action,
+                total - self._blocking_times.get(task_id, 0),
+            )
+            self._blocking_times[task_id] = total
+        return blocking_times
+
+    def _watchdog(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        thread_id: int,
+        stop: threading.Event,
+    ):
+        poll_interval = min(self.interval, self.lag_threshold) / 2
+        while not stop.wait(poll_interval) and not loop.is_closed():
+            stalled = time.monotonic() - self._heartbeat
+            if self._stall is not None or stalled < self.interval + self.lag_threshold:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(loop)
+            stack = "".join(traceback.format_stack(frame, limit=self.stack_depth))
+            self._stall = (None if task is None else task.get_name(), stack)
+
+    def _get_lag_event(self, lag: float) -> LagEvent:
+        blocking_times = self._collect_blocking_times()
+        stall = self._stall
+        self._stall = None
+
+        task_id = action = blocking_time = stack = None
+        stalled_task_name = None
+        if stall is not None:
+            stalled_task_name, stack = stall
+        if stalled_task_name in blocking_times:
+            # the watchdog caught the action blocking
+            task_id = stalled_task_name
+        elif blocking_times:
+            task_id = max(blocking_times, key=lambda key: blocking_times[key][1])
+            if not blocking_times[task_id][1]:
+                task_id = stalled_task_name
+        else:
+            task_id = stalled_task_name
+        if task_id in blocking_times:
+            action, blocking_time = blocking_times[task_id]
+        return LagEvent(
+            lag=lag,
+            task_id=task_id,
+            action=action,
+            blocking_time=blocking_time,
+            stack=stack,
+        )
+
+    async def _loop_monitor(self, loop: asyncio.AbstractEventLoop, start: float):
+        while loop.is_running():
             await asyncio.sleep(self.interval)
 
             time_elapsed = loop.time() - start
             lag = time_elapsed - self.interval
             if lag > self.lag_threshold:
+                event = self._get_lag_event(lag)
+                self.events.append(event)
+                event_loop_lag_seconds.observe(lag, action=event.action or "")
                 self.log.warning(
                     "Event loop lagging",
                     lag=lag,
+                    task_id=event.task_id,
+                    action=event.action,
+                    blocking_time=event.blocking_time,
+                    stack=event.stack,
                 )
+            else:
+                self._collect_blocking_times()
+                self._stall = None
+
+            start = loop.time()
+            self._heartbeat = time.monotonic()
+
+
+# what `merge_iterators` does when one of the iterators raises:
+# - `continue` yields an `IteratorFailure` in its stead, and keeps iterating the others
+# - `fail_fast` cancels the other iterators and raises the exception
+FailurePolicy = Literal["continue", "fail_fast"]
+
+
+@dataclass(frozen=True)
+class IteratorFailure:
+    """
+    Yielded by `merge_iterators` as the value of an iterator that raised.
+    """
+
+    exception: Exception
 
 
 async def merge_iterators(
     log: structlog.stdlib.BoundLogger,
     ids: Sequence[IdType],
     coros: list[AsyncIterator[OutputType]],
-) -> AsyncIterator[tuple[IdType, OutputType | None]]:
+    max_concurrency: int | None = None,
+    failure_policy: FailurePolicy = "continue",
+    max_buffered: int | None = None,
+) -> AsyncIterator[tuple[IdType, OutputType | IteratorFailure]]:
+    """
+    Iterate the iterators concurrently, yielding `(id, value)` pairs as they come.
+    If `max_concurrency` is set, at most that many iterators are iterated at once,
+    in the order they're given.
+    If `max_buffered` is set, at most that many values are buffered for the consumer,
+    and the iterators wait for it to catch up.
+    If an iterator raises, it's handled according to `failure_policy`.
+    """
+
     async def worker(
-        aiter: AsyncIterator[OutputType], iterator_id: IdType, queue: asyncio.Queue
+        pending: deque[tuple[IdType, AsyncIterator[OutputType]]],
+        queue: asyncio.Queue,
     ):
         try:
-            async for value in aiter:
-                await queue.put((False, (iterator_id, value)))
-        except Exception as exc:
-            # If an exception occurs, send it through the queue
-            await queue.put((True, (iterator_id, exc)))
+            while pending:
+                iterator_id, aiter = pending.popleft()
+                try:
+                    async for value in aiter:
+                        if buffer_slots is not None:
+                            await buffer_slots.acquire()
+                        await queue.put((False, (iterator_id, value)))
+                except Exception as exc:
+                    # If an exception occurs, send it through the queue
+                    await queue.put((True, (iterator_id, exc)))
         finally:
-            # Notify the main loop that this coroutine is done
+            # Notify the main loop that this worker is done
             await queue.put(None)
 
+    # the queue itself is unbounded, so the workers can always tell they're done
     queue = asyncio.Queue()
+    buffer_slots = None
+    if max_buffered is not None:
+        buffer_slots = asyncio.Semaphore(max_buffered)
     workers = []  # List to keep track of worker tasks.
+    pending = deque(zip(ids, coros))
+    worker_count = len(pending)
+    if max_concurrency is not None:
+        worker_count = min(worker_count, max_concurrency)
 
     try:
-        for id_, aiter in zip(ids, coros):
-            worker_task = asyncio.create_task(worker(aiter, id_, queue))
+        for _ in range(worker_count):
+            worker_task = asyncio.create_task(worker(pending, queue))
             workers.append(worker_task)
 
         remaining_workers = len(workers)
         while remaining_workers > 0:
             result = await queue.get()
             if result is None:
-                # One coroutine has finished.
+                # One worker has finished.
                 remaining_workers -= 1
                 continue
 
             # A result or an exception was received.
             exception_raised, (id_, value_or_exc) = result
+            if buffer_slots is not None and not exception_raised:
+                buffer_slots.release()
             if exception_raised:
                 log.exception(
                     "Exception raised in worker",
@@ -90,32 +301,84 @@ async def merge_iterators(
                     exc_info=value_or_exc,
                 )
                 sentry_sdk.capture_exception(value_or_exc)
-                # yield id_, None
-                # If any exception is received, cancel all workers and raise the exception.
-                # for worker_task in workers:
-                #     worker_task.cancel()
-                # await asyncio.gather(*workers, return_exceptions=True)
-                # raise value_or_exc
-            else:
-                # Yield the result.
-                try:
-                    yield id_, value_or_exc
-                except GeneratorExit:
-                    log.warning(
-                        "Generator exited",
-                        id=id_,
-                    )
-                except CancelledError:
-                    log.warning(
-                        "Generator cancelled",
-                        id=id_,
-                    )
+                if failure_policy == "fail_fast":
+                    # the other workers are cancelled on the way out
+                    raise value_or_exc
+                value_or_exc = IteratorFailure(value_or_exc)
+
+            # Yield the result.
+            try:
+                yield id_, value_or_exc
+            except GeneratorExit:
+                log.warning(
+                    "Generator exited",
+                    id=id_,
+                )
+            except CancelledError:
+                log.warning(
+                    "Generator cancelled",
+                    id=id_,
+                )
     finally:
         for worker_task in workers:
             worker_task.cancel()
         await asyncio.gather(*workers, return_exceptions=True)
 
 
+_empty = object()
+
+
+async def iterate_latest(
+    aiter: AsyncIterator[OutputType],
+) -> AsyncIterator[OutputType]:
+    """
+    Consume `aiter` in the background, yielding only its most recent value whenever the consumer asks for one.
+    Values produced while the consumer is busy overwrite each other, but the last value is always yielded.
+    """
+    latest: Any = _empty
+    done = False
+    updated = asyncio.Event()
+
+    async def worker():
+        nonlocal latest, done
+        try:
+            async for value in aiter:
+                latest = value
+                updated.set()
+        finally:
+            done = True
+            updated.set()
+
+    worker_task = asyncio.create_task(worker())
+    try:
+        while True:
+            if latest is not _empty:
+                value, latest = latest, _empty
+                yield value
+                continue
+            if done:
+                break
+            await updated.wait()
+            updated.clear()
+        # propagate the worker's exception, if any
+        await worker_task
+    finally:
+        worker_task.cancel()
+        await asyncio.gather(worker_task, return_exceptions=True)
+
+
+async def iterate_any(iterable: Iterable[T] | AsyncIterable[T]) -> AsyncIterator[T]:
+    """
+    Asynchronously iterate either a regular or an asynchronous iterable.
+    """
+    if isinstance(iterable, AsyncIterable):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
 async def iterator_to_coro(async_iterator: AsyncIterator[T | None]) -> T | None:
     output = None
     async for output in async_iterator:
@@ -124,8 +387,18 @@ async def iterator_to_coro(async_iterator: AsyncIterator[T | None]) -> T | None:
 
 
 class Timer:
-    def __init__(self):
-        self.blocking_time = 0
+    """
+    Measure how long a coroutine spends running its steps (blocking time),
+    and how long from its first step to its last (wall time).
+    With a `sample_interval` above 1, only every `sample_interval`-th step is timed,
+    and the blocking time is extrapolated from those.
+    """
+
+    def __init__(self, sample_interval: int = 1):
+        self.sample_interval = sample_interval
+        self.steps = 0
+        self.sampled_steps = 0
+        self.sampled_blocking_time = 0
         self.blocking_start_time = None
         self.wall_start_time = 0
         self.wall_end_time = 0
@@ -134,16 +407,32 @@ class Timer:
         now = time.monotonic()
         if not self.wall_start_time:
             self.wall_start_time = now
-        self.blocking_start_time = time.perf_counter()
+        self.steps += 1
+        if (self.steps - 1) % self.sample_interval == 0:
+            self.sampled_steps += 1
+            self.blocking_start_time = time.perf_counter()
 
     def end(self):
         self.wall_end_time = time.monotonic()
         if self.blocking_start_time is None:
             return
         end_perf_counter = time.perf_counter()
-        self.blocking_time += end_perf_counter - self.blocking_start_time
+        self.sampled_blocking_time += end_perf_counter - self.blocking_start_time
         self.blocking_start_time = None
 
+    def mark_wall_time(self):
+        # extend the wall time without timing a step
+        now = time.monotonic()
+        if not self.wall_start_time:
+            self.wall_start_time = now
+        self.wall_end_time = now
+
+    @property
+    def blocking_time(self):
+        if not self.sampled_steps:
+            return 0
+        return self.sampled_blocking_time * self.steps / self.sampled_steps
+
     @property
     def wall_time(self):
         # if self.wall_end_time is None or self.wall_start_time is None:
@@ -151,11 +440,131 @@ class Timer:
         return self.wall_end_time - self.wall_start_time
 
 
+# how `measure_coro` and `measure_async_iterator` instrument what they run:
+# - `full` times every step, and enforces the timeout on each future awaited, by waiting on it in a task of its own
+# - `sampled` times the steps according to the timer's `sample_interval`, and enforces the timeout as a single deadline
+# - `off` measures only the wall time, and enforces the timeout as a single deadline
+InstrumentationMode = Literal["off", "sampled", "full"]
+
+
+class _Deadline:
+    """
+    Cancel the current task if it's within the context when the deadline passes,
+    raising `asyncio.TimeoutError` instead; once it's passed, entering the context raises it too.
+    The context may be entered repeatedly, with a single timer handle for all of them.
+    """
+
+    def __init__(self, when: float):
+        self.when = when
+        self.handle = None
+        self.task = None
+        self.entered = False
+        self.expired = False
+
+    def __enter__(self):
+        if self.handle is None:
+            self.handle = asyncio.get_running_loop().call_at(self.when, self._expire)
+        if self.expired:
+            raise asyncio.TimeoutError
+        self.task = asyncio.current_task()
+        self.entered = True
+        return self
+
+    def _expire(self):
+        self.expired = True
+        if self.entered and self.task is not None:
+            self.task.cancel()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.entered = False
+        if self.expired and exc_type is asyncio.CancelledError:
+            if hasattr(self.task, "uncancel"):
+                self.task.uncancel()
+            raise asyncio.TimeoutError from exc
+
+    def cancel(self):
+        if self.handle is not None:
+            self.handle.cancel()
+
+
+class _TimedAwaitable:
+    """
+    Pass each step of the awaitable through to the task running it, timing the step.
+    Unlike the `full` mode's driving loop, this doesn't wrap the awaited futures in tasks of their own.
+    """
+
+    def __init__(self, awaitable: Awaitable[T], timer: Timer):
+        self.awaitable = awaitable
+        self.timer = timer
+
+    def __await__(self):
+        steps = self.awaitable.__await__()
+        value = None
+        exc = None
+        while True:
+            self.timer.start()
+            try:
+                if exc is not None:
+                    future = steps.throw(exc)
+                else:
+                    future = steps.send(value)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.timer.end()
+            value = None
+            exc = None
+            try:
+                value = yield future
+            except BaseException as e:
+                exc = e
+
+
+async def _measure_coro_until(
+    log: structlog.stdlib.BoundLogger,
+    f: Awaitable[T],
+    timer: Timer,
+    deadline: _Deadline,
+    mode: InstrumentationMode,
+) -> T:
+    try:
+        with deadline:
+            if mode == "sampled":
+                return await _TimedAwaitable(f, timer)
+            timer.mark_wall_time()
+            try:
+                return await f
+            finally:
+                timer.mark_wall_time()
+    except asyncio.TimeoutError as e:
+        log.error(
+            "Coroutine timed out",
+            exc_info=e,
+        )
+        raise
+
+
 async def measure_coro(
     log: structlog.stdlib.BoundLogger,
     f: Awaitable[T],
     timer: Timer,
     timeout: float = 180,
+    mode: InstrumentationMode = "full",
+) -> T:
+    if mode == "full":
+        return await _measure_coro_steps(log, f, timer, timeout)
+    deadline = _Deadline(asyncio.get_running_loop().time() + timeout)
+    try:
+        return await _measure_coro_until(log, f, timer, deadline, mode)
+    finally:
+        deadline.cancel()
+
+
+async def _measure_coro_steps(
+    log: structlog.stdlib.BoundLogger,
+    f: Awaitable[T],
+    timer: Timer,
+    timeout: float,
 ) -> T:
     coro_wrapper = f.__await__()
     arg = None
@@ -225,18 +634,38 @@ async def measure_async_iterator(
     f: AsyncIterator[T],
     timer: Timer,
     timeout: float = 180,
+    mode: InstrumentationMode = "full",
 ) -> AsyncIterator[T]:
     iter_wrapper = f.__aiter__()
-    while True:
-        try:
-            yield await measure_coro(
-                log,
-                iter_wrapper.__anext__(),
-                timer,
-                timeout,
-            )
-        except StopAsyncIteration:
-            break
+    if mode == "full":
+        while True:
+            try:
+                yield await measure_coro(
+                    log,
+                    iter_wrapper.__anext__(),
+                    timer,
+                    timeout,
+                )
+            except StopAsyncIteration:
+                break
+        return
+
+    # the timeout is for the whole iteration, instead of each future awaited
+    deadline = _Deadline(asyncio.get_running_loop().time() + timeout)
+    try:
+        while True:
+            try:
+                yield await _measure_coro_until(
+                    log,
+                    iter_wrapper.__anext__(),
+                    timer,
+                    deadline,
+                    mode,
+                )
+            except StopAsyncIteration:
+                break
+    finally:
+        deadline.cancel()
         # except Exception:
         #     raise
     # iter_wrapper = f.__aiter__()
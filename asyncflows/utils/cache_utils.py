@@ -1,23 +1,71 @@
-import os
+import hashlib
+import inspect
+import sys
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from asyncflows.models.config.action import InternalActionBase
 
-_latest_modified_timestamp = None
 
+_action_fingerprints: dict[type, str] = {}
 
-def _get_latest_modified_timestamp():
-    global _latest_modified_timestamp
 
-    if _latest_modified_timestamp is not None:
-        return _latest_modified_timestamp
+def _read_module_source(module_name: str) -> bytes | None:
+    module = sys.modules.get(module_name)
+    if module is None:
+        return None
+    try:
+        source_file = inspect.getsourcefile(module)
+    except TypeError:
+        # built-in module
+        return None
+    if source_file is None:
+        return None
+    try:
+        with open(source_file, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
 
-    # walk the files in the directory and get the file modified time
-    latest_timestamp = 0
-    for root, dirs, files in os.walk("."):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_modified_time = os.path.getmtime(file_path)
-            if file_modified_time > latest_timestamp:
-                latest_timestamp = file_modified_time
 
-    _latest_modified_timestamp = latest_timestamp
-    return latest_timestamp
+def get_action_fingerprint(action_type: type["InternalActionBase"]) -> str:
+    """
+    Hash the source of the modules defining the action and the actions it subclasses,
+    so the fingerprint changes only as the action's own code does.
+    """
+    if action_type in _action_fingerprints:
+        return _action_fingerprints[action_type]
+
+    from asyncflows.models.config.action import InternalActionBase
+
+    hasher = hashlib.sha256()
+    module_names = []
+    for cls in action_type.__mro__:
+        if not issubclass(cls, InternalActionBase) or cls.__module__ in module_names:
+            continue
+        if cls.__module__ == InternalActionBase.__module__:
+            # the base classes aren't part of the action
+            continue
+        module_names.append(cls.__module__)
+
+    for module_name in module_names:
+        hasher.update(module_name.encode())
+        source = _read_module_source(module_name)
+        if source is not None:
+            hasher.update(source)
+    # tell apart the actions defined in the same module
+    hasher.update(action_type.__qualname__.encode())
+
+    fingerprint = hasher.hexdigest()[:16]
+    _action_fingerprints[action_type] = fingerprint
+    return fingerprint
+
+
+def get_action_version(action_type: type["InternalActionBase"]) -> int | str:
+    """
+    Get the version the action's outputs are cached under:
+    its `version` if set, or else a fingerprint of its source code.
+    """
+    if action_type.version is not None:
+        return action_type.version
+    return f"h{get_action_fingerprint(action_type)}"
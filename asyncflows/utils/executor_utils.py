@@ -0,0 +1,133 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Literal, TypeVar
+
+T = TypeVar("T")
+
+# where blocking calls run off the event loop:
+# - `thread` for I/O and for code that releases the GIL
+# - `process` for CPU-bound code; the function, its arguments and its result must be picklable,
+#   and the function importable by the workers
+ExecutorType = Literal["thread", "process"]
+
+# the process pool's workers aren't forked from the engine's process, which by then runs threads
+# (e.g., the SQLite cache repo's and the thread pool's) that forking would copy in whatever state they're in;
+# started fresh, they import the function's module instead, and the main module if it isn't guarded
+# by `if __name__ == "__main__":`
+_process_start_method = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_max_workers: dict[ExecutorType, int | None] = {
+    "thread": None,
+    "process": None,
+}
+_executors: dict[ExecutorType, Executor] = {}
+_executors_lock = threading.Lock()
+# how many open flows hold the pools; the last one to close shuts them down
+_executors_holders = 0
+
+
+def _get_default_max_workers(executor_type: ExecutorType) -> int:
+    cpu_count = os.cpu_count() or 1
+    if executor_type == "thread":
+        # as `ThreadPoolExecutor` does by default
+        return min(32, cpu_count + 4)
+    return cpu_count
+
+
+def get_executor(executor_type: ExecutorType) -> Executor:
+    """
+    Get the pool the engine runs blocking calls of `executor_type` in, creating it on first use.
+    """
+    with _executors_lock:
+        if executor_type not in _executors:
+            max_workers = _max_workers[executor_type]
+            if max_workers is None:
+                max_workers = _get_default_max_workers(executor_type)
+            if executor_type == "thread":
+                _executors[executor_type] = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix="asyncflows",
+                )
+            elif executor_type == "process":
+                _executors[executor_type] = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context(_process_start_method),
+                )
+            else:
+                raise ValueError(f"Unknown executor type: {executor_type}")
+        return _executors[executor_type]
+
+
+def configure_executors(
+    max_threads: int | None = None,
+    max_processes: int | None = None,
+) -> None:
+    """
+    Set how many workers each pool runs at most, `None` meaning a default by the CPU count.
+    Calls beyond that wait for a free worker.
+    Pools already created are shut down once their pending calls finish, and recreated on next use.
+    """
+    if max_threads is not None and max_threads < 1:
+        raise ValueError("max_threads must be at least 1")
+    if max_processes is not None and max_processes < 1:
+        raise ValueError("max_processes must be at least 1")
+    _max_workers["thread"] = max_threads
+    _max_workers["process"] = max_processes
+    shutdown_executors(wait=False)
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+
+def retain_executors() -> None:
+    """
+    Hold the pools open; each call is matched by one to `release_executors`.
+    """
+    global _executors_holders
+    with _executors_lock:
+        _executors_holders += 1
+
+
+def release_executors() -> None:
+    """
+    Let go of the pools, shutting them down once nothing holds them, after their pending calls finish.
+    They're recreated on next use.
+    """
+    global _executors_holders
+    with _executors_lock:
+        _executors_holders -= 1
+        if _executors_holders > 0:
+            return
+        _executors_holders = 0
+    shutdown_executors(wait=False)
+
+
+async def run_in_executor(
+    executor_type: ExecutorType,
+    func: Callable[..., T],
+    *args: Any,
+    **kwargs: Any,
+) -> T:
+    """
+    Run a blocking call in the engine's pool of `executor_type`, without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    if executor_type == "thread":
+        # carry the context variables over to the thread, as `asyncio.to_thread` does
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+    else:
+        call = functools.partial(func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(executor_type), call)
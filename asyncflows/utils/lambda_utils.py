@@ -0,0 +1,136 @@
+import ast
+from functools import lru_cache
+from typing import Any, Callable
+
+import simpleeval
+
+from asyncflows.models.primitives import ContextVarName, LambdaString
+from asyncflows.utils.config_utils import get_names_from_ast, verify_ast
+
+# functions callable by name from within a lambda, same as `simpleeval.EvalWithCompoundTypes`
+_lambda_functions: dict[str, Callable] = {
+    "range": range,
+    "list": list,
+    "tuple": tuple,
+    "dict": dict,
+    "set": set,
+}
+
+# names of the helpers injected into the namespace of the compiled code;
+# names starting with `__` are refused in lambdas, so these can't be shadowed or referenced
+_getattr_helper = "__asyncflows_getattr"
+_add_helper = "__asyncflows_add"
+_functions_helper = "__asyncflows_functions"
+
+
+def _lambda_getattr(obj: Any, attr: str) -> Any:
+    # try the attribute, then fall back to indexing, like simpleeval
+    try:
+        return getattr(obj, attr)
+    except (AttributeError, TypeError):
+        pass
+    try:
+        return obj[attr]
+    except (KeyError, TypeError):
+        pass
+    raise simpleeval.AttributeDoesNotExist(attr, None)
+
+
+def _check_attribute(attr: str) -> None:
+    for prefix in simpleeval.DISALLOW_PREFIXES:
+        if attr.startswith(prefix):
+            raise simpleeval.FeatureNotAvailable(
+                f"Sorry, access to __attributes or func_ attributes is not available. ({attr})"
+            )
+    if attr in simpleeval.DISALLOW_METHODS:
+        raise simpleeval.FeatureNotAvailable(
+            f"Sorry, this method is not available. ({attr})"
+        )
+
+
+_lambda_helpers = {
+    "__builtins__": {},
+    _getattr_helper: _lambda_getattr,
+    _add_helper: simpleeval.safe_add,
+    _functions_helper: _lambda_functions,
+}
+
+
+class _RestrictLambda(ast.NodeTransformer):
+    """
+    Rewrites a verified lambda AST so it evaluates like simpleeval:
+    attribute access falls back to indexing, `+` is length-checked,
+    and only whitelisted functions can be called by name.
+    """
+
+    def __init__(self, expr: LambdaString):
+        self.expr = expr
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id.startswith("__"):
+            raise simpleeval.FeatureNotAvailable(
+                f"Sorry, access to __names is not available. ({node.id})"
+            )
+        return node
+
+    def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        _check_attribute(node.attr)
+        return ast.Call(
+            func=ast.Name(id=_getattr_helper, ctx=ast.Load()),
+            args=[self.visit(node.value), ast.Constant(value=node.attr)],
+            keywords=[],
+        )
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        # `verify_ast` only lets through addition
+        return ast.Call(
+            func=ast.Name(id=_add_helper, ctx=ast.Load()),
+            args=[self.visit(node.left), self.visit(node.right)],
+            keywords=[],
+        )
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        if isinstance(node.func, ast.Name):
+            if node.func.id not in _lambda_functions:
+                raise simpleeval.FunctionNotDefined(node.func.id, self.expr)
+            node.func = ast.Subscript(
+                value=ast.Name(id=_functions_helper, ctx=ast.Load()),
+                slice=ast.Constant(value=node.func.id),
+                ctx=ast.Load(),
+            )
+            node.args = [self.visit(arg) for arg in node.args]
+            return node
+        return self.generic_visit(node)
+
+
+class CompiledLambda:
+    """
+    A lambda expression, parsed, verified and compiled to a code object once.
+    Evaluating it runs the code object against the context, without re-parsing.
+    """
+
+    def __init__(self, expr: LambdaString):
+        self.expr = expr
+        verify_ast(ast.parse(expr))
+
+        parsed = ast.parse(expr, mode="eval")
+        restricted = ast.fix_missing_locations(_RestrictLambda(expr).visit(parsed))
+        self._code = compile(restricted, "<lambda>", "eval")
+
+    def __call__(self, context: dict[str, Any]) -> Any:
+        # names resolve from the context first, then the whitelisted functions
+        namespace = {**_lambda_functions, **context, **_lambda_helpers}
+        try:
+            return eval(self._code, namespace)
+        except NameError as e:
+            raise simpleeval.NameNotDefined(e.name, self.expr) from e
+
+
+@lru_cache(maxsize=1024)
+def compile_lambda(expr: LambdaString) -> CompiledLambda:
+    return CompiledLambda(expr)
+
+
+@lru_cache(maxsize=1024)
+def get_lambda_dependencies(expr: LambdaString) -> frozenset[ContextVarName]:
+    return frozenset(get_names_from_ast(ast.parse(expr, mode="eval")))
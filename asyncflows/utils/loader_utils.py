@@ -1,18 +1,89 @@
 import os
+from functools import lru_cache
+from typing import Any, Iterable
 
 import yaml
 
+from asyncflows.models.config.action import ActionMeta
 from asyncflows.models.config.flow import ActionConfig, build_hinted_action_config
+from asyncflows.models.primitives import ExecutableName
+from asyncflows.utils.action_utils import get_action_type, get_actions_dict
 
+# the registered actions as of the last scan of the installed packages' entrypoints
+_scanned_actions: frozenset | None = None
 
-def get_config_model() -> type[ActionConfig]:
-    # TODO cache this so it only rebuilds when the action registry changes
-    return build_hinted_action_config()
+
+@lru_cache(maxsize=64)
+def _build_config_model(
+    actions: frozenset[tuple[ExecutableName, type]],
+    all_actions: bool,
+) -> type[ActionConfig]:
+    # keyed by the action classes the model is built from; bounded, as a long-lived process
+    # may load flows with any number of combinations of actions
+    names = None if all_actions else sorted(name for name, _ in actions)
+    return build_hinted_action_config(action_names=names)
+
+
+def get_config_model(
+    action_names: Iterable[ExecutableName] | None = None,
+) -> type[ActionConfig]:
+    """
+    Get the config model hinted with the given actions, or with all registered actions if not given.
+    Given action names, only those actions' modules are imported.
+    Building the model is expensive, so it's rebuilt only when the actions it's built from change.
+    """
+    global _scanned_actions
+
+    names = sorted(set(action_names or ()))
+    if names:
+        try:
+            actions = frozenset((name, get_action_type(name)) for name in names)
+        except ValueError:
+            # validate against all actions, to report the unknown one
+            return get_config_model()
+        return _build_config_model(actions, all_actions=False)
+
+    # check the registry directly, as `get_actions_dict` scans the installed packages' entrypoints
+    actions = frozenset(ActionMeta.actions_registry.items())
+    if actions != _scanned_actions:
+        actions = frozenset(get_actions_dict().items())
+        _scanned_actions = actions
+    return _build_config_model(actions, all_actions=True)
+
+
+def _get_action_names(flow: Any) -> set[ExecutableName] | None:
+    # the actions the flow invokes, including within loops; None if it's malformed
+    if not isinstance(flow, dict):
+        return None
+    action_names = set()
+    for executable in flow.values():
+        if not isinstance(executable, dict):
+            return None
+        if "action" in executable:
+            if not isinstance(executable["action"], str):
+                return None
+            action_names.add(executable["action"])
+        elif "flow" in executable:
+            loop_action_names = _get_action_names(executable["flow"])
+            if loop_action_names is None:
+                return None
+            action_names |= loop_action_names
+    return action_names
+
+
+def load_config_data(config_data: Any) -> ActionConfig:
+    """
+    Validate the config, importing only the actions it uses.
+    """
+    action_names = None
+    if isinstance(config_data, dict):
+        action_names = _get_action_names(config_data.get("flow"))
+    config_model = get_config_model(action_names)
+    return config_model.model_validate(config_data)
 
 
 def load_config_text(config_text: str) -> ActionConfig:
-    config_model = get_config_model()
-    return config_model.model_validate(yaml.safe_load(config_text))
+    return load_config_data(yaml.safe_load(config_text))
 
 
 def load_config_file(
@@ -21,8 +92,9 @@ def load_config_file(
     if not os.path.exists(filename):
         raise FileNotFoundError(f"Could not find {filename}")
 
-    if config_model is None:
-        config_model = get_config_model()
-
     with open(filename, "r") as f:
-        return config_model.model_validate(yaml.safe_load(f))
+        config_data = yaml.safe_load(f)
+
+    if config_model is None:
+        return load_config_data(config_data)
+    return config_model.model_validate(config_data)
@@ -0,0 +1,258 @@
+import bisect
+import math
+from collections import defaultdict
+from typing import Any, Callable, Literal
+
+LabelValues = tuple[str, ...]
+
+# in seconds, from cache lookups to LLM invocations
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+)
+
+MetricType = Literal["counter", "histogram", "gauge"]
+
+
+class Metric:
+    type: MetricType
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        help_: str,
+        label_names: tuple[str, ...] = (),
+    ):
+        self.registry = registry
+        self.name = name
+        self.help = help_
+        self.label_names = label_names
+
+    def _get_label_values(self, labels: dict[str, Any]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def collect(self) -> list[dict[str, Any]]:
+        """
+        Get the metric's samples, each with its `labels`.
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        pass
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: dict[LabelValues, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        if not self.registry.enabled:
+            return
+        self.values[self._get_label_values(labels)] += amount
+
+    def collect(self) -> list[dict[str, Any]]:
+        return [
+            {"labels": dict(zip(self.label_names, label_values)), "value": value}
+            for label_values, value in self.values.items()
+        ]
+
+    def clear(self) -> None:
+        self.values.clear()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = buckets
+        # per label values, the count of observations in each bucket, the last one being +Inf
+        self.bucket_counts: dict[LabelValues, list[int]] = {}
+        self.sums: dict[LabelValues, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not self.registry.enabled:
+            return
+        label_values = self._get_label_values(labels)
+        if label_values not in self.bucket_counts:
+            self.bucket_counts[label_values] = [0] * (len(self.buckets) + 1)
+        self.bucket_counts[label_values][bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[label_values] += value
+
+    def collect(self) -> list[dict[str, Any]]:
+        samples = []
+        for label_values, counts in self.bucket_counts.items():
+            cumulative_counts = {}
+            count = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                count += bucket_count
+                cumulative_counts[bound] = count
+            samples.append(
+                {
+                    "labels": dict(zip(self.label_names, label_values)),
+                    "buckets": cumulative_counts,
+                    "count": count,
+                    "sum": self.sums[label_values],
+                }
+            )
+        return samples
+
+    def clear(self) -> None:
+        self.bucket_counts.clear()
+        self.sums.clear()
+
+
+class Gauge(Metric):
+    """
+    A gauge whose values are read from `callback` when collected,
+    as a dict of label values to values (or a single value without labels).
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        *args,
+        callback: Callable[[], float | dict[LabelValues, float]],
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.callback = callback
+
+    def collect(self) -> list[dict[str, Any]]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            {"labels": dict(zip(self.label_names, label_values)), "value": value}
+            for label_values, value in values.items()
+        ]
+
+
+def _format_labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    formatted = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+    return f"{{{formatted}}}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Counters, histograms and gauges of the engine's hot paths.
+    Disabled by default, recording a metric costs only the check of whether it's enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.metrics: dict[str, Metric] = {}
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def clear(self) -> None:
+        for metric in self.metrics.values():
+            metric.clear()
+
+    def _register(self, metric: Metric) -> Any:
+        # registering a name again (e.g., on reloading its module) replaces the metric
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, help_: str, label_names: tuple[str, ...] = ()
+    ) -> Counter:
+        return self._register(Counter(self, name, help_, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        help_: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(
+            Histogram(self, name, help_, label_names, buckets=buckets)
+        )
+
+    def gauge(
+        self,
+        name: str,
+        help_: str,
+        callback: Callable[[], float | dict[LabelValues, float]],
+        label_names: tuple[str, ...] = (),
+    ) -> Gauge:
+        return self._register(Gauge(self, name, help_, label_names, callback=callback))
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """
+        Get each metric's type, help and samples.
+        """
+        return {
+            name: {
+                "type": metric.type,
+                "help": metric.help,
+                "samples": metric.collect(),
+            }
+            for name, metric in self.metrics.items()
+        }
+
+    def to_prometheus(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for sample in metric.collect():
+                labels = sample["labels"]
+                if metric.type != "histogram":
+                    lines.append(
+                        f"{name}{_format_labels(labels)} {_format_value(sample['value'])}"
+                    )
+                    continue
+                for bound, count in sample["buckets"].items():
+                    bucket_labels = labels | {"le": _format_value(bound)}
+                    lines.append(
+                        f"{name}_bucket{_format_labels(bucket_labels)} {count}"
+                    )
+                lines.append(
+                    f"{name}_sum{_format_labels(labels)} {_format_value(sample['sum'])}"
+                )
+                lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
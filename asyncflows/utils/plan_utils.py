@@ -0,0 +1,516 @@
+import ast
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic import BaseModel
+from typing_extensions import assert_never
+
+from asyncflows.models.config.action import ActionInvocation
+from asyncflows.models.config.flow import ActionConfig, FlowConfig, Loop
+from asyncflows.models.config.value_declarations import (
+    LambdaDeclaration,
+    LinkDeclaration,
+    TextDeclaration,
+    ValueDeclaration,
+    VarDeclaration,
+)
+from asyncflows.models.primitives import (
+    ContextVarName,
+    ContextVarPath,
+    ExecutableId,
+    LambdaString,
+)
+from asyncflows.utils.pydantic_utils import iterate_fields
+from asyncflows.utils.rendering_utils import compile_var_path
+
+Dependencies = frozenset[tuple[ExecutableId, bool]]
+# for each loop referenced, the ids of its body's executables that are referenced,
+# or None if they can't be told apart statically (and all of them need to run)
+LoopReferences = dict[ExecutableId, frozenset[ExecutableId] | None]
+
+
+def get_dependency_ids_and_stream_flag_from_input_spec(
+    input_spec: Any,
+) -> set[tuple[ExecutableId, bool]]:
+    dependencies = set()
+    if isinstance(input_spec, dict):
+        for key, value in input_spec.items():
+            dependencies.update(
+                get_dependency_ids_and_stream_flag_from_input_spec(value)
+            )
+    elif isinstance(input_spec, list):
+        for value in input_spec:
+            dependencies.update(
+                get_dependency_ids_and_stream_flag_from_input_spec(value)
+            )
+    elif isinstance(input_spec, str):
+        template = TextDeclaration(text=input_spec)
+        dependencies.update((d, template.stream) for d in template.get_dependencies())
+    elif isinstance(input_spec, (ValueDeclaration, str)):
+        dependencies.update(
+            (d, input_spec.stream) for d in input_spec.get_dependencies()
+        )
+    if isinstance(input_spec, BaseModel):
+        for field_name in input_spec.model_fields:
+            field_value = getattr(input_spec, field_name)
+            dependencies.update(
+                get_dependency_ids_and_stream_flag_from_input_spec(field_value)
+            )
+
+    return dependencies
+
+
+def _merge_loop_references(
+    references: LoopReferences,
+    loop_id: ExecutableId,
+    body_ids: frozenset[ExecutableId] | None,
+) -> None:
+    if loop_id in references:
+        previous = references[loop_id]
+        if previous is None or body_ids is None:
+            body_ids = None
+        else:
+            body_ids = previous | body_ids
+    references[loop_id] = body_ids
+
+
+def _get_var_loop_references(
+    var: ContextVarPath,
+    loops: dict[ExecutableId, frozenset[ExecutableId]],
+) -> LoopReferences | None:
+    accessor = compile_var_path(var)
+    if accessor is None:
+        # not a plain path
+        return None
+    if accessor.root not in loops:
+        return {}
+    # a plain path into a loop's outputs looks like `loop[0].executable_id...`
+    steps = accessor.steps
+    if (
+        len(steps) >= 2
+        and isinstance(steps[0][1], int)
+        and isinstance(steps[1][1], str)
+    ):
+        return {accessor.root: frozenset([steps[1][1]])}
+    return {accessor.root: None}
+
+
+def _get_lambda_loop_references(
+    expr: LambdaString,
+    loops: dict[ExecutableId, frozenset[ExecutableId]],
+) -> LoopReferences:
+    references: LoopReferences = {}
+
+    def get_key(node: ast.AST) -> str | int | None:
+        # the key of `x.key`, `x["key"]` or `x[0]`
+        if isinstance(node, ast.Attribute):
+            return node.attr
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Constant):
+            if isinstance(node.slice.value, (str, int)):
+                return node.slice.value
+        return None
+
+    # `scope` maps comprehension variables to the loop they iterate, or to None if they're unrelated
+    def visit(node: ast.AST, scope: dict[str, ExecutableId | None]) -> None:
+        if isinstance(node, ast.Name):
+            if node.id in scope:
+                if scope[node.id] is not None:
+                    # an item of the loop is used whole
+                    _merge_loop_references(references, scope[node.id], None)
+            elif node.id in loops:
+                # the loop is used whole
+                _merge_loop_references(references, node.id, None)
+            return
+
+        key = get_key(node)
+        if key is not None:
+            value = node.value  # type: ignore
+            # `item.executable_id`, where `item` iterates over a loop
+            if (
+                isinstance(value, ast.Name)
+                and scope.get(value.id) is not None
+                and isinstance(key, str)
+            ):
+                _merge_loop_references(
+                    references,
+                    scope[value.id],
+                    frozenset([key]),  # type: ignore
+                )
+                return
+            # `loop[0].executable_id`
+            if (
+                isinstance(key, str)
+                and isinstance(value, ast.Subscript)
+                and isinstance(value.value, ast.Name)
+                and value.value.id in loops
+                and value.value.id not in scope
+                and isinstance(get_key(value), int)
+            ):
+                _merge_loop_references(references, value.value.id, frozenset([key]))
+                return
+
+        if isinstance(
+            node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)
+        ):
+            comprehension_scope = dict(scope)
+            for generator in node.generators:
+                iter_ = generator.iter
+                target = generator.target
+                target_names = {
+                    n.id for n in ast.walk(target) if isinstance(n, ast.Name)
+                }
+                if (
+                    isinstance(iter_, ast.Name)
+                    and iter_.id in loops
+                    and iter_.id not in comprehension_scope
+                    and isinstance(target, ast.Name)
+                ):
+                    comprehension_scope[target.id] = iter_.id
+                else:
+                    visit(iter_, comprehension_scope)
+                    for name in target_names:
+                        comprehension_scope[name] = None
+                for if_clause in generator.ifs:
+                    visit(if_clause, comprehension_scope)
+            if isinstance(node, ast.DictComp):
+                visit(node.key, comprehension_scope)
+                visit(node.value, comprehension_scope)
+            else:
+                visit(node.elt, comprehension_scope)
+            return
+
+        for child in ast.iter_child_nodes(node):
+            visit(child, scope)
+
+    visit(ast.parse(expr, mode="eval"), {})
+    return references
+
+
+def get_loop_references(
+    input_spec: Any,
+    loops: dict[ExecutableId, frozenset[ExecutableId]],
+) -> LoopReferences:
+    """
+    Find which executables of each loop's body are referenced in the input spec.
+    `loops` maps the ids of the loops in scope to the ids of their body's executables.
+    """
+    references: LoopReferences = {}
+
+    def merge(new_references: LoopReferences):
+        for loop_id, body_ids in new_references.items():
+            if body_ids is not None and not body_ids <= loops[loop_id]:
+                # referencing something that's not in the loop body, let the loop run whole
+                body_ids = None
+            _merge_loop_references(references, loop_id, body_ids)
+
+    if isinstance(input_spec, dict):
+        for value in input_spec.values():
+            merge(get_loop_references(value, loops))
+    elif isinstance(input_spec, list):
+        for value in input_spec:
+            merge(get_loop_references(value, loops))
+    elif isinstance(input_spec, (str, ValueDeclaration)):
+        new_references = None
+        if isinstance(input_spec, VarDeclaration):
+            new_references = _get_var_loop_references(input_spec.var, loops)
+        elif isinstance(input_spec, LinkDeclaration):
+            new_references = _get_var_loop_references(input_spec.link, loops)
+        elif isinstance(input_spec, LambdaDeclaration):
+            new_references = _get_lambda_loop_references(input_spec.lambda_, loops)
+        if new_references is None:
+            # templates and complex paths aren't analyzed; any loop they reference runs whole
+            new_references = {
+                dependency_id: None
+                for dependency_id, _ in get_dependency_ids_and_stream_flag_from_input_spec(
+                    input_spec
+                )
+                if dependency_id in loops
+            }
+        merge(new_references)
+    elif isinstance(input_spec, BaseModel):
+        for field_name in input_spec.model_fields:
+            merge(get_loop_references(getattr(input_spec, field_name), loops))
+
+    return references
+
+
+def get_input_spec(action_invocation: ActionInvocation) -> dict[str, Any]:
+    input_spec = {}
+    for name, value in iterate_fields(action_invocation):
+        if name in ("id", "action", "coalesce_inputs"):
+            continue
+        if value is not None:
+            input_spec[name] = value
+    return input_spec
+
+
+@dataclass(frozen=True)
+class ExecutablePlan:
+    """
+    The statically derivable information about an executable (action or loop),
+    compiled once so it needn't be recomputed on every run.
+    """
+
+    #: Dependencies of the action's inputs, or of the loop's `in` declaration
+    dependencies: Dependencies
+    #: Dependencies of the action's `cache_key`
+    cache_key_dependencies: Dependencies = frozenset()
+    #: The action's input fields as declared in the config; `None` for loops
+    input_spec: dict[str, Any] | None = None
+    #: Which executables of the referenced loops' bodies are needed
+    loop_references: LoopReferences = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class FlowPlan:
+    """
+    The compiled plan of a flow scope.
+    The top-level flow is one scope, and each loop opens a nested scope with its own plan.
+    """
+
+    #: All executables visible in this scope, including those of enclosing scopes
+    flow: FlowConfig
+    executables: dict[ExecutableId, ExecutablePlan]
+    #: The executables declared in this scope, in topological order (dependencies first)
+    order: tuple[ExecutableId, ...]
+    parent: "FlowPlan | None" = None
+    loop_plans: dict[ExecutableId, "FlowPlan"] = field(default_factory=dict)
+    #: How many loops the scope is nested in; the top-level flow is at depth 0
+    depth: int = 0
+    #: The variable of the loop whose body this scope is
+    loop_variable: ContextVarName | None = None
+    #: For each executable declared in this scope, the depth of the outermost scope it can run in,
+    #: i.e., of the innermost loop whose variable it depends on
+    levels: dict[ExecutableId, int] = field(default_factory=dict)
+
+    def get_loop_plan(self, loop_id: ExecutableId) -> "FlowPlan":
+        if loop_id in self.loop_plans:
+            return self.loop_plans[loop_id]
+        if self.parent is not None:
+            return self.parent.get_loop_plan(loop_id)
+        raise KeyError(f"No plan compiled for loop: {loop_id}")
+
+    def get_declaring_plan(self, executable_id: ExecutableId) -> "FlowPlan":
+        """
+        Get the plan of the scope the executable is declared in.
+        """
+        plan = self
+        while executable_id not in plan.order:
+            if plan.parent is None:
+                raise KeyError(f"Executable not in flow: {executable_id}")
+            plan = plan.parent
+        return plan
+
+    def get_task_prefix(self, executable_id: ExecutableId, task_prefix: str) -> str:
+        """
+        Get the task prefix to run the executable with, from an iteration of this scope prefixed by `task_prefix`.
+
+        Executables that don't depend on a loop's variable are run once for all of its iterations:
+        the indices of those iterations are replaced by `*`, so the iterations share the task.
+        """
+        declaring_plan = self.get_declaring_plan(executable_id)
+        level = declaring_plan.levels.get(executable_id, declaring_plan.depth)
+        namespace, separator, loop_prefix = task_prefix.rpartition("/")
+        segments = _task_prefix_segment_pattern.findall(loop_prefix)
+        if len(segments) < declaring_plan.depth:
+            return task_prefix
+        return (
+            namespace
+            + separator
+            + "".join(
+                f"{loop_id}[{index if depth < level else '*'}]."
+                for depth, (loop_id, index) in enumerate(
+                    segments[: declaring_plan.depth]
+                )
+            )
+        )
+
+
+# a task prefix is made up of an optional `namespace/` that keeps separate runs' tasks apart,
+# followed by one `loop_id[index].` segment per loop the task is nested in
+_task_prefix_segment_pattern = re.compile(r"(.*?)\[(\d+|\*)]\.")
+
+
+def get_hoisting_loop_prefix(task_prefix: str, scope_task_prefix: str) -> str | None:
+    """
+    Get the prefix of the outermost loop whose iterations share an executable,
+    given the task prefix of the iteration it's referenced from and the one it's run with
+    (as from `FlowPlan.get_task_prefix`); None if it's run within the iteration.
+    The prefix is that of the loop's iterations, up to the index, e.g. `namespace/loop`.
+    """
+    namespace, separator, loop_prefix = task_prefix.rpartition("/")
+    prefix = namespace + separator
+    for match in _task_prefix_segment_pattern.finditer(loop_prefix):
+        loop_task_prefix = prefix + match.group(1)
+        prefix += match.group(0)
+        if not scope_task_prefix.startswith(prefix):
+            return loop_task_prefix
+    return None
+
+
+def _compile_executable(
+    executable: ActionInvocation | Loop,
+    loops: dict[ExecutableId, frozenset[ExecutableId]],
+) -> ExecutablePlan:
+    if isinstance(executable, ActionInvocation):
+        input_spec = get_input_spec(executable)
+        cache_key_dependencies = frozenset()
+        if executable.cache_key is not None:
+            cache_key_dependencies = frozenset(
+                get_dependency_ids_and_stream_flag_from_input_spec(executable.cache_key)
+            )
+        return ExecutablePlan(
+            dependencies=frozenset(
+                get_dependency_ids_and_stream_flag_from_input_spec(input_spec)
+            ),
+            cache_key_dependencies=cache_key_dependencies,
+            input_spec=input_spec,
+            # the cache key is in the input spec, so its references are included too
+            loop_references=get_loop_references(input_spec, loops),
+        )
+    elif isinstance(executable, Loop):
+        return ExecutablePlan(
+            dependencies=frozenset(
+                get_dependency_ids_and_stream_flag_from_input_spec(executable.in_)
+            ),
+            loop_references=get_loop_references(executable.in_, loops),
+        )
+    else:
+        assert_never(executable)
+
+
+def _topological_order(
+    scope_flow: FlowConfig,
+    executables: dict[ExecutableId, ExecutablePlan],
+) -> tuple[ExecutableId, ...]:
+    order = []
+    visited = set()
+    visiting = set()
+
+    def visit(executable_id: ExecutableId):
+        if executable_id in visited:
+            return
+        if executable_id in visiting:
+            raise ValueError(f"Flow contains a dependency cycle at `{executable_id}`")
+        visiting.add(executable_id)
+        plan = executables[executable_id]
+        for dependency_id in sorted(
+            {id_ for id_, _ in plan.dependencies | plan.cache_key_dependencies}
+        ):
+            if dependency_id in scope_flow:
+                visit(dependency_id)
+        visiting.remove(executable_id)
+        visited.add(executable_id)
+        order.append(executable_id)
+
+    for executable_id in scope_flow:
+        visit(executable_id)
+    return tuple(order)
+
+
+def _compile_scope(
+    scope_flow: FlowConfig,
+    parent: FlowPlan | None,
+    loop_variable: ContextVarName | None = None,
+) -> FlowPlan:
+    if parent is None:
+        flow = scope_flow
+        executables = {}
+        depth = 0
+    else:
+        flow = parent.flow | scope_flow
+        executables = dict(parent.executables)
+        depth = parent.depth + 1
+
+    loops = {
+        executable_id: frozenset(executable.flow)
+        for executable_id, executable in flow.items()
+        if isinstance(executable, Loop)
+    }
+    for executable_id, executable in scope_flow.items():
+        executables[executable_id] = _compile_executable(executable, loops)
+
+    plan = FlowPlan(
+        flow=flow,
+        executables=executables,
+        order=_topological_order(scope_flow, executables),
+        parent=parent,
+        depth=depth,
+        loop_variable=loop_variable,
+    )
+
+    # loop subplans are filled in after the enclosing plan exists,
+    # so they can refer back to it for executables of the outer scope
+    for executable_id, executable in scope_flow.items():
+        if isinstance(executable, Loop):
+            plan.loop_plans[executable_id] = _compile_scope(
+                executable.flow, plan, executable.for_
+            )
+
+    return plan
+
+
+def _compile_levels(plan: FlowPlan) -> None:
+    # the depths of the loops whose variables each executable depends on
+    depended_depths: dict[tuple[int, ExecutableId], frozenset[int]] = {}
+
+    def get_dependency_depths(
+        scope: FlowPlan, dependency_id: ContextVarName
+    ) -> frozenset[int]:
+        # executables shadow variables, same as when running
+        if dependency_id in scope.flow:
+            return get_depths(scope, dependency_id)
+        while scope.parent is not None:
+            if scope.loop_variable == dependency_id:
+                return frozenset([scope.depth])
+            scope = scope.parent
+        # a variable given to the whole flow
+        return frozenset()
+
+    def get_depths(scope: FlowPlan, executable_id: ExecutableId) -> frozenset[int]:
+        scope = scope.get_declaring_plan(executable_id)
+        key = (id(scope), executable_id)
+        if key in depended_depths:
+            return depended_depths[key]
+        # until it's known, don't hoist the executable; this also stops at references back to an enclosing loop
+        depended_depths[key] = frozenset([scope.depth])
+
+        executable_plan = scope.executables[executable_id]
+        depths = frozenset()
+        for dependency_id, _ in (
+            executable_plan.dependencies | executable_plan.cache_key_dependencies
+        ):
+            depths |= get_dependency_depths(scope, dependency_id)
+        if executable_id in scope.loop_plans:
+            # a loop depends on whatever its body depends on outside of it
+            loop_plan = scope.loop_plans[executable_id]
+            for body_id in loop_plan.order:
+                depths |= {
+                    depth
+                    for depth in get_depths(loop_plan, body_id)
+                    if depth <= scope.depth
+                }
+
+        depended_depths[key] = depths
+        scope.levels[executable_id] = max(depths, default=0)
+        return depths
+
+    def visit(scope: FlowPlan) -> None:
+        for executable_id in scope.order:
+            get_depths(scope, executable_id)
+        for loop_plan in scope.loop_plans.values():
+            visit(loop_plan)
+
+    visit(plan)
+
+
+def compile_plan(config: ActionConfig) -> FlowPlan:
+    """
+    Compile the action config into an execution plan.
+    This is done once per loaded config; the action service looks up dependencies in the plan
+    instead of re-deriving them from the config on every run.
+    """
+    plan = _compile_scope(config.flow, None)
+    _compile_levels(plan)
+    return plan
@@ -0,0 +1,212 @@
+import asyncio
+import dataclasses
+import multiprocessing
+import pickle
+import queue
+from multiprocessing.process import BaseProcess
+from typing import TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, Iterable
+
+from asyncflows.repos.blob_repo import BlobRepo, InMemoryBlobRepo
+from asyncflows.repos.cache_repo import CacheRepo
+from asyncflows.utils.async_utils import iterate_any
+
+if TYPE_CHECKING:
+    from asyncflows.asyncflows import AsyncFlows, BatchResult, TargetOutput
+
+# how long to block on a queue before checking on the other side
+_poll_interval = 0.1
+
+
+def _check_workers(workers: list[BaseProcess]) -> None:
+    # workers exit cleanly only once they're done, so any other exit fails the runs
+    for worker in workers:
+        if worker.exitcode not in (None, 0):
+            raise RuntimeError(
+                f"Worker process {worker.pid} exited unexpectedly with code {worker.exitcode}"
+            )
+    if not any(worker.is_alive() for worker in workers):
+        raise RuntimeError("Worker processes exited unexpectedly")
+
+
+async def _put(
+    queue_: multiprocessing.Queue, item: Any, workers: list[BaseProcess]
+) -> None:
+    while True:
+        try:
+            return await asyncio.to_thread(queue_.put, item, True, _poll_interval)
+        except queue.Full:
+            _check_workers(workers)
+
+
+async def _get(queue_: multiprocessing.Queue, workers: list[BaseProcess]) -> Any:
+    while True:
+        try:
+            return await asyncio.to_thread(queue_.get, True, _poll_interval)
+        except queue.Empty:
+            _check_workers(workers)
+
+
+async def _get_input(queue_: multiprocessing.Queue) -> Any:
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            return await asyncio.to_thread(queue_.get, True, _poll_interval)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():
+                raise RuntimeError("Parent process exited unexpectedly")
+
+
+def _dump_result(result: "BatchResult") -> bytes:
+    try:
+        return pickle.dumps(result)
+    except Exception as e:
+        return pickle.dumps(
+            dataclasses.replace(
+                result,
+                outputs=None,
+                error=RuntimeError(
+                    f"Failed to send the outputs to the parent process: {e!r}"
+                ),
+            )
+        )
+
+
+async def _run_worker_flows(
+    config_data: dict[str, Any],
+    variables: dict[str, Any],
+    cache_repo_type: type[CacheRepo],
+    blob_repo_type: type[BlobRepo],
+    temp_dir: str,
+    target_output: "TargetOutput",
+    max_concurrency: int,
+    partial: bool,
+    inputs: multiprocessing.Queue,
+    outputs: multiprocessing.Queue,
+) -> None:
+    from asyncflows.asyncflows import AsyncFlows
+    from asyncflows.utils.loader_utils import load_config_data
+
+    flows = AsyncFlows(
+        config=load_config_data(config_data),
+        cache_repo=cache_repo_type,
+        blob_repo=blob_repo_type,
+        temp_dir=temp_dir,
+        _vars=variables,
+    )
+
+    # the worker numbers its runs by itself; map them back to the parent's indices
+    indices = {}
+
+    async def variable_sets():
+        local_index = 0
+        while (item := await _get_input(inputs)) is not None:
+            index, item_variables = item
+            indices[local_index] = index
+            local_index += 1
+            yield item_variables
+
+    try:
+        async for result in flows._stream_many(
+            variable_sets(), target_output, max_concurrency, partial
+        ):
+            if result.finished:
+                index = indices.pop(result.index)
+            else:
+                index = indices[result.index]
+            result = dataclasses.replace(result, index=index)
+            await asyncio.to_thread(outputs.put, _dump_result(result))
+    finally:
+        # tell the parent this worker is done
+        await asyncio.to_thread(outputs.put, None)
+        await flows.close()
+
+
+def _run_worker(*args) -> None:
+    asyncio.run(_run_worker_flows(*args))
+
+
+async def stream_many_in_processes(
+    flows: "AsyncFlows",
+    variable_sets: Iterable[dict[str, Any]] | AsyncIterable[dict[str, Any]],
+    target_output: "TargetOutput",
+    max_concurrency: int,
+    partial: bool,
+    processes: int,
+) -> AsyncIterator["BatchResult"]:
+    """
+    Spread the runs of `flows.run_many` across worker processes,
+    each running up to `max_concurrency` of them on its own event loop and action service.
+
+    The workers share the flows' cache and blob repos by instantiating their classes over the same temp dir,
+    so they must be safe to use from several processes
+    (e.g., `SqliteCacheRepo`, `ShelveCacheRepo` or `RedisCacheRepo`, and `FilesystemBlobRepo`, `RedisBlobRepo` or `S3BlobRepo`).
+    Where processes aren't forked (e.g., on macOS and windows), the actions the flow uses
+    must be registered by importing their modules.
+    """
+    if processes < 1:
+        raise ValueError("processes must be at least 1")
+    if isinstance(flows.blob_repo, InMemoryBlobRepo):
+        # the blobs the workers save would stay in their own memory
+        raise ValueError(
+            "Running flows in processes needs a blob repo shared between processes, "
+            "e.g. `FilesystemBlobRepo`, not `InMemoryBlobRepo`"
+        )
+
+    context = multiprocessing.get_context()
+    # bounded so the variable sets are read only as the workers can take them
+    inputs = context.Queue(maxsize=processes * max_concurrency)
+    outputs = context.Queue(maxsize=processes * max_concurrency)
+
+    worker_args = (
+        flows.action_config.model_dump(by_alias=True, exclude_unset=True),
+        flows.variables,
+        type(flows.cache_repo),
+        type(flows.blob_repo),
+        flows.temp_dir_path,
+        target_output,
+        max_concurrency,
+        partial,
+        inputs,
+        outputs,
+    )
+    workers = [
+        context.Process(target=_run_worker, args=worker_args, daemon=True)
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    async def stop_workers():
+        for _ in workers:
+            await _put(inputs, None, workers)
+
+    async def feed():
+        index = 0
+        try:
+            async for item_variables in iterate_any(variable_sets):
+                await _put(inputs, (index, item_variables), workers)
+                index += 1
+        except Exception:
+            # let the workers finish, so the exception is raised once their results are in
+            await stop_workers()
+            raise
+        await stop_workers()
+
+    feeder = asyncio.create_task(feed())
+    try:
+        remaining_workers = len(workers)
+        while remaining_workers > 0:
+            payload = await _get(outputs, workers)
+            if payload is None:
+                remaining_workers -= 1
+                continue
+            yield pickle.loads(payload)
+        # propagate an exception raised while iterating the variable sets
+        await feeder
+    finally:
+        feeder.cancel()
+        await asyncio.gather(feeder, return_exceptions=True)
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
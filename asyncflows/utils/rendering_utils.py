@@ -1,3 +1,6 @@
+import re
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Any, TypeVar, Generic
 
 import jinja2
@@ -23,7 +26,8 @@ class Option(StrictModel, Generic[OptionT]):
 
 def extract_root_var(var: ContextVarPath) -> ContextVarName:
     # TODO use a library like jsonpath_ng here instead, tho we shouldn't support [*] i think
-    return var.split(".")[0]
+    # the root ends at the first attribute or item lookup, e.g., `a` in `a[0].b`
+    return re.split(r"[.\[]", var, maxsplit=1)[0].strip()
 
 
 _jinja_env = NativeEnvironment(
@@ -32,6 +36,45 @@ _jinja_env = NativeEnvironment(
 )
 
 
+class TemplateCache:
+    """
+    A bounded LRU cache of compiled templates, keyed by template source.
+    """
+
+    def __init__(self, env: jinja2.Environment, maxsize: int = 1024):
+        self.env = env
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._templates: OrderedDict[TemplateString, jinja2.Template] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def get(self, template_string: TemplateString) -> jinja2.Template:
+        template = self._templates.get(template_string)
+        if template is not None:
+            self.hits += 1
+            self._templates.move_to_end(template_string)
+            return template
+
+        self.misses += 1
+        template = self.env.from_string(template_string)
+        if self.maxsize > 0:
+            self._templates[template_string] = template
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        return template
+
+    def clear(self) -> None:
+        self._templates.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+template_cache = TemplateCache(_jinja_env)
+
+
 def extract_vars_from_template(text: TemplateString) -> set[ContextVarName]:
     # this should only pull out the root variables (e.g., `d.split('.')[0]`)
     parsed_text = _jinja_env.parse(text)
@@ -63,10 +106,127 @@ def randomly_pick_option(options: OptionT | list[OptionT | Option[OptionT]]) ->
     return chosen_option.option  # type: ignore
 
 
+_missing = object()
+
+_var_path_root_pattern = re.compile(r"\s*([A-Za-z_][A-Za-z0-9_]*)")
+_var_path_step_pattern = re.compile(
+    r"""
+    \.(?P<attr>[A-Za-z_][A-Za-z0-9_]*)
+    | \.(?P<attr_index>\d+)
+    | \[\s*(?P<index>-?\d+)\s*]
+    | \[\s*'(?P<single_quoted>[^'\\]*)'\s*]
+    | \[\s*"(?P<double_quoted>[^"\\]*)"\s*]
+    """,
+    re.VERBOSE,
+)
+# names that jinja parses as literals or operators rather than variables
+_jinja_reserved_names = frozenset(
+    ["true", "false", "none", "True", "False", "None"]
+    + ["and", "or", "not", "in", "is", "if", "else"]
+)
+
+
+class VarPathAccessor:
+    """
+    Resolves a plain variable path like `a.b.c` or `a[0].b` by walking the context directly,
+    following the same attribute/item lookup rules as jinja.
+    """
+
+    def __init__(self, root: ContextVarName, steps: tuple[tuple[bool, str | int], ...]):
+        self.root = root
+        #: (is_attribute, key) pairs; `a.b` is an attribute step, `a[0]` an item step
+        self.steps = steps
+
+    def resolve(self, context: dict[ContextVarName, Any]) -> Any:
+        """
+        Return the value at the path, or `_missing` if jinja would render it as undefined.
+        """
+        value = context.get(self.root, _missing)
+        if value is _missing:
+            return _missing
+        for is_attribute, key in self.steps:
+            if is_attribute:
+                value = self._getattr(value, key)
+            else:
+                value = self._getitem(value, key)
+            if value is _missing:
+                return _missing
+        return value
+
+    @staticmethod
+    def _getattr(obj: Any, attribute: str | int) -> Any:
+        # mirrors `jinja2.Environment.getattr`
+        try:
+            return getattr(obj, attribute)  # type: ignore
+        except AttributeError:
+            pass
+        try:
+            return obj[attribute]
+        except (TypeError, LookupError, AttributeError):
+            return _missing
+
+    @staticmethod
+    def _getitem(obj: Any, argument: str | int) -> Any:
+        # mirrors `jinja2.Environment.getitem`
+        try:
+            return obj[argument]
+        except (AttributeError, TypeError, LookupError):
+            if isinstance(argument, str):
+                try:
+                    return getattr(obj, argument)
+                except AttributeError:
+                    pass
+            return _missing
+
+
+@lru_cache(maxsize=1024)
+def compile_var_path(var: ContextVarPath) -> VarPathAccessor | None:
+    """
+    Compile a variable path into an accessor, or return None if it's not a plain path
+    (e.g., it contains filters, calls or operators), in which case it should be rendered with jinja.
+    """
+    match = _var_path_root_pattern.match(var)
+    if match is None:
+        return None
+    root = match.group(1)
+    if root in _jinja_reserved_names:
+        return None
+
+    steps = []
+    position = match.end()
+    end = len(var.rstrip())
+    while position < end:
+        match = _var_path_step_pattern.match(var, position)
+        if match is None:
+            return None
+        if match.group("attr") is not None:
+            steps.append((True, match.group("attr")))
+        elif match.group("attr_index") is not None:
+            # jinja parses `a.0` as an item lookup
+            steps.append((False, int(match.group("attr_index"))))
+        elif match.group("index") is not None:
+            steps.append((False, int(match.group("index"))))
+        elif match.group("single_quoted") is not None:
+            steps.append((False, match.group("single_quoted")))
+        else:
+            steps.append((False, match.group("double_quoted")))
+        position = match.end()
+
+    return VarPathAccessor(root, tuple(steps))
+
+
 async def render_var(
     var: ContextVarPath,
     context: dict[ContextVarName, Any],
 ) -> Any:
+    accessor = compile_var_path(var)
+    if accessor is not None:
+        value = accessor.resolve(context)
+        if value is not _missing:
+            if isinstance(value, DefaultOutputOutputs):
+                return await render_var(value._default_output, value.model_dump())
+            return value
+    # fall back to jinja for anything the accessor doesn't resolve, including undefined variables
     return await render_template(f"{{{{ {var} }}}}", context)
 
 
@@ -74,7 +234,7 @@ async def render_template(
     template_string: TemplateString,
     context: dict[ContextVarName, Any],
 ) -> Any:
-    template = _jinja_env.from_string(template_string)
+    template = template_cache.get(template_string)
     rendered = await template.render_async(context)
     if isinstance(rendered, DefaultOutputOutputs):
         return await render_var(rendered._default_output, rendered.model_dump())
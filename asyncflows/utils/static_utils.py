@@ -3,7 +3,6 @@ from typing_extensions import Any, assert_never
 import structlog
 
 from asyncflows.models.config.action import ActionInvocation
-from asyncflows.utils.rendering_utils import extract_root_var
 from asyncflows.models.config.flow import (
     ActionConfig,
     Loop,
@@ -11,19 +10,35 @@ from asyncflows.models.config.flow import (
     Executable,
 )
 from asyncflows.models.config.model import ModelConfig
+from asyncflows.models.config.value_declarations import VarDeclaration
 from asyncflows.models.primitives import ContextVarPath, ExecutableId
-from asyncflows.services.action_service import ActionService
+from asyncflows.utils.plan_utils import (
+    LoopReferences,
+    get_dependency_ids_and_stream_flag_from_input_spec,
+    get_input_spec,
+    get_loop_references,
+)
 
 
 def _get_root_dependencies(
     input_spec: Any,
 ):
-    dependency_tuples = (
-        ActionService._get_dependency_ids_and_stream_flag_from_input_spec(input_spec)
-    )
+    dependency_tuples = get_dependency_ids_and_stream_flag_from_input_spec(input_spec)
     return [dep for dep, _ in dependency_tuples]
 
 
+def _get_loop_references(
+    flow: FlowConfig,
+    input_spec: Any,
+) -> LoopReferences:
+    loops = {
+        executable_id: frozenset(executable.flow)
+        for executable_id, executable in flow.items()
+        if isinstance(executable, Loop)
+    }
+    return get_loop_references(input_spec, loops)
+
+
 def check_default_model_consistency(
     log: structlog.stdlib.BoundLogger,
     default_model: ModelConfig,
@@ -72,8 +87,10 @@ def check_loop_consistency(
     flow: FlowConfig,
     loop: Loop,
     variables: set[str],
+    body_ids: frozenset[ExecutableId] | None = None,
 ):
     dependencies = _get_root_dependencies(loop.in_)
+    loop_references = _get_loop_references(flow, loop.in_)
 
     unmet_dependencies = [dep for dep in dependencies if dep not in variables]
 
@@ -85,17 +102,22 @@ def check_loop_consistency(
             pass_ = False
         else:
             if not check_invocation_consistency(
-                log.bind(dependency_path=dep), flow, flow[dep], variables
+                log.bind(dependency_path=dep),
+                flow,
+                flow[dep],
+                variables,
+                body_ids=loop_references.get(dep),
             ):
                 pass_ = False
 
     joint_variables = variables | {loop.for_}
     joint_flow = flow | loop.flow
 
-    # TODO at time of writing all actions in the loop subflow are run;
-    #  after we move from that, this shouldn't check against the whole flow, but only the relevant invocations
+    # only the referenced executables of the loop's body are run, so only those need be consistent
+    if body_ids is None:
+        body_ids = frozenset(loop.flow)
     if not check_flow_consistency(
-        log, list(loop.flow), joint_variables, flow=joint_flow
+        log, sorted(body_ids), joint_variables, flow=joint_flow
     ):
         pass_ = False
 
@@ -109,6 +131,7 @@ def check_action_consistency(
     variables: set[str],
 ):
     dependencies = _get_root_dependencies(invocation)
+    loop_references = _get_loop_references(flow, get_input_spec(invocation))
 
     unmet_dependencies = [dep for dep in dependencies if dep not in variables]
 
@@ -120,7 +143,11 @@ def check_action_consistency(
             pass_ = False
         else:
             if not check_invocation_consistency(
-                log.bind(dependency_path=dep), flow, flow[dep], variables
+                log.bind(dependency_path=dep),
+                flow,
+                flow[dep],
+                variables,
+                body_ids=loop_references.get(dep),
             ):
                 pass_ = False
 
@@ -132,9 +159,10 @@ def check_invocation_consistency(
     flow: FlowConfig,
     invocation: Executable,
     variables: set[str],
+    body_ids: frozenset[ExecutableId] | None = None,
 ):
     if isinstance(invocation, Loop):
-        return check_loop_consistency(log, flow, invocation, variables)
+        return check_loop_consistency(log, flow, invocation, variables, body_ids)
     elif isinstance(invocation, ActionInvocation):
         return check_action_consistency(log, flow, invocation, variables)
     else:
@@ -145,7 +173,7 @@ def check_config_consistency(
     log: structlog.stdlib.BoundLogger,
     config: ActionConfig,
     variables: set[str],
-    target_output: ContextVarPath,
+    target_output: ContextVarPath | list[ContextVarPath],
 ):
     pass_ = True
 
@@ -154,17 +182,27 @@ def check_config_consistency(
     ):
         pass_ = False
 
-    root_dependency_id = extract_root_var(target_output)
-    if root_dependency_id not in config.flow:
-        log.error("Dependency not found in flow", dependency=root_dependency_id)
-        return False
-
-    if not check_invocation_consistency(
-        log.bind(dependency_path=root_dependency_id),
-        config.flow,
-        config.flow[root_dependency_id],
-        variables,
-    ):
-        pass_ = False
+    if isinstance(target_output, str):
+        target_output = [target_output]
+    declarations = [VarDeclaration(var=output) for output in target_output]
+    root_dependency_ids = set().union(
+        *(declaration.get_dependencies() for declaration in declarations)
+    )
+    # only the parts of the loops that the targets reference are run, as in `AsyncFlows`
+    loop_references = _get_loop_references(config.flow, declarations)
+    for root_dependency_id in sorted(root_dependency_ids):
+        if root_dependency_id not in config.flow:
+            log.error("Dependency not found in flow", dependency=root_dependency_id)
+            pass_ = False
+            continue
+
+        if not check_invocation_consistency(
+            log.bind(dependency_path=root_dependency_id),
+            config.flow,
+            config.flow[root_dependency_id],
+            variables,
+            body_ids=loop_references.get(root_dependency_id),
+        ):
+            pass_ = False
 
     return pass_
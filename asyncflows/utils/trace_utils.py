@@ -0,0 +1,168 @@
+import contextlib
+import json
+import os
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, ContextManager, Iterator, TypeVar
+
+from asyncflows.models.primitives import TaskId
+
+T = TypeVar("T")
+
+
+class Tracer:
+    """
+    Record spans of the action tasks run within `tracing`,
+    and export them as Chrome Trace Event JSON, to view in Perfetto or `chrome://tracing`.
+    Each task (by task ID, including its run's namespace and loop prefixes) gets a row of its own.
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.pid = os.getpid()
+        self.events: list[dict[str, Any]] = []
+        self.thread_ids: dict[TaskId, int] = {}
+
+    def _get_thread_id(self, task_id: TaskId) -> int:
+        if task_id not in self.thread_ids:
+            thread_id = len(self.thread_ids) + 1
+            self.thread_ids[task_id] = thread_id
+            # name the row, and keep the rows in the order the tasks first appear in
+            self.events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self.pid,
+                    "tid": thread_id,
+                    "args": {"name": task_id},
+                }
+            )
+            self.events.append(
+                {
+                    "name": "thread_sort_index",
+                    "ph": "M",
+                    "pid": self.pid,
+                    "tid": thread_id,
+                    "args": {"sort_index": thread_id},
+                }
+            )
+        return self.thread_ids[task_id]
+
+    def _get_timestamp(self, perf_counter: float) -> float:
+        # microseconds since the tracer was created
+        return (perf_counter - self.start_time) * 1e6
+
+    def add_span(
+        self,
+        name: str,
+        task_id: TaskId,
+        start: float,
+        end: float,
+        **args: Any,
+    ) -> None:
+        """
+        Record a span of the task, from `start` to `end` as given by `time.perf_counter()`.
+        """
+        self.events.append(
+            {
+                "name": name,
+                "cat": "asyncflows",
+                "ph": "X",
+                "ts": self._get_timestamp(start),
+                "dur": (end - start) * 1e6,
+                "pid": self.pid,
+                "tid": self._get_thread_id(task_id),
+                "args": args,
+            }
+        )
+
+    def add_instant(self, name: str, task_id: TaskId, **args: Any) -> None:
+        self.events.append(
+            {
+                "name": name,
+                "cat": "asyncflows",
+                "ph": "i",
+                "s": "t",
+                "ts": self._get_timestamp(time.perf_counter()),
+                "pid": self.pid,
+                "tid": self._get_thread_id(task_id),
+                "args": args,
+            }
+        )
+
+    @contextlib.contextmanager
+    def span(self, name: str, task_id: TaskId, **args: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, task_id, start, time.perf_counter(), **args)
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        return {
+            "traceEvents": self.events,
+            "displayTimeUnit": "ms",
+        }
+
+    def export(self, path: str | Path) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+_current_tracer: ContextVar[Tracer | None] = ContextVar("tracer", default=None)
+
+
+def get_tracer() -> Tracer | None:
+    return _current_tracer.get()
+
+
+@contextlib.contextmanager
+def tracing(path: str | Path | None = None) -> Iterator[Tracer]:
+    """
+    Trace the flows run within the context, exporting the trace to `path` on exit if given.
+
+    The tracer is kept in a context variable, so the action tasks scheduled within the context record to it,
+    even as they're awaited from elsewhere.
+    """
+    tracer = Tracer()
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+        if path is not None:
+            tracer.export(path)
+
+
+def trace_span(name: str, task_id: TaskId, **args: Any) -> ContextManager[None]:
+    tracer = get_tracer()
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.span(name, task_id, **args)
+
+
+def trace_waits(
+    name: str, task_id: TaskId, aiter: AsyncIterator[T]
+) -> AsyncIterator[T]:
+    """
+    Record a span for each wait on the iterator's next value, if tracing.
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return aiter
+    return _trace_waits(tracer, name, task_id, aiter)
+
+
+async def _trace_waits(
+    tracer: Tracer, name: str, task_id: TaskId, aiter: AsyncIterator[T]
+) -> AsyncIterator[T]:
+    while True:
+        start = time.perf_counter()
+        try:
+            value = await aiter.__anext__()
+        except StopAsyncIteration:
+            break
+        finally:
+            tracer.add_span(name, task_id, start, time.perf_counter())
+        yield value